@@ -0,0 +1,243 @@
+# server/cli.py
+"""
+Comandos de mantenimiento:
+
+  python -m server.cli fts-rebuild   Reconstruye el índice de búsqueda (pedido_fts / pedido_codigo_fts / anomalia_fts)
+  python -m server.cli bench-router  Mide ROUTER.match sobre todas las rutas (sin BD ni servidor)
+  python -m server.cli build-assets  Genera los bundles CSS/JS por página (WEB_BUILD_ROOT)
+  python -m server.cli query-stats   Top de queries del servidor en marcha (DB_QUERY_STATS=1)
+  python -m server.cli check-plans   EXPLAIN QUERY PLAN de las queries de los servicios (falla ante SCAN/sort)
+  python -m server.cli bench-indexes Tiempo de esas queries sin y con server/migrations
+  python -m server.cli migrate       Aplica las migraciones pendientes (--status: solo informa)
+"""
+import argparse
+import json
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from server.config import CONFIG
+from server.db import Database
+from server.services.busqueda_service import BusquedaService
+
+
+def _db() -> Database:
+    return Database(CONFIG.db_path, pragmas=CONFIG.db_pragmas())
+
+
+def cmd_fts_rebuild(args) -> int:
+    db = _db()
+    try:
+        if not db.query_one("SELECT 1 AS ok FROM sqlite_master WHERE type = 'table' AND name = 'pedido';"):
+            print(f"La base {CONFIG.db_path} no tiene el schema inicializado (inicie el servidor una vez).")
+            return 1
+        svc = BusquedaService(db)
+        if not svc.ensure_schema():
+            print("SQLite sin soporte FTS5: no hay índice que reconstruir.")
+            return 1
+        n = svc.rebuild()
+        print(f"Índice FTS reconstruido: pedidos={n['pedidos']} anomalias={n['anomalias']}")
+        return 0
+    finally:
+        db.close()
+
+
+def cmd_bench_router(args) -> int:
+    from server.http.routes import ROUTER
+
+    routes = ROUTER.routes()
+    # Un path concreto por ruta ("<param>" -> 123) + uno inexistente (peor caso: 404)
+    muestras = [(r.method, "/".join("123" if s.startswith("<") else s for s in r.pattern.split("/"))) for r in routes]
+    muestras.append(("POST", "/api/no/existe/123"))
+
+    n = max(1, int(args.n))
+    peor = ("", 0.0)
+    total = 0.0
+    for method, path in muestras:
+        if path != "/api/no/existe/123" and ROUTER.match(method, path) is None:
+            print(f"ERROR: {method} {path} no resuelve")
+            return 1
+        t0 = time.perf_counter()
+        for _ in range(n):
+            ROUTER.match(method, path)
+        dt = (time.perf_counter() - t0) / n
+        total += dt
+        if dt > peor[1]:
+            peor = (f"{method} {path}", dt)
+
+    print(f"rutas={len(routes)} iteraciones={n}")
+    print(f"promedio={total / len(muestras) * 1e6:.2f} us/match  peor={peor[1] * 1e6:.2f} us ({peor[0]})")
+    return 0
+
+
+def cmd_build_assets(args) -> int:
+    from server.http.asset_build import build_assets
+
+    out = Path(args.out) if args.out else CONFIG.web_build_root
+    try:
+        info = build_assets(CONFIG.web_root, out)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        return 1
+    print(f"{out}: {info['pages']} páginas, {info['bundles']} bundles "
+          f"({info['written']} escritos, {info['removed']} obsoletos borrados)")
+    print(f"requests CSS/JS: {info['requests_before']} -> {info['requests_after']}  "
+          f"bytes: {info['bytes_in']} -> {info['bytes_out']}")
+    return 0
+
+
+def cmd_query_stats(args) -> int:
+    base = (args.url or f"http://{CONFIG.host}:{CONFIG.port}").rstrip("/")
+    headers = {"X-Admin-Key": CONFIG.admin_key}
+    try:
+        url = f"{base}/api/admin/db/queries?orden={args.orden}&limit={args.limit}"
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=10) as resp:
+            data = json.loads(resp.read().decode("utf-8")).get("data") or {}
+        if args.reset and data.get("enabled"):
+            # Próxima lectura = solo lo ocurrido entre ambas
+            req = urllib.request.Request(base + "/api/admin/db/queries/reset", data=b"", headers=headers)
+            urllib.request.urlopen(req, timeout=10).read()
+    except urllib.error.HTTPError as e:
+        print(f"ERROR: HTTP {e.code} {e.read().decode('utf-8', 'replace')}")
+        return 1
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {base}: {e}")
+        return 1
+
+    if not data.get("enabled"):
+        print(f"Estadísticas desactivadas en pid {data.get('pid')} (DB_QUERY_STATS=1 o DB_SLOW_QUERY_MS > 0).")
+        return 1
+    if args.json:
+        print(json.dumps(data, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"pid={data['pid']} desde={data['since']} sentencias={data['statements']} orden={args.orden}")
+    print(f"{'calls':>8} {'total_ms':>10} {'p50_ms':>8} {'p99_ms':>8} {'max_ms':>8} {'rows':>8}  sql")
+    for q in data.get("queries", []):
+        sql = q["sql"] if len(q["sql"]) <= args.width else q["sql"][: args.width - 3] + "..."
+        print(f"{q['calls']:>8} {q['total_ms']:>10.1f} {q['p50_ms']:>8.3f} {q['p99_ms']:>8.3f} "
+              f"{q['max_ms']:>8.3f} {q['rows']:>8}  {sql}")
+    slow = data.get("slow") or []
+    if slow:
+        print(f"\nLentas (>= {data['slow_ms']} ms, últimas {len(slow)}):")
+        for s in slow[-10:]:
+            print(f"  {s['ts']} {s['ms']} ms rows={s['rows']} {s['sql']}")
+            for line in s["plan"]:
+                print(f"      {line}")
+    return 0
+
+
+def cmd_check_plans(args) -> int:
+    from server.plan_check import check_plans
+
+    t0 = time.perf_counter()
+    res = check_plans()
+    stmts = res["statements"]
+    print("tablas grandes: " + ", ".join(f"{t}={n}" for t, n in res["tables"].items()))
+
+    fallas = [s for s in stmts if s.problems and not s.accepted]
+    for s in stmts:
+        if s.problems and (s.accepted or args.verbose):
+            print(f"ACEPTADO [{s.flow}] {' '.join(s.sql.split())[:120]}\n    {s.accepted}")
+        elif args.verbose:
+            print(f"ok [{s.flow}] {' '.join(s.sql.split())[:120]}")
+            for line in s.plan:
+                print(f"    {line}")
+    for s in fallas:
+        print(f"FALLA [{s.flow}] {' '.join(s.sql.split())}")
+        for p in s.problems:
+            print(f"    problema: {p}")
+        for line in s.plan:
+            print(f"    plan: {line}")
+    for flow, e in res["errors"]:
+        # Un flujo que no termina deja sentencias sin revisar
+        print(f"ERROR [{flow}] {e}")
+
+    print(f"{len(stmts)} sentencias, {len(fallas)} con problemas, "
+          f"{sum(1 for s in stmts if s.accepted)} aceptadas ({time.perf_counter() - t0:.1f} s)")
+    return 1 if (fallas or res["errors"]) else 0
+
+
+def cmd_bench_indexes(args) -> int:
+    from server.plan_check import bench_upgrades
+
+    rows = bench_upgrades(repeat=args.n)
+    rows.sort(key=lambda r: r["before_ms"] - r["after_ms"], reverse=True)
+    print(f"{'antes_ms':>9} {'después_ms':>10} {'x':>6}  flujo / sql")
+    for r in rows:
+        if r["plan_before"] == r["plan_after"] and not args.all:
+            continue
+        ratio = r["before_ms"] / r["after_ms"] if r["after_ms"] > 0 else 0.0
+        print(f"{r['before_ms']:>9.2f} {r['after_ms']:>10.2f} {ratio:>6.1f}  [{r['flow']}] {' '.join(r['sql'].split())[:90]}")
+        if r["plan_before"] != r["plan_after"]:
+            print(f"{'':>28}antes:   {' | '.join(r['plan_before'])}")
+            print(f"{'':>28}después: {' | '.join(r['plan_after'])}")
+    return 0
+
+
+def cmd_migrate(args) -> int:
+    from server.migrate import Migrator
+
+    db = _db()
+    try:
+        migrator = Migrator(db, CONFIG.schema_path)
+        if args.status:
+            st = migrator.status()
+            print(f"{CONFIG.db_path}: versión {st['current']} de {st['latest']}")
+            for name in st["pending"]:
+                print(f"  pendiente: {name}")
+            return 0
+        # Manual: también las online (sin server atendiendo no hay a quién bloquear)
+        applied = migrator.migrate(include_online=True)
+        print(f"{CONFIG.db_path}: " + (f"aplicadas {', '.join(f'{v:04d}' for v in applied)}" if applied else "al día")
+              + f" (versión {migrator.latest})")
+        return 0
+    finally:
+        db.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m server.cli")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("fts-rebuild", help="Reconstruye el índice full-text de pedidos y anomalías.")
+    p.set_defaults(func=cmd_fts_rebuild)
+
+    p = sub.add_parser("bench-router", help="Mide el costo de ROUTER.match por ruta.")
+    p.add_argument("-n", type=int, default=20000, help="Iteraciones por ruta.")
+    p.set_defaults(func=cmd_bench_router)
+
+    p = sub.add_parser("build-assets", help="Genera bundles CSS/JS con hash y reescribe las páginas HTML.")
+    p.add_argument("--out", default="", help="Directorio de salida (default: WEB_BUILD_ROOT).")
+    p.set_defaults(func=cmd_build_assets)
+
+    p = sub.add_parser("query-stats", help="Estadísticas por sentencia SQL del servidor en marcha.")
+    p.add_argument("--url", default="", help="Base del servidor (default: http://APP_HOST:PORT).")
+    p.add_argument("--orden", default="total", choices=("total", "p99", "calls", "max", "rows"))
+    p.add_argument("--limit", type=int, default=20)
+    p.add_argument("--width", type=int, default=100, help="Ancho máximo del SQL en la tabla.")
+    p.add_argument("--json", action="store_true", help="Respuesta completa en JSON.")
+    p.add_argument("--reset", action="store_true", help="Reinicia las estadísticas después de leerlas.")
+    p.set_defaults(func=cmd_query_stats)
+
+    p = sub.add_parser("check-plans", help="Revisa el plan de cada query de los servicios sobre datos sintéticos.")
+    p.add_argument("-v", "--verbose", action="store_true", help="Muestra también los planes sin problemas.")
+    p.set_defaults(func=cmd_check_plans)
+
+    p = sub.add_parser("bench-indexes", help="Benchmark antes/después de los índices de server/migrations.")
+    p.add_argument("-n", type=int, default=5, help="Repeticiones por sentencia (se toma la mejor).")
+    p.add_argument("--all", action="store_true", help="Incluye sentencias cuyo plan no cambia.")
+    p.set_defaults(func=cmd_bench_indexes)
+
+    p = sub.add_parser("migrate", help="Aplica las migraciones de schema pendientes.")
+    p.add_argument("--status", action="store_true", help="Solo muestra la versión y lo pendiente.")
+    p.set_defaults(func=cmd_migrate)
+
+    args = parser.parse_args(argv)
+    return int(args.func(args) or 0)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
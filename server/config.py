@@ -2,6 +2,7 @@
 import os
 from dataclasses import dataclass
 from pathlib import Path
+from typing import Any, Dict
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -25,6 +26,139 @@ class Config:
     schema_path: Path = BASE_DIR / "server" / "schema.sql"
     web_root: Path = BASE_DIR / "web"
 
+    # ==========================================================
+    # SQLite (pool de conexiones)
+    # - db_pool_size: máximo de conexiones abiertas a la vez
+    # - db_pool_timeout: segundos de espera por una conexión libre antes de fallar
+    # ==========================================================
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "8"))
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+    # ==========================================================
+    # SQLite (perfil PRAGMA, se aplica en cada conexión del pool)
+    # - WAL: lectores (listados/export) no se bloquean detrás de escritores
+    # - synchronous=NORMAL es seguro en WAL (no corrompe; solo puede perder
+    #   el último commit ante un corte de energía)
+    # - cache_size negativo = KiB (-16000 ~ 16 MB por conexión)
+    # ==========================================================
+    db_journal_mode: str = os.getenv("DB_JOURNAL_MODE", "WAL")
+    db_synchronous: str = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+    db_cache_size: int = int(os.getenv("DB_CACHE_SIZE", "-16000"))
+    db_mmap_size: int = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))
+    db_temp_store: str = os.getenv("DB_TEMP_STORE", "MEMORY")
+    db_busy_timeout_ms: int = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+
+    # ==========================================================
+    # Migraciones (server/migrations, PRAGMA user_version)
+    # - db_migrations_online: 1 = las migraciones "-- online" (solo índices) se aplican
+    #   en segundo plano con el server atendiendo; 0 = todas antes de arrancar
+    # - db_migrations_busy_timeout_ms: busy_timeout de las conexiones mientras tanto
+    #   (cada CREATE INDEX retiene el lock de escritura; los escritores esperan hasta esto)
+    # ==========================================================
+    db_migrations_online: bool = os.getenv("DB_MIGRATIONS_ONLINE", "1") == "1"
+    db_migrations_busy_timeout_ms: int = int(os.getenv("DB_MIGRATIONS_BUSY_TIMEOUT_MS", "120000"))
+
+    # ==========================================================
+    # Estadísticas de queries (GET /api/admin/db/queries, cli query-stats)
+    # - db_query_stats: 1 = llamadas/total/p50/p99/filas por sentencia normalizada
+    # - db_slow_query_ms: > 0 = sentencias más lentas van a stderr con su
+    #   EXPLAIN QUERY PLAN (activa también las estadísticas); 0 = sin slow log
+    # - db_query_stats_max: sentencias distintas antes de agrupar en "<otras>"
+    # Por proceso: con prefork cada proceso responde con sus propios números.
+    # ==========================================================
+    db_query_stats: bool = os.getenv("DB_QUERY_STATS", "0") == "1"
+    db_slow_query_ms: float = float(os.getenv("DB_SLOW_QUERY_MS", "0"))
+    db_query_stats_max: int = int(os.getenv("DB_QUERY_STATS_MAX", "500"))
+
+    # ==========================================================
+    # HTTP
+    # - http_max_body_bytes: Content-Length máximo por defecto para POST a la API
+    #   (413 antes de leer el body). Cada ruta puede definir su propio límite.
+    # ==========================================================
+    http_max_body_bytes: int = int(os.getenv("HTTP_MAX_BODY_BYTES", str(64 * 1024)))
+
+    # Keep-alive (HTTP/1.1): la conexión TCP se reutiliza entre requests.
+    # - timeout: segundos de inactividad antes de cerrar (en modo pool la conexión
+    #   ociosa espera en el selector del accept, sin ocupar un worker)
+    # - max_requests: respuestas por conexión; la última lleva "Connection: close"
+    http_keepalive_timeout: float = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "15"))
+    http_keepalive_max_requests: int = int(os.getenv("HTTP_KEEPALIVE_MAX_REQUESTS", "100"))
+
+    # Compresión gzip (Accept-Encoding) de JSON, CSV y estáticos de texto.
+    # - min_bytes: cuerpos más chicos van sin comprimir (no compensa)
+    # - level: 1 (rápido) .. 9 (más chico); 6 es el default de gzip
+    http_compression: bool = os.getenv("HTTP_COMPRESSION", "1") not in ("0", "false", "no")
+    http_compression_min_bytes: int = int(os.getenv("HTTP_COMPRESSION_MIN_BYTES", "1024"))
+    http_compression_level: int = int(os.getenv("HTTP_COMPRESSION_LEVEL", "6"))
+
+    # Cache de estáticos (web/) en memoria, con variante gzip precomputada al iniciar.
+    # - check_seconds: cada cuánto se revisa mtime/size de un archivo ya cacheado
+    #   (0 = en cada request; útil al editar web/ en desarrollo)
+    # - max_file_bytes: archivos más grandes no se cargan (sin gzip; van por sendfile)
+    # - max_bytes: tope total en memoria (body + gzip)
+    # - sendfile_min_bytes: desde este tamaño el cuerpo sin comprimir no se guarda
+    #   en memoria: se envía con sendfile (kernel -> socket, sin copias en Python)
+    static_cache_check_seconds: float = float(os.getenv("STATIC_CACHE_CHECK_SECONDS", "1"))
+    static_cache_max_file_bytes: int = int(os.getenv("STATIC_CACHE_MAX_FILE_BYTES", str(1024 * 1024)))
+    static_cache_max_bytes: int = int(os.getenv("STATIC_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    static_sendfile_min_bytes: int = int(os.getenv("STATIC_SENDFILE_MIN_BYTES", str(64 * 1024)))
+
+    # Bundles por página (CSS/JS concatenados, minificados, con hash en el nombre).
+    # - web_bundles: al iniciar se genera web_build_root y se sirve antes que web/
+    #   (0 = archivos originales sin agrupar, para depurar JS en el navegador)
+    # - Build offline (imagen de deploy): python -m server.cli build-assets
+    web_bundles: bool = os.getenv("WEB_BUNDLES", "1") not in ("0", "false", "no")
+    web_build_root: Path = Path(os.getenv("WEB_BUILD_ROOT", str(BASE_DIR / "build" / "web")))
+
+    # Modo de servidor:
+    # - "pool": workers fijos + cola de accept acotada; cola llena => 503 + Retry-After.
+    #   Un worker se ocupa solo mientras atiende un request (no en keep-alive ocioso)
+    # - "async": event loop (asyncio) para conexiones/static; /api en un executor de
+    #   http_workers threads con http_queue_max en espera (miles de keep-alive ociosos)
+    # - "threading": un thread por conexión (ThreadingHTTPServer, comportamiento anterior)
+    http_server_mode: str = os.getenv("HTTP_SERVER_MODE", "pool")
+    http_workers: int = int(os.getenv("HTTP_WORKERS", "16"))
+    http_queue_max: int = int(os.getenv("HTTP_QUEUE_MAX", "64"))
+    http_retry_after_seconds: int = int(os.getenv("HTTP_RETRY_AFTER_SECONDS", "2"))
+
+    # ==========================================================
+    # Multi-proceso (prefork)
+    # - http_processes > 1: N procesos escuchan el mismo puerto (SO_REUSEPORT,
+    #   Linux); cada uno con su modo (pool/async/threading) y su pool de BD.
+    # - rate_limit_backend: "memory" (por proceso) | "sqlite" (compartido) |
+    #   "auto" (memory con 1 proceso, sqlite con varios)
+    # - rate_limit_db_path: vacío = rate_limit.sqlite3 junto a DB_PATH
+    # - cache_sync_seconds: cada cuánto un proceso revisa tabla_version para
+    #   descartar caches (catálogos, tokens) invalidados por otro proceso
+    # Con varios procesos, POST /api/admin/extras-key/rotate responde 409: la clave
+    # de extras es por proceso (cambiarla con EXTRA_KEY + reinicio).
+    # ==========================================================
+    http_processes: int = int(os.getenv("HTTP_PROCESSES", "1"))
+    rate_limit_backend: str = os.getenv("RATE_LIMIT_BACKEND", "auto")
+    rate_limit_db_path: str = os.getenv("RATE_LIMIT_DB_PATH", "")
+    cache_sync_seconds: float = float(os.getenv("CACHE_SYNC_SECONDS", "1"))
+
+    # ==========================================================
+    # Métricas (GET /api/metrics, formato Prometheus, guard admin)
+    # - metrics_dir: con varios procesos cada uno deja ahí su snapshot cada
+    #   metrics_sync_seconds y el scrape suma todos (vacío = "metrics" junto a DB_PATH)
+    # ==========================================================
+    metrics_dir: str = os.getenv("METRICS_DIR", "")
+    metrics_sync_seconds: float = float(os.getenv("METRICS_SYNC_SECONDS", "5"))
+
+    # ==========================================================
+    # AUTH (cache token -> usuario en memoria)
+    # - ttl: máximo tiempo que una sesión/rol cacheado puede quedar desfasado
+    #   ante cambios que no pasan por los servicios (ej: SQL manual)
+    # - max: entradas (LRU); 0 desactiva el cache
+    # ==========================================================
+    auth_cache_ttl_seconds: float = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+    auth_cache_max: int = int(os.getenv("AUTH_CACHE_MAX", "1024"))
+
+    # auth_sesion.ultimo_uso_en: se acumula en memoria y se escribe en lote cada N
+    # segundos (y al apagar). 0 = escribir en cada request (comportamiento anterior).
+    auth_ultimo_uso_flush_seconds: float = float(os.getenv("AUTH_ULTIMO_USO_FLUSH_SECONDS", "15"))
+
     # ==========================================================
     # EXTRAS (legacy funcional)
     # - Mantiene compatibilidad: se sigue usando CONFIG.extra_key
@@ -56,6 +190,29 @@ class Config:
         "7227409565b7b96510ec33e91ee8fed9ce1aaa25edd0fc9ae79f0b70df189e6e",
     )
 
+    def db_pragmas(self) -> Dict[str, Any]:
+        """
+        Perfil PRAGMA para Database (orden de aplicación incluido).
+        """
+        return {
+            "journal_mode": self.db_journal_mode,
+            "synchronous": self.db_synchronous,
+            "cache_size": self.db_cache_size,
+            "mmap_size": self.db_mmap_size,
+            "temp_store": self.db_temp_store,
+            "busy_timeout": self.db_busy_timeout_ms,
+        }
+
+    def rate_limit_sqlite_path(self) -> Path:
+        if self.rate_limit_db_path:
+            return Path(self.rate_limit_db_path)
+        return Path(self.db_path).parent / "rate_limit.sqlite3"
+
+    def metrics_path(self) -> Path:
+        if self.metrics_dir:
+            return Path(self.metrics_dir)
+        return Path(self.db_path).parent / "metrics"
+
     def __post_init__(self) -> None:
         """
         Ajuste sutil:
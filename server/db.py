@@ -1,41 +1,395 @@
+import queue
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Sequence, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from server.query_stats import QueryStats
+
+
+class ConnectionPool:
+    """
+    Pool acotado de conexiones SQLite (thread-safe).
+    - Reutiliza conexiones (evita abrir + PRAGMA por cada query).
+    - max_size: máximo de conexiones abiertas a la vez (en uso + libres).
+    - Health check: si una conexión estuvo ociosa más de health_check_seconds,
+      se valida con SELECT 1 antes de entregarla (si falla, se descarta).
+    - close(): cierre limpio (libres se cierran ya; en uso, al devolverse).
+    """
+
+    def __init__(self, factory, max_size: int = 8, timeout: float = 10.0, health_check_seconds: float = 30.0):
+        self._factory = factory
+        self._max_size = max(1, int(max_size))
+        self._timeout = float(timeout)
+        self._health_check_seconds = float(health_check_seconds)
+
+        # LIFO: la conexión más reciente queda "caliente" (page cache de SQLite)
+        self._idle: "queue.LifoQueue[Tuple[sqlite3.Connection, float]]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self._max_size)
+        self._lock = threading.Lock()
+        self._open = 0
+        self._closed = False
+
+    def acquire(self) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError("DB_POOL_CLOSED")
+        if not self._slots.acquire(timeout=self._timeout):
+            raise RuntimeError("DB_POOL_TIMEOUT")
+
+        try:
+            while True:
+                try:
+                    conn, idle_since = self._idle.get_nowait()
+                except queue.Empty:
+                    conn = self._factory()
+                    with self._lock:
+                        self._open += 1
+                    return conn
+
+                if self._is_healthy(conn, idle_since):
+                    return conn
+                self._discard(conn)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn: sqlite3.Connection, broken: bool = False) -> None:
+        try:
+            if broken or self._closed:
+                self._discard(conn)
+                return
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except sqlite3.Error:
+                self._discard(conn)
+                return
+            self._idle.put((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        idle = self._idle.qsize()
+        with self._lock:
+            opened = self._open
+        return {
+            "max_size": self._max_size,
+            "open": opened,
+            "idle": idle,
+            "in_use": max(0, opened - idle),
+            "closed": self._closed,
+        }
+
+    def _is_healthy(self, conn: sqlite3.Connection, idle_since: float) -> bool:
+        if (time.monotonic() - idle_since) < self._health_check_seconds:
+            return True
+        try:
+            conn.execute("SELECT 1;").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            self._open = max(0, self._open - 1)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+# PRAGMAs soportados por el perfil y valores válidos (los PRAGMA no aceptan parámetros "?",
+# así que todo valor se valida antes de interpolarse).
+_PRAGMA_CHOICES: Dict[str, Tuple[str, ...]] = {
+    "journal_mode": ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"),
+    "synchronous": ("OFF", "NORMAL", "FULL", "EXTRA"),
+    "temp_store": ("DEFAULT", "FILE", "MEMORY"),
+}
+_PRAGMA_INTS = ("cache_size", "mmap_size", "busy_timeout")
+
+# Valores numéricos que SQLite devuelve al leer estos PRAGMA
+_PRAGMA_LABELS: Dict[str, Tuple[str, ...]] = {
+    "synchronous": ("OFF", "NORMAL", "FULL", "EXTRA"),
+    "temp_store": ("DEFAULT", "FILE", "MEMORY"),
+}
+
+
+def _pragma_sql(name: str, value: Any) -> str:
+    if name in _PRAGMA_CHOICES:
+        v = str(value or "").strip().upper()
+        if v not in _PRAGMA_CHOICES[name]:
+            raise ValueError(f"PRAGMA_INVALIDO:{name}")
+        return f"PRAGMA {name} = {v};"
+    if name in _PRAGMA_INTS:
+        return f"PRAGMA {name} = {int(value)};"
+    raise ValueError(f"PRAGMA_INVALIDO:{name}")
+
+
+class _Connection(sqlite3.Connection):
+    # busy_timeout vigente en esta conexión (ver Database.set_busy_timeout)
+    busy_timeout_ms: Optional[int] = None
+
 
 class Database:
-    def __init__(self, db_path: Path):
+    def __init__(
+        self,
+        db_path: Path,
+        pool_size: int = 8,
+        pool_timeout: float = 10.0,
+        pragmas: Optional[Dict[str, Any]] = None,
+    ):
         self.db_path = db_path
+        # Se validan al construir (un valor inválido en env debe fallar al boot, no en el primer request)
+        self._pragma_sqls = [_pragma_sql(k, v) for k, v in (pragmas or {}).items()]
+        self._busy_default = int((pragmas or {}).get("busy_timeout", 0))
+        # None = sin override nunca (las conexiones quedan con el perfil PRAGMA)
+        self._busy_timeout_ms: Optional[int] = None
+        self._pool_size = pool_size
+        self._pool_timeout = pool_timeout
+        self._pool = ConnectionPool(self.connect, max_size=pool_size, timeout=pool_timeout)
+        # Transacción activa por hilo (ver transaction())
+        self._local = threading.local()
+        # fn(sql, segundos) por sentencia (métricas); sin observadores el costo es un perf_counter
+        self._observers: List[Callable[[str, float], None]] = []
+        # Estadísticas por sentencia + slow log (opt-in: enable_query_stats)
+        self.query_stats: Optional[QueryStats] = None
 
     def connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
+        # check_same_thread=False: las conexiones del pool cambian de hilo entre requests
+        # (nunca se usan desde dos hilos a la vez: el pool las entrega en exclusiva).
+        # isolation_level=None: autocommit; las transacciones se abren explícitamente en transaction().
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, factory=_Connection)
         conn.row_factory = sqlite3.Row
         conn.execute("PRAGMA foreign_keys = ON;")
+        for sql in self._pragma_sqls:
+            conn.execute(sql).fetchall()
         return conn
 
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Presta una conexión del pool durante el bloque.
+        Si ocurre un error de SQLite que no sea de integridad/datos, la conexión se descarta.
+        """
+        conn = self._pool.acquire()
+        broken = False
+        try:
+            want = self._busy_timeout_ms
+            if want is not None and conn.busy_timeout_ms != want:
+                conn.execute(f"PRAGMA busy_timeout = {want};").fetchall()
+                conn.busy_timeout_ms = want
+            yield conn
+        except (sqlite3.IntegrityError, sqlite3.ProgrammingError):
+            raise
+        except sqlite3.DatabaseError:
+            broken = True
+            raise
+        finally:
+            self._pool.release(conn, broken=broken)
+
+    @contextmanager
+    def _conn(self) -> Iterator[sqlite3.Connection]:
+        """
+        Conexión para una sentencia: la de la transacción activa del hilo (si hay) o una del pool.
+        """
+        tx_conn = getattr(self._local, "conn", None)
+        if tx_conn is not None:
+            yield tx_conn
+            return
+        with self.connection() as conn:
+            yield conn
+
+    @contextmanager
+    def transaction(self) -> Iterator["Database"]:
+        """
+        Unidad de trabajo: todas las sentencias del bloque (en este hilo) usan la misma
+        conexión y se confirman con un solo COMMIT al salir; ante excepción, ROLLBACK.
+
+            with db.transaction() as tx:
+                row = tx.query_one(...)
+                tx.execute(...)
+
+        - tx es la misma Database: helpers que llaman self.db.* dentro del bloque
+          participan de la transacción sin cambios.
+        - BEGIN IMMEDIATE toma el lock de escritura al inicio (evita SQLITE_BUSY al
+          "subir" de lectura a escritura en un read-modify-write).
+        - Bloques anidados se unen a la transacción externa.
+        """
+        if getattr(self._local, "conn", None) is not None:
+            yield self
+            return
+
+        with self.connection() as conn:
+            t0 = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE;")
+            # Incluye la espera por el lock de escritura (contención entre escritores)
+            self._observe("BEGIN IMMEDIATE;", t0)
+            self._local.conn = conn
+            try:
+                yield self
+            except BaseException:
+                self._local.conn = None
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            self._local.conn = None
+            t0 = time.perf_counter()
+            conn.commit()
+            self._observe("COMMIT;", t0)
+
+    def close(self) -> None:
+        self._pool.close()
+
+    def set_busy_timeout(self, ms: Optional[int]) -> None:
+        """
+        Override temporal de busy_timeout (ej: mientras una migración online construye
+        un índice con el lock de escritura tomado). Se aplica a cada conexión al
+        prestarla; None vuelve al valor del perfil PRAGMA.
+        """
+        self._busy_timeout_ms = self._busy_default if ms is None else int(ms)
+
+    def add_observer(self, fn: Callable[[str, float], None]) -> None:
+        """Registra fn(sql, segundos): se llama tras cada sentencia (incluye fetch y COMMIT)."""
+        self._observers.append(fn)
+
+    def enable_query_stats(self, slow_ms: float = 0.0, max_statements: int = 500) -> QueryStats:
+        self.query_stats = QueryStats(slow_ms=slow_ms, max_statements=max_statements)
+        return self.query_stats
+
+    def _observe(self, sql: str, t0: float, rows: int = -1, conn: Optional[sqlite3.Connection] = None,
+                 params: Sequence[Any] = ()) -> None:
+        if not self._observers and self.query_stats is None:
+            return
+        dt = time.perf_counter() - t0
+        for fn in self._observers:
+            fn(sql, dt)
+        qs = self.query_stats
+        if qs is not None:
+            qs.record(sql, dt, rows)
+            if conn is not None and qs.is_slow(dt):
+                qs.record_slow(sql, dt, rows, self._plan(conn, sql, params))
+
+    @staticmethod
+    def _plan(conn: sqlite3.Connection, sql: str, params: Sequence[Any]) -> List[str]:
+        # Misma conexión y parámetros (el plan puede depender de ellos: LIKE, índices parciales)
+        try:
+            rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+        except sqlite3.Error as e:
+            return [f"(sin plan: {e})"]
+        return [str(r[3]) for r in rows]
+
+    def reopen(self) -> None:
+        """
+        Pool nuevo (para un proceso hijo tras fork()). Una conexión SQLite no debe
+        cruzar un fork: el padre cierra su pool antes de forkear y cada hijo abre el suyo.
+        """
+        self._pool = ConnectionPool(self.connect, max_size=self._pool_size, timeout=self._pool_timeout)
+        self._local = threading.local()
+        if self.query_stats is not None:
+            # Cada hijo empieza de cero (sin lo que el padre ejecutó al preparar la BD)
+            qs = self.query_stats
+            self.enable_query_stats(qs.slow_ms, qs.max_statements)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return self._pool.stats()
+
+    def pragma_status(self) -> Dict[str, Any]:
+        """
+        Valores PRAGMA efectivos (leídos desde una conexión del pool).
+        """
+        out: Dict[str, Any] = {}
+        with self.connection() as conn:
+            for name in ("journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "busy_timeout", "foreign_keys"):
+                row = conn.execute(f"PRAGMA {name};").fetchone()
+                value = row[0] if row else None
+                labels = _PRAGMA_LABELS.get(name)
+                if labels and isinstance(value, int) and 0 <= value < len(labels):
+                    value = labels[value]
+                out[name] = value
+        return out
+
     def init_schema(self, schema_sql: str) -> None:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        with self.connect() as conn:
+        with self.connection() as conn:
             conn.executescript(schema_sql)
-            conn.commit()
 
     def query_all(self, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
-        with self.connect() as conn:
-            cur = conn.execute(sql, params)
-            return [dict(r) for r in cur.fetchall()]
+        with self._conn() as conn:
+            t0 = time.perf_counter()
+            rows: List[Dict[str, Any]] = []
+            try:
+                cur = conn.execute(sql, params)
+                rows = [dict(r) for r in cur.fetchall()]
+                return rows
+            finally:
+                self._observe(sql, t0, len(rows), conn, params)
 
     def query_one(self, sql: str, params: Sequence[Any] = ()) -> Optional[Dict[str, Any]]:
-        with self.connect() as conn:
+        with self._conn() as conn:
+            t0 = time.perf_counter()
+            row = None
+            try:
+                cur = conn.execute(sql, params)
+                row = cur.fetchone()
+                return dict(row) if row else None
+            finally:
+                self._observe(sql, t0, 1 if row else 0, conn, params)
+
+    def iter_rows(self, sql: str, params: Sequence[Any] = (), batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """
+        Recorre el resultado por lotes (fetchmany) sin materializarlo completo.
+        La conexión queda tomada hasta agotar o cerrar el generador (close()).
+        """
+        with self._conn() as conn:
+            # Solo cuenta el tiempo en SQLite (execute + fetchmany), no el del consumidor
+            spent = 0.0
+            count = 0
+            t0 = time.perf_counter()
             cur = conn.execute(sql, params)
-            row = cur.fetchone()
-            return dict(row) if row else None
+            try:
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    spent += time.perf_counter() - t0
+                    if not rows:
+                        return
+                    count += len(rows)
+                    for r in rows:
+                        yield dict(r)
+                    t0 = time.perf_counter()
+            finally:
+                cur.close()
+                # t0 equivalente: _observe reporta exactamente `spent`
+                self._observe(sql, time.perf_counter() - spent, count, conn, params)
 
     def execute(self, sql: str, params: Sequence[Any] = ()) -> int:
-        with self.connect() as conn:
-            cur = conn.execute(sql, params)
-            conn.commit()
-            return int(cur.lastrowid)
+        # Fuera de transaction(): autocommit (un COMMIT por sentencia, como antes).
+        with self._conn() as conn:
+            t0 = time.perf_counter()
+            cur = None
+            try:
+                cur = conn.execute(sql, params)
+                return int(cur.lastrowid or 0)
+            finally:
+                self._observe(sql, t0, cur.rowcount if cur is not None else -1, conn, params)
 
     def execute_many(self, sql: str, rows: Sequence[Sequence[Any]]) -> None:
-        with self.connect() as conn:
-            conn.executemany(sql, rows)
-            conn.commit()
+        # Un solo COMMIT para todo el lote
+        with self.transaction() as tx:
+            with tx._conn() as conn:
+                t0 = time.perf_counter()
+                cur = None
+                try:
+                    cur = conn.executemany(sql, rows)
+                finally:
+                    self._observe(sql, t0, cur.rowcount if cur is not None else -1, conn, rows[0] if rows else ())
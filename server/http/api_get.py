@@ -1,297 +1,395 @@
 # server/http/api_get.py
+import os
 from urllib.parse import parse_qs
 
+from server.config import CONFIG
+from server.http.metrics import METRICS
+from server.http.rate_limit import get_backend as get_rate_limit_backend
+from server.http.static_cache import STATIC_CACHE
 from server.services.catalogos_admin_service import CatalogosAdminService
 from server.services.admin_usuarios_service import AdminUsuariosService
 from server.services.clave_cambio_service import ClaveCambioService
-from server.utils.http_utils import send_json, ok, err
+from server.utils.compression import gzip_bytes, gzip_encoding_for
+from server.utils.http_utils import send_json, ok, err, etag_headers, etag_matches, send_not_modified
+from server.utils.pagination import decode_cursor, parse_limit, split_page
 
 
 class ApiGetMixin:
-    def handle_api_get(self, parsed):
-        # =========================
-        # HEALTH
-        # =========================
-        if parsed.path == "/api/health":
-            return send_json(self, 200, ok({"status": "ok"}))
-
-        # =========================
-        # CATÁLOGOS (público para formularios)
-        # =========================
-        if parsed.path == "/api/catalogos":
+    """
+    Handlers GET de la API. Rutas, guards y rate limit: server/http/routes.py.
+    """
+
+    # =========================
+    # HEALTH
+    # =========================
+    def _get_health(self, parsed):
+        try:
+            db_info = {"pragmas": self.db.pragma_status(), "pool": self.db.pool_stats()}
+        except Exception:
+            return send_json(self, 503, err("DB_ERROR", "Base de datos no disponible."))
+        data = {
+            "status": "ok",
+            "db": db_info,
+            "rate_limit": get_rate_limit_backend().stats(),
+            "static": STATIC_CACHE.stats(),
+        }
+        if hasattr(self.server, "stats"):
+            # Utilización del pool de workers HTTP (modo "pool")
+            data["http"] = self.server.stats()
+        return send_json(self, 200, ok(data))
+
+    def _get_metrics(self, parsed):
+        body = METRICS.render().encode("utf-8")
+        ctype = "text/plain; version=0.0.4; charset=utf-8"
+        gz = gzip_encoding_for(self, ctype, len(body))
+        if gz:
+            body = gzip_bytes(body)
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        if CONFIG.http_compression:
+            self.send_header("Vary", "Accept-Encoding")
+        if gz:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+
+    # =========================
+    # CATÁLOGOS (público para formularios)
+    # ?version=X: si coincide con el snapshot actual, solo se confirma la versión
+    # (el cliente reutiliza su copia).
+    # =========================
+    def _get_catalogos(self, parsed):
+        qs = parse_qs(parsed.query or "")
+        version = (qs.get("version", [""])[0] or "").strip()
+        try:
+            etag = self.versiones.etag(self.path, "catalogos")
+            if etag_matches(self, etag):
+                return send_not_modified(self, etag)
+            data = self.catalogos.get_catalogos()
+            if version and version == data["version"]:
+                return send_json(self, 200, ok({"version": version, "sin_cambios": True}), etag_headers(etag))
+            return send_json(self, 200, ok(data), etag_headers(etag))
+        except Exception:
+            return send_json(self, 500, err("DB_ERROR", "Error al obtener catálogos."))
+
+    # =========================
+    # ADMIN: CATÁLOGOS (CRUD UI) - legacy (X-Admin-Key)
+    # =========================
+    def _get_admin_catalogos(self, parsed):
+        try:
+            svc = CatalogosAdminService(self.db)
+            data = svc.listar()
+            return send_json(self, 200, ok(data))
+        except ValueError as ve:
+            code = str(ve)
+            if code == "CATALOGO_INVALIDO":
+                return send_json(self, 400, err("VALIDATION_ERROR", "Catálogo inválido."))
+            return send_json(self, 400, err("VALIDATION_ERROR", "Solicitud inválida."))
+        except Exception:
+            return send_json(self, 500, err("DB_ERROR", "Error al obtener catálogos (admin)."))
+
+    # =========================
+    # ADMIN: Variaciones asignadas por material (tabla puente)
+    # GET /api/admin/variaciones/asignadas?tipo_plancha_id=ID
+    # =========================
+    def _get_admin_variaciones_asignadas(self, parsed):
+        qs = parse_qs(parsed.query or "")
+        tipo_plancha_id = (qs.get("tipo_plancha_id", [""])[0] or "").strip()
+
+        if not tipo_plancha_id:
+            return send_json(self, 400, err("VALIDATION_ERROR", "Debe indicar tipo_plancha_id."))
+
+        try:
+            svc = CatalogosAdminService(self.db)
+            items = svc.listar_variaciones_asignadas(tipo_plancha_id)
+            return send_json(self, 200, ok({"items": items}))
+        except ValueError as ve:
+            code = str(ve)
+            if code == "ID_INVALIDO":
+                return send_json(self, 400, err("VALIDATION_ERROR", "tipo_plancha_id inválido."))
+            if code in ("MATERIAL_NOT_FOUND", "NOT_FOUND"):
+                return send_json(self, 404, err("NOT_FOUND", "Material no encontrado."))
+            return send_json(self, 400, err("VALIDATION_ERROR", "Solicitud inválida."))
+        except Exception:
+            return send_json(self, 500, err("DB_ERROR", "Error al obtener variaciones asignadas."))
+
+    # =========================
+    # ADMIN: STATUS (legacy) - X-Admin-Key
+    # GET /api/admin/status
+    # =========================
+    def _get_admin_status(self, parsed):
+        try:
+            rid_extras = None
             try:
-                data = self.catalogos.get_catalogos()
-                return send_json(self, 200, ok(data))
+                rid_extras = self._get_extras_rid_if_any()
             except Exception:
-                return send_json(self, 500, err("DB_ERROR", "Error al obtener catálogos."))
-
-        # =========================
-        # ADMIN: CATÁLOGOS (CRUD UI) - legacy (X-Admin-Key)
-        # =========================
-        if parsed.path == "/api/admin/catalogos":
-            if not self._handle_admin_guard():
-                return
-            try:
-                svc = CatalogosAdminService(self.db)
-                data = svc.listar()
-                return send_json(self, 200, ok(data))
-            except ValueError as ve:
-                code = str(ve)
-                if code == "CATALOGO_INVALIDO":
-                    return send_json(self, 400, err("VALIDATION_ERROR", "Catálogo inválido."))
-                return send_json(self, 400, err("VALIDATION_ERROR", "Solicitud inválida."))
-            except Exception:
-                return send_json(self, 500, err("DB_ERROR", "Error al obtener catálogos (admin)."))
-
-        # =========================
-        # ADMIN: Variaciones asignadas por material (tabla puente)
-        # GET /api/admin/variaciones/asignadas?tipo_plancha_id=ID
-        # =========================
-        if parsed.path == "/api/admin/variaciones/asignadas":
-            if not self._handle_admin_guard():
-                return
-
-            qs = parse_qs(parsed.query or "")
-            tipo_plancha_id = (qs.get("tipo_plancha_id", [""])[0] or "").strip()
-
-            if not tipo_plancha_id:
-                return send_json(self, 400, err("VALIDATION_ERROR", "Debe indicar tipo_plancha_id."))
-
-            try:
-                svc = CatalogosAdminService(self.db)
-                items = svc.listar_variaciones_asignadas(tipo_plancha_id)
-                return send_json(self, 200, ok({"items": items}))
-            except ValueError as ve:
-                code = str(ve)
-                if code == "ID_INVALIDO":
-                    return send_json(self, 400, err("VALIDATION_ERROR", "tipo_plancha_id inválido."))
-                if code in ("MATERIAL_NOT_FOUND", "NOT_FOUND"):
-                    return send_json(self, 404, err("NOT_FOUND", "Material no encontrado."))
-                return send_json(self, 400, err("VALIDATION_ERROR", "Solicitud inválida."))
-            except Exception:
-                return send_json(self, 500, err("DB_ERROR", "Error al obtener variaciones asignadas."))
-
-        # =========================
-        # ADMIN: STATUS (legacy) - X-Admin-Key
-        # GET /api/admin/status
-        # =========================
-        if parsed.path == "/api/admin/status":
-            if not self._handle_admin_guard():
-                return
-
-            try:
                 rid_extras = None
-                try:
-                    rid_extras = self._get_extras_rid_if_any()
-                except Exception:
-                    rid_extras = None
-
-                extras_active = rid_extras is not None
-
-                return send_json(
-                    self,
-                    200,
-                    ok({"admin": True, "extras_active": extras_active, "extras_rid": rid_extras}),
-                )
-            except Exception:
-                return send_json(self, 500, err("DB_ERROR", "Error al obtener estado administrativo."))
-
-        # =========================
-        # ADMIN (CAPA 2): USUARIOS - Bearer + RBAC
-        # GET /api/admin/usuarios?q=...&rol=...&activos=0|1
-        # =========================
-        if parsed.path == "/api/admin/usuarios":
-            if not self._handle_admin_user_guard():
-                return
 
-            qs = parse_qs(parsed.query or "")
-            q = (qs.get("q") or [""])[0]
-            rol = (qs.get("rol") or [""])[0]
-            activos_raw = (qs.get("activos") or [""])[0]
-
-            activos = None
-            if activos_raw in ("0", "1"):
-                activos = int(activos_raw)
-
-            svc = getattr(self, "admin_usuarios", None) or AdminUsuariosService(self.db)
-            data = svc.listar(q=q, activos=activos, rol=rol)
-            return send_json(self, 200, ok({"items": data}))
-
-        # =========================================================
-        # ADMIN (CAPA 2): Password change requests (Variante 2)
-        # GET /api/admin/usuarios/password-change/status?usuario_id=ID
-        # GET /api/admin/usuarios/password-change/pending
-        # =========================================================
-        if parsed.path == "/api/admin/usuarios/password-change/status":
-            if not self._handle_admin_user_guard():
+            extras_active = rid_extras is not None
+
+            return send_json(
+                self,
+                200,
+                ok({"admin": True, "extras_active": extras_active, "extras_rid": rid_extras}),
+            )
+        except Exception:
+            return send_json(self, 500, err("DB_ERROR", "Error al obtener estado administrativo."))
+
+    # =========================
+    # ADMIN: estadísticas de queries (DB_QUERY_STATS=1 o DB_SLOW_QUERY_MS > 0)
+    # GET /api/admin/db/queries?orden=total|p99|calls|max|rows&limit=N
+    # =========================
+    def _get_admin_db_queries(self, parsed):
+        stats = self.db.query_stats
+        if stats is None:
+            return send_json(self, 200, ok({"enabled": False, "pid": os.getpid()}))
+        qs = parse_qs(parsed.query or "")
+        orden = (qs.get("orden") or ["total"])[0]
+        try:
+            limit = max(1, min(500, int((qs.get("limit") or ["50"])[0])))
+        except ValueError:
+            return send_json(self, 400, err("VALIDATION_ERROR", "limit inválido."))
+        try:
+            data = stats.snapshot(order=orden, limit=limit)
+        except ValueError:
+            return send_json(self, 400, err("VALIDATION_ERROR", "orden debe ser total, p99, calls, max o rows."))
+        data.update({"enabled": True, "pid": os.getpid()})
+        return send_json(self, 200, ok(data))
+
+    # =========================
+    # ADMIN (CAPA 2): USUARIOS - Bearer + RBAC
+    # GET /api/admin/usuarios?q=...&rol=...&activos=0|1
+    # =========================
+    def _get_admin_usuarios(self, parsed):
+        qs = parse_qs(parsed.query or "")
+        q = (qs.get("q") or [""])[0]
+        rol = (qs.get("rol") or [""])[0]
+        activos_raw = (qs.get("activos") or [""])[0]
+
+        activos = None
+        if activos_raw in ("0", "1"):
+            activos = int(activos_raw)
+
+        svc = getattr(self, "admin_usuarios", None) or AdminUsuariosService(self.db)
+        data = svc.listar(q=q, activos=activos, rol=rol)
+        return send_json(self, 200, ok({"items": data}))
+
+    # =========================================================
+    # ADMIN (CAPA 2): Password change requests (Variante 2)
+    # GET /api/admin/usuarios/password-change/status?usuario_id=ID
+    # GET /api/admin/usuarios/password-change/pending
+    # =========================================================
+    def _get_admin_password_change_status(self, parsed):
+        qs = parse_qs(parsed.query or "")
+        uid_raw = (qs.get("usuario_id") or qs.get("id") or [""])[0]
+        try:
+            usuario_id = int(uid_raw or 0)
+            if usuario_id <= 0:
+                raise ValueError()
+        except Exception:
+            return send_json(self, 400, err("VALIDATION_ERROR", "usuario_id inválido."))
+
+        try:
+            svc = getattr(self, "clave_cambio", None) or ClaveCambioService(self.db)
+            data = svc.get_status(usuario_id=usuario_id, history_limit=5)
+            return send_json(self, 200, ok(data))
+        except Exception:
+            return send_json(self, 500, err("DB_ERROR", "Error al obtener estado de solicitud de cambio de contraseña."))
+
+    def _get_admin_password_change_pending(self, parsed):
+        # Lista global de solicitudes PENDING vigentes con datos básicos del usuario
+        try:
+            rows = self.db.query_all(
+                """
+                SELECT
+                  u.id AS usuario_id,
+                  u.nombre,
+                  u.apellido,
+                  u.email,
+                  u.username,
+                  u.rol,
+                  u.activo,
+                  p.id AS request_id,
+                  p.creado_en,
+                  p.expira_en,
+                  p.origen_ip
+                FROM password_change_request p
+                JOIN usuario u ON u.id = p.usuario_id
+                WHERE p.estado = 'PENDING'
+                  AND p.expira_en >= datetime('now')
+                ORDER BY p.creado_en DESC;
+                """
+            ) or []
+            return send_json(self, 200, ok({"items": rows}))
+        except Exception:
+            return send_json(self, 500, err("DB_ERROR", "Error al listar solicitudes pendientes."))
+
+    # =========================
+    # EXPORT (CSV)
+    # =========================
+    def _get_export_pedidos(self, parsed):
+        qs = parse_qs(parsed.query or "")
+        desde = (qs.get("desde", [""])[0] or "").strip()
+        hasta = (qs.get("hasta", [""])[0] or "").strip()
+        try:
+            chunks, fname = self.export.export_pedidos_csv(desde=desde, hasta=hasta)
+            return self._send_csv(chunks, fname)
+        except ValueError as ve:
+            if str(ve) == "DATE_RANGE_INVALID":
+                return send_json(self, 400, err("VALIDATION_ERROR", "Rango de fechas inválido (desde > hasta)."))
+            return send_json(self, 400, err("VALIDATION_ERROR", "Parámetros inválidos para exportación."))
+        except Exception:
+            return send_json(self, 500, err("DB_ERROR", "Error al exportar pedidos."))
+
+    def _get_export_anomalias(self, parsed):
+        qs = parse_qs(parsed.query or "")
+        desde = (qs.get("desde", [""])[0] or "").strip()
+        hasta = (qs.get("hasta", [""])[0] or "").strip()
+        try:
+            chunks, fname = self.export.export_anomalias_csv(desde=desde, hasta=hasta)
+            return self._send_csv(chunks, fname)
+        except ValueError as ve:
+            if str(ve) == "DATE_RANGE_INVALID":
+                return send_json(self, 400, err("VALIDATION_ERROR", "Rango de fechas inválido (desde > hasta)."))
+            return send_json(self, 400, err("VALIDATION_ERROR", "Parámetros inválidos para exportación."))
+        except Exception:
+            return send_json(self, 500, err("DB_ERROR", "Error al exportar anomalías."))
+
+    # =========================
+    # PEDIDOS
+    # =========================
+    def _get_pedidos(self, parsed):
+        qs = parse_qs(parsed.query or "")
+        estado = (qs.get("estado", ["general"])[0] or "general").strip()
+        q = (qs.get("q", [""])[0] or "").strip()
+
+        archivados_flag = (qs.get("archivados", ["0"])[0] or "0").strip()
+        archivados_only = archivados_flag == "1"
+
+        if archivados_only:
+            rid = self._handle_extras_guard()
+            if rid is None:
                 return
-
-            qs = parse_qs(parsed.query or "")
-            uid_raw = (qs.get("usuario_id") or qs.get("id") or [""])[0]
-            try:
-                usuario_id = int(uid_raw or 0)
-                if usuario_id <= 0:
-                    raise ValueError()
-            except Exception:
-                return send_json(self, 400, err("VALIDATION_ERROR", "usuario_id inválido."))
-
-            try:
-                svc = getattr(self, "clave_cambio", None) or ClaveCambioService(self.db)
-                data = svc.get_status(usuario_id=usuario_id, history_limit=5)
-                return send_json(self, 200, ok(data))
-            except Exception:
-                return send_json(self, 500, err("DB_ERROR", "Error al obtener estado de solicitud de cambio de contraseña."))
-
-        if parsed.path == "/api/admin/usuarios/password-change/pending":
-            if not self._handle_admin_user_guard():
+            estado = "archivado"
+
+        # Paginación keyset opcional: ?limit=N&cursor=<next_cursor>
+        # Búsqueda rankeada: ?q=...&orden=relevancia (una sola página, sin cursor)
+        orden = (qs.get("orden", ["reciente"])[0] or "reciente").strip()
+        ranked = bool(q) and orden == "relevancia"
+        try:
+            limit = parse_limit(qs.get("limit", [""])[0])
+            cursor_raw = (qs.get("cursor", [""])[0] or "").strip()
+            cursor = decode_cursor(cursor_raw) if cursor_raw else None
+            if cursor and ranked:
+                raise ValueError("CURSOR_INVALIDO")
+        except ValueError:
+            return send_json(self, 400, err("VALIDATION_ERROR", "Parámetros de paginación inválidos."))
+
+        try:
+            # ETag por contadores de cambios: 304 sin ejecutar el listado
+            etag = self.versiones.etag(self.path, "pedido", "catalogos")
+            if etag_matches(self, etag):
+                return send_not_modified(self, etag)
+
+            rows = self.pedidos.listar_pedidos(
+                estado=estado,
+                q=q if q else None,
+                incluir_archivados=archivados_only,
+                limit=(limit + 1) if limit is not None else None,
+                cursor=cursor,
+                orden=orden,
+            )
+            items, next_cursor = split_page(rows, limit)
+            if ranked:
+                next_cursor = None
+            return send_json(self, 200, ok({"items": items, "next_cursor": next_cursor}), etag_headers(etag))
+        except Exception:
+            return send_json(self, 500, err("DB_ERROR", "Error al listar pedidos."))
+
+    def _get_pedido(self, parsed, item_id):
+        try:
+            pedido_id = self._parse_pos_int(item_id)
+        except ValueError:
+            return send_json(self, 400, err("VALIDATION_ERROR", "ID de pedido inválido."))
+
+        try:
+            etag = self.versiones.etag(parsed.path, "pedido", "catalogos")
+            if etag_matches(self, etag):
+                return send_not_modified(self, etag)
+
+            row = self.pedidos.obtener_pedido_detalle(pedido_id)
+            if not row:
+                return send_json(self, 404, err("NOT_FOUND", "Pedido no encontrado."))
+            return send_json(self, 200, ok(row), etag_headers(etag))
+        except Exception:
+            return send_json(self, 500, err("DB_ERROR", "Error al obtener detalle del pedido."))
+
+    # =========================
+    # ANOMALÍAS
+    # =========================
+    def _get_anomalias(self, parsed):
+        qs = parse_qs(parsed.query or "")
+        estado = (qs.get("estado", ["todos"])[0] or "todos").strip()
+        q = (qs.get("q", [""])[0] or "").strip()
+
+        archivados_flag = (qs.get("archivados", ["0"])[0] or "0").strip()
+        archivados_only = archivados_flag == "1"
+
+        if archivados_only:
+            rid = self._handle_extras_guard()
+            if rid is None:
                 return
-
-            # Lista global de solicitudes PENDING vigentes con datos básicos del usuario
-            try:
-                rows = self.db.query_all(
-                    """
-                    SELECT
-                      u.id AS usuario_id,
-                      u.nombre,
-                      u.apellido,
-                      u.email,
-                      u.username,
-                      u.rol,
-                      u.activo,
-                      p.id AS request_id,
-                      p.creado_en,
-                      p.expira_en,
-                      p.origen_ip
-                    FROM password_change_request p
-                    JOIN usuario u ON u.id = p.usuario_id
-                    WHERE p.estado = 'PENDING'
-                      AND p.expira_en >= datetime('now')
-                    ORDER BY p.creado_en DESC;
-                    """
-                ) or []
-                return send_json(self, 200, ok({"items": rows}))
-            except Exception:
-                return send_json(self, 500, err("DB_ERROR", "Error al listar solicitudes pendientes."))
-
-        # =========================
-        # EXPORT (CSV)
-        # =========================
-        if parsed.path in ("/api/export/pedidos.csv", "/api/exportar/pedidos.csv"):
-            qs = parse_qs(parsed.query or "")
-            desde = (qs.get("desde", [""])[0] or "").strip()
-            hasta = (qs.get("hasta", [""])[0] or "").strip()
-            try:
-                content, fname = self.export.export_pedidos_csv(desde=desde, hasta=hasta)
-                return self._send_csv(content, fname)
-            except ValueError as ve:
-                if str(ve) == "DATE_RANGE_INVALID":
-                    return send_json(self, 400, err("VALIDATION_ERROR", "Rango de fechas inválido (desde > hasta)."))
-                return send_json(self, 400, err("VALIDATION_ERROR", "Parámetros inválidos para exportación."))
-            except Exception:
-                return send_json(self, 500, err("DB_ERROR", "Error al exportar pedidos."))
-
-        if parsed.path in ("/api/export/anomalias.csv", "/api/exportar/anomalias.csv"):
-            qs = parse_qs(parsed.query or "")
-            desde = (qs.get("desde", [""])[0] or "").strip()
-            hasta = (qs.get("hasta", [""])[0] or "").strip()
-            try:
-                content, fname = self.export.export_anomalias_csv(desde=desde, hasta=hasta)
-                return self._send_csv(content, fname)
-            except ValueError as ve:
-                if str(ve) == "DATE_RANGE_INVALID":
-                    return send_json(self, 400, err("VALIDATION_ERROR", "Rango de fechas inválido (desde > hasta)."))
-                return send_json(self, 400, err("VALIDATION_ERROR", "Parámetros inválidos para exportación."))
-            except Exception:
-                return send_json(self, 500, err("DB_ERROR", "Error al exportar anomalías."))
-
-        # =========================
-        # PEDIDOS
-        # =========================
-        if parsed.path == "/api/pedidos":
-            qs = parse_qs(parsed.query or "")
-            estado = (qs.get("estado", ["general"])[0] or "general").strip()
-            q = (qs.get("q", [""])[0] or "").strip()
-
-            archivados_flag = (qs.get("archivados", ["0"])[0] or "0").strip()
-            archivados_only = archivados_flag == "1"
-
-            if archivados_only:
-                rid = self._handle_extras_guard()
-                if rid is None:
-                    return
-                estado = "archivado"
-
-            try:
-                items = self.pedidos.listar_pedidos(
-                    estado=estado,
-                    q=q if q else None,
-                    incluir_archivados=archivados_only,
-                )
-                return send_json(self, 200, ok({"items": items}))
-            except Exception:
-                return send_json(self, 500, err("DB_ERROR", "Error al listar pedidos."))
-
-        if parsed.path.startswith("/api/pedidos/"):
-            tail = parsed.path.split("/api/pedidos/", 1)[1].strip("/")
-            if "/" in tail:
-                return send_json(self, 404, err("NOT_FOUND", "Endpoint no encontrado."))
-
-            try:
-                pedido_id = self._parse_pos_int(tail)
-            except ValueError:
-                return send_json(self, 400, err("VALIDATION_ERROR", "ID de pedido inválido."))
-
-            try:
-                row = self.pedidos.obtener_pedido_detalle(pedido_id)
-                if not row:
-                    return send_json(self, 404, err("NOT_FOUND", "Pedido no encontrado."))
-                return send_json(self, 200, ok(row))
-            except Exception:
-                return send_json(self, 500, err("DB_ERROR", "Error al obtener detalle del pedido."))
-
-        # =========================
-        # ANOMALÍAS
-        # =========================
-        if parsed.path == "/api/anomalias":
-            qs = parse_qs(parsed.query or "")
-            estado = (qs.get("estado", ["todos"])[0] or "todos").strip()
-            q = (qs.get("q", [""])[0] or "").strip()
-
-            archivados_flag = (qs.get("archivados", ["0"])[0] or "0").strip()
-            archivados_only = archivados_flag == "1"
-
-            if archivados_only:
-                rid = self._handle_extras_guard()
-                if rid is None:
-                    return
-                estado = "archivado"
-
-            try:
-                items = self.anomalias.listar_anomalias(
-                    estado=estado,
-                    q=q if q else None,
-                    incluir_archivados=archivados_only,
-                )
-                return send_json(self, 200, ok({"items": items}))
-            except Exception:
-                return send_json(self, 500, err("DB_ERROR", "Error al listar anomalías."))
-
-        if parsed.path.startswith("/api/anomalias/"):
-            tail = parsed.path.split("/api/anomalias/", 1)[1].strip("/")
-            if "/" in tail:
-                return send_json(self, 404, err("NOT_FOUND", "Endpoint no encontrado."))
-
-            try:
-                anomalia_id = self._parse_pos_int(tail)
-            except ValueError:
-                return send_json(self, 400, err("VALIDATION_ERROR", "ID de anomalía inválido."))
-
-            try:
-                row = self.anomalias.obtener_anomalia_detalle(anomalia_id)
-                if not row:
-                    return send_json(self, 404, err("NOT_FOUND", "Anomalía no encontrada."))
-                return send_json(self, 200, ok(row))
-            except Exception:
-                return send_json(self, 500, err("DB_ERROR", "Error al obtener detalle de la anomalía."))
-
-        return send_json(self, 404, err("NOT_FOUND", "Endpoint no encontrado."))
+            estado = "archivado"
+
+        # Paginación keyset opcional: ?limit=N&cursor=<next_cursor>
+        # Búsqueda rankeada: ?q=...&orden=relevancia (una sola página, sin cursor)
+        orden = (qs.get("orden", ["reciente"])[0] or "reciente").strip()
+        ranked = bool(q) and orden == "relevancia"
+        try:
+            limit = parse_limit(qs.get("limit", [""])[0])
+            cursor_raw = (qs.get("cursor", [""])[0] or "").strip()
+            cursor = decode_cursor(cursor_raw) if cursor_raw else None
+            if cursor and ranked:
+                raise ValueError("CURSOR_INVALIDO")
+        except ValueError:
+            return send_json(self, 400, err("VALIDATION_ERROR", "Parámetros de paginación inválidos."))
+
+        try:
+            etag = self.versiones.etag(self.path, "anomalia", "catalogos")
+            if etag_matches(self, etag):
+                return send_not_modified(self, etag)
+
+            rows = self.anomalias.listar_anomalias(
+                estado=estado,
+                q=q if q else None,
+                incluir_archivados=archivados_only,
+                limit=(limit + 1) if limit is not None else None,
+                cursor=cursor,
+                orden=orden,
+            )
+            items, next_cursor = split_page(rows, limit)
+            if ranked:
+                next_cursor = None
+            return send_json(self, 200, ok({"items": items, "next_cursor": next_cursor}), etag_headers(etag))
+        except Exception:
+            return send_json(self, 500, err("DB_ERROR", "Error al listar anomalías."))
+
+    def _get_anomalia(self, parsed, item_id):
+        try:
+            anomalia_id = self._parse_pos_int(item_id)
+        except ValueError:
+            return send_json(self, 400, err("VALIDATION_ERROR", "ID de anomalía inválido."))
+
+        try:
+            etag = self.versiones.etag(parsed.path, "anomalia", "catalogos")
+            if etag_matches(self, etag):
+                return send_not_modified(self, etag)
+
+            row = self.anomalias.obtener_anomalia_detalle(anomalia_id)
+            if not row:
+                return send_json(self, 404, err("NOT_FOUND", "Anomalía no encontrada."))
+            return send_json(self, 200, ok(row), etag_headers(etag))
+        except Exception:
+            return send_json(self, 500, err("DB_ERROR", "Error al obtener detalle de la anomalía."))
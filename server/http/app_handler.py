@@ -12,6 +12,7 @@ from server.services.pedidos_service import PedidosService
 from server.services.anomalias_service import AnomaliasService
 from server.services.export_service import ExportService
 from server.services.extras_service import ExtrasService
+from server.services.versiones_service import VersionesService
 
 from server.services.auth_service import AuthService
 from server.services.admin_usuarios_service import AdminUsuariosService
@@ -22,7 +23,9 @@ from server.http.api_post import ApiPostMixin
 from server.utils.http_utils import send_json, err
 
 # Rate limit (module dedicado)
-from server.http.rate_limit import rate_limit_check, RateRule
+from server.http.rate_limit import rate_limit_check
+from server.http.metrics import METRICS
+from server.http.routes import ROUTER
 
 
 class AppHandler(
@@ -34,7 +37,12 @@ class AppHandler(
     ApiGetMixin,
     ApiPostMixin,
 ):
-    db = Database(CONFIG.db_path)
+    db = Database(
+        CONFIG.db_path,
+        pool_size=CONFIG.db_pool_size,
+        pool_timeout=CONFIG.db_pool_timeout,
+        pragmas=CONFIG.db_pragmas(),
+    )
 
     # Servicios existentes
     catalogos = CatalogoService(db)
@@ -43,58 +51,74 @@ class AppHandler(
     anomalias = AnomaliasService(db)
     export = ExportService(db)
     extras = ExtrasService(db)
+    versiones = VersionesService(db)
 
     # Servicios capa 2
     auth = AuthService(db)
     admin_usuarios = AdminUsuariosService(db)
 
     # =========================
-    # RATE LIMIT (políticas)
+    # KEEP-ALIVE (HTTP/1.1)
     # =========================
-    # Reglas por prefijo/path para no tocar api_post (800+ líneas).
-    # Pensado para uso real (móvil) sin bloquear uso normal.
-    _RL_RULES = [
-        # -------------------------
-        # AUTH: login/register/reset
-        # -------------------------
-        ("POST", "/api/auth/login", RateRule(20, 10 * 60)),            # 20 / 10 min / IP (suave)
-        ("POST", "/api/auth/register", RateRule(10, 10 * 60)),         # 10 / 10 min / IP
-        ("POST", "/api/auth/logout", RateRule(60, 10 * 60)),           # 60 / 10 min / IP
-        ("POST", "/api/auth/password/forgot", RateRule(20, 10 * 60)),  # 20 / 10 min / IP (además del 2/8h interno)
-        ("POST", "/api/auth/password/reset", RateRule(10, 10 * 60)),   # si existiera
-
-        # -------------------------
-        # EXTRAS: elevate (sensible, pero debe permitir uso frecuente)
-        # -------------------------
-        # Suave para permitir activar/desactivar en iteraciones (móvil / operación).
-        ("POST", "/api/extras/elevate", RateRule(60, 60)),             # 60 / min / IP
-        ("POST", "/api/admin/elevate", RateRule(60, 60)),              # 60 / min / IP (alias legacy)
-
-        # -------------------------
-        # SESIÓN: iniciar turno (evitar spam accidental)
-        # -------------------------
-        ("POST", "/api/registro-turno/iniciar", RateRule(30, 60)),     # 30 / min / IP
-
-        # -------------------------
-        # ADMIN: prefijo completo (RBAC / Bearer)
-        # -------------------------
-        ("GET",  "/api/admin/", RateRule(180, 60)),                    # 180 / min / IP
-        ("POST", "/api/admin/", RateRule(120, 60)),                    # 120 / min / IP
-
-        # -------------------------
-        # EXPORT CSV (GET): puede ser “caro”
-        # -------------------------
-        ("GET", "/api/export/", RateRule(30, 60)),                     # 30 / min / IP
-        ("GET", "/api/exportar/", RateRule(30, 60)),                   # 30 / min / IP
-
-        # -------------------------
-        # CRUD operacional (móvil): listar/detalle y crear/actualizar
-        # -------------------------
-        ("GET",  "/api/pedidos", RateRule(240, 60)),
-        ("POST", "/api/pedidos", RateRule(120, 60)),
-        ("GET",  "/api/anomalias", RateRule(240, 60)),
-        ("POST", "/api/anomalias", RateRule(120, 60)),
-    ]
+    # Toda respuesta lleva Content-Length (o chunked en CSV), así la conexión
+    # puede reutilizarse. timeout = inactividad máxima entre requests (socket).
+    protocol_version = "HTTP/1.1"
+    timeout = CONFIG.http_keepalive_timeout
+    # Headers y body salen en writes separados: sin esto Nagle + delayed ACK
+    # agregan ~40 ms por respuesta en conexiones reutilizadas.
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        # Pool: la conexión puede venir de un keep-alive estacionado (ver handle())
+        previas = getattr(self.server, "previous_responses", None)
+        self._respuestas = previas() if previas else 0
+
+    def handle(self):
+        # Igual que BaseHTTPRequestHandler.handle, pero entre requests el pool puede
+        # quedarse con la conexión ociosa y liberar este worker (PooledHTTPServer.park)
+        self.close_connection = True
+        self.handle_one_request()
+        park = getattr(self.server, "park", None)
+        while not self.close_connection:
+            if park is not None and park(self):
+                return
+            self.handle_one_request()
+
+    def send_response(self, code, message=None):
+        super().send_response(code, message)
+        self._status = code
+        self._respuestas += 1
+        max_req = CONFIG.http_keepalive_max_requests
+        if max_req > 0 and self._respuestas >= max_req:
+            # send_header("Connection", "close") también marca close_connection
+            self.send_header("Connection", "close")
+        elif self.request_version == "HTTP/1.0" and not self.close_connection:
+            # Cliente HTTP/1.0 que pidió keep-alive: hay que confirmarlo explícitamente
+            self.send_header("Connection", "keep-alive")
+
+    def _finish_body(self, max_body: int) -> None:
+        """
+        Bytes del body que ningún handler leyó (guard/429/ruta sin body) quedarían
+        en el socket y se interpretarían como el próximo request: se descartan,
+        o se cierra la conexión si son demasiados o no hay Content-Length.
+        """
+        if self.close_connection or getattr(self, "body_leido", False):
+            return
+        if (self.headers.get("Transfer-Encoding") or "").strip():
+            self.close_connection = True
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            self.close_connection = True
+            return
+        if length <= 0:
+            return
+        if length > max_body:
+            self.close_connection = True
+            return
+        self.rfile.read(length)
 
     def log_message(self, format, *args):
         return
@@ -111,38 +135,117 @@ class AppHandler(
         self.send_header("Content-Length", str(len(body)))
         self.send_header("Retry-After", str(int(retry_after or 1)))
         self.end_headers()
-        self.wfile.write(body)
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionAbortedError, ConnectionResetError):
+            self.close_connection = True
 
-    def _apply_rate_limit(self, method: str, path: str) -> bool:
+    def _check_rate(self, rate) -> bool:
         """
-        Aplica rate limit según reglas por prefijo/path.
-        Retorna True si puede continuar, False si ya respondió 429.
+        rate = (scope, regla) o None. Retorna True si puede continuar, False si ya respondió 429.
         """
-        for m, prefix, rule in self._RL_RULES:
-            if m == method and path.startswith(prefix):
-                allowed, retry = rate_limit_check(self, scope=f"{m}:{prefix}", rule=rule)
-                if not allowed:
-                    self._send_rate_limited(retry)
-                    return False
-                return True
+        if rate is None:
+            return True
+        scope, rule = rate
+        allowed, retry = rate_limit_check(self, scope=scope, rule=rule)
+        if not allowed:
+            METRICS.rate_limited(scope)
+            self._send_rate_limited(retry)
+            return False
         return True
 
-    def do_GET(self):
-        parsed = urlparse(self.path)
+    def _run_guards(self, guards, kwargs: dict) -> bool:
+        for g in guards:
+            if g == "admin":
+                ok = self._handle_admin_guard()
+            elif g == "admin_user":
+                ok = self._handle_admin_user_guard()
+            elif g == "user":
+                ok = self._handle_auth_guard()
+            elif g == "extras":
+                rid = self._handle_extras_guard()
+                ok = rid is not None
+                if ok:
+                    kwargs["rid_extras"] = rid
+            else:
+                raise RuntimeError(f"GUARD_DESCONOCIDO:{g}")
+            if not ok:
+                return False
+        return True
 
-        if parsed.path.startswith("/api/"):
-            if not self._apply_rate_limit("GET", parsed.path):
+    def _dispatch_api(self, method: str, parsed):
+        m = ROUTER.match(method, parsed.path)
+        if m is None:
+            self._route = "<no_match>"
+            # Sin ruta: igual cuenta para el límite del prefijo (sondeos a /api/admin/...)
+            if not self._check_rate(ROUTER.rate_rule_for(method, parsed.path)):
                 return
-            return self.handle_api_get(parsed)
+            return send_json(self, 404, err("NOT_FOUND", "Endpoint no encontrado."))
+
+        route, params = m
+        self._route = route.pattern
+        if not self._check_rate(route.rate):
+            return
+
+        if method == "POST":
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+            except ValueError:
+                length = 0
+            if length > route.max_body:
+                # No se lee el body: la conexión no puede reutilizarse
+                return send_json(
+                    self, 413, err("PAYLOAD_TOO_LARGE", "El cuerpo de la solicitud es demasiado grande."),
+                    headers={"Connection": "close"},
+                )
+
+        kwargs = dict(route.kwargs)
+        if not self._run_guards(route.guards, kwargs):
+            return
+        kwargs.update(params)
+        return getattr(self, route.handler)(parsed, **kwargs)
 
-        return self.serve_static(parsed.path)
+    # =========================
+    # MÉTRICAS (GET /api/metrics)
+    # =========================
+    # Latencia, status y tiempo en BD por ruta (patrón del router; estáticos = "static").
+    def _begin_metrics(self) -> float:
+        self._status = 500  # si el handler falla sin responder
+        self._route = "static"
+        return METRICS.begin()
+
+    def do_GET(self):
+        started = self._begin_metrics()
+        try:
+            parsed = urlparse(self.path)
+
+            if parsed.path.startswith("/api/"):
+                return self._dispatch_api("GET", parsed)
+
+            return self.serve_static(parsed.path)
+        finally:
+            # Estáticos no tocan la BD: sin serie de db_seconds
+            METRICS.end("GET", self._route, self._status, started, track_db=self._route != "static")
 
     def do_POST(self):
+        started = self._begin_metrics()
         parsed = urlparse(self.path)
+        self.body_leido = False
+
+        try:
+            if parsed.path.startswith("/api/"):
+                return self._dispatch_api("POST", parsed)
+
+            self._route = "<no_match>"
+            return send_json(self, 404, err("NOT_FOUND", "Recurso no encontrado."))
+        finally:
+            self._finish_body(CONFIG.http_max_body_bytes)
+            METRICS.end("POST", self._route, self._status, started)
 
-        if parsed.path.startswith("/api/"):
-            if not self._apply_rate_limit("POST", parsed.path):
-                return
-            return self.handle_api_post(parsed)
 
-        return send_json(self, 404, err("NOT_FOUND", "Recurso no encontrado."))
+# Falla al importar si alguna ruta apunta a un método inexistente
+ROUTER.check_handlers(AppHandler)
+# Tiempo en SQLite del request en curso (kp_http_request_db_seconds)
+AppHandler.db.add_observer(METRICS.add_db_time)
+if CONFIG.db_query_stats or CONFIG.db_slow_query_ms > 0:
+    AppHandler.db.enable_query_stats(CONFIG.db_slow_query_ms, CONFIG.db_query_stats_max)
@@ -0,0 +1,304 @@
+# server/http/asset_build.py
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+# Bundles con hash en el nombre: el contenido nunca cambia para una URL dada
+# (serve_static los envía con Cache-Control: immutable).
+BUNDLE_DIR = "assets/bundles"
+BUNDLE_PREFIX = "/" + BUNDLE_DIR + "/"
+
+# Tags locales que se agrupan (con atributos extra, ej: defer/type, quedan como están)
+_SCRIPT_RE = re.compile(r'<script\s+src="(/assets/[^"]+\.js)"\s*>\s*</script>')
+_LINK_RE = re.compile(r'<link\s+rel="stylesheet"\s+href="(/assets/[^"]+\.css)"\s*/?>')
+# Entre dos tags de un mismo bundle solo puede haber espacios o comentarios HTML
+_GAP_RE = re.compile(r"(?:\s|<!--.*?-->)*", re.S)
+
+_WS = " \t\r\n\f\v"
+# Después de estos caracteres/palabras, "/" abre un regex (no es una división)
+_REGEX_AFTER_CHARS = set("(,=:[!&|?{};+-*%<>~^")
+_REGEX_AFTER_WORDS = {
+    "return", "typeof", "case", "do", "else", "in", "of", "void", "throw",
+    "new", "delete", "instanceof", "yield", "await",
+}
+
+
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch in "_$\\"
+
+
+# =========================
+# Minificación (conservadora, sin renombrar)
+# =========================
+def minify_js(src: str) -> str:
+    """
+    Quita comentarios y colapsa espacios. Cada grupo de saltos de línea queda
+    como un "\\n" (no altera la inserción automática de ';').
+    Strings, templates (con ${...} anidados) y regex se copian tal cual.
+    """
+    out: List[str] = []
+    n = len(src)
+    i = 0
+    pending = ""  # separador pendiente: "", " " o "\n"
+    word = ""  # identificador/keyword en curso (detección de regex tras "return", etc.)
+    last_word = ""
+    braces: List[int] = []  # por cada ${ abierto: profundidad de { dentro
+
+    def emit(tok: str) -> None:
+        nonlocal pending
+        if pending and out:
+            prev = out[-1][-1]
+            if pending == "\n":
+                out.append("\n")
+            elif (_is_word(prev) and _is_word(tok[0])) or (prev in "+-" and tok[0] == prev):
+                out.append(" ")
+        pending = ""
+        out.append(tok)
+
+    def template_tail(j: int) -> int:
+        # Copia el texto de un template desde j hasta "`" (fin) o "${" (vuelve a código)
+        start = j
+        while j < n:
+            ch = src[j]
+            if ch == "\\":
+                j += 2
+                continue
+            if ch == "`":
+                out.append(src[start:j + 1])
+                return j + 1
+            if ch == "$" and j + 1 < n and src[j + 1] == "{":
+                out.append(src[start:j + 2])
+                braces.append(0)
+                return j + 2
+            j += 1
+        out.append(src[start:])
+        return n
+
+    while i < n:
+        c = src[i]
+
+        if _is_word(c):
+            word += c
+            emit(c)
+            i += 1
+            continue
+        if word:
+            last_word, word = word, ""
+
+        if c in _WS:
+            j = i
+            while j < n and src[j] in _WS:
+                j += 1
+            pending = "\n" if ("\n" in src[i:j] or pending == "\n") else " "
+            i = j
+            continue
+
+        if src.startswith("//", i):
+            j = src.find("\n", i)
+            i = n if j < 0 else j
+            continue
+
+        if src.startswith("/*", i):
+            j = src.find("*/", i + 2)
+            j = n if j < 0 else j + 2
+            pending = "\n" if ("\n" in src[i:j] or pending == "\n") else (pending or " ")
+            i = j
+            continue
+
+        prev = out[-1][-1] if out else ""
+        if c in "'\"":
+            j = i + 1
+            while j < n and src[j] != c:
+                j += 2 if src[j] == "\\" else 1
+            emit(src[i:j + 1])
+            i = j + 1
+        elif c == "`":
+            emit("`")
+            i = template_tail(i + 1)
+        elif c == "/" and (
+            not prev or prev in _REGEX_AFTER_CHARS or (_is_word(prev) and last_word in _REGEX_AFTER_WORDS)
+        ):
+            j = i + 1
+            in_class = False
+            while j < n and src[j] != "\n":
+                ch = src[j]
+                if ch == "\\":
+                    j += 2
+                    continue
+                if ch == "[":
+                    in_class = True
+                elif ch == "]":
+                    in_class = False
+                elif ch == "/" and not in_class:
+                    break
+                j += 1
+            emit(src[i:j + 1])
+            i = j + 1
+        elif c == "}" and braces and braces[-1] == 0:
+            # Cierre de ${...}: sigue el texto del template
+            braces.pop()
+            emit("}")
+            i = template_tail(i + 1)
+        else:
+            if braces and c == "{":
+                braces[-1] += 1
+            elif braces and c == "}":
+                braces[-1] -= 1
+            emit(c)
+            i += 1
+        last_word = ""
+
+    return "".join(out).strip()
+
+
+def minify_css(src: str) -> str:
+    """Quita comentarios y espacios alrededor de { } ; , > (selectores y valores intactos)."""
+    out: List[str] = []
+    n = len(src)
+    i = 0
+    pending = False
+    while i < n:
+        c = src[i]
+        if src.startswith("/*", i):
+            j = src.find("*/", i + 2)
+            i = n if j < 0 else j + 2
+            pending = True
+            continue
+        if c in _WS:
+            while i < n and src[i] in _WS:
+                i += 1
+            pending = True
+            continue
+        if c in "'\"":
+            j = i + 1
+            while j < n and src[j] != c:
+                j += 2 if src[j] == "\\" else 1
+            tok = src[i:j + 1]
+            i = j + 1
+        else:
+            tok = c
+            i += 1
+        prev = out[-1][-1] if out else ""
+        if pending and prev and prev not in "{};,>(" and tok[0] not in "{};,>)":
+            out.append(" ")
+        pending = False
+        if tok == "}" and prev == ";":
+            out[-1] = out[-1][:-1]
+        out.append(tok)
+    return "".join(out)
+
+
+# =========================
+# Build
+# =========================
+def _runs(html: str, rx: re.Pattern) -> List[List[re.Match]]:
+    # Tags consecutivos (sin HTML entre medio) -> un bundle por grupo, mismo orden
+    runs: List[List[re.Match]] = []
+    for m in rx.finditer(html):
+        if runs and _GAP_RE.fullmatch(html, runs[-1][-1].end(), m.start()):
+            runs[-1].append(m)
+        else:
+            runs.append([m])
+    return runs
+
+
+_KINDS = (
+    # (extensión, regex del tag, minificador, separador, tag de reemplazo)
+    ("css", _LINK_RE, minify_css, "\n", '<link rel="stylesheet" href="{}" />'),
+    ("js", _SCRIPT_RE, minify_js, "\n;\n", '<script src="{}"></script>'),
+)
+
+
+def _bundle(src_root: Path, urls: List[str], minify: Callable[[str], str], sep: str) -> Tuple[bytes, int]:
+    # Retorna (bundle, bytes de los originales)
+    parts = []
+    size = 0
+    for url in urls:
+        path = (src_root / url.lstrip("/")).resolve()
+        if not str(path).startswith(str(src_root) + os.sep) or not path.is_file():
+            raise ValueError(f"ASSET_NOT_FOUND: {url}")
+        text = path.read_text(encoding="utf-8")
+        size += len(text.encode("utf-8"))
+        parts.append(f"/* {url} */\n" + minify(text))
+    return (sep.join(parts) + "\n").encode("utf-8"), size
+
+
+def _write_if_changed(path: Path, data: bytes) -> bool:
+    # Sin cambios no se reescribe: mtime intacto => el StaticCache no recarga
+    try:
+        if path.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return True
+
+
+def build_assets(src_root: Path, out_root: Path) -> Dict[str, Any]:
+    """
+    Por cada página web/*.html: agrupa los <link rel="stylesheet"> y <script src>
+    locales consecutivos en un bundle minificado por página
+    (/assets/bundles/<pagina>.<hash>.css|js) y escribe la página reescrita en out_root.
+    Se calcula todo antes de escribir: si falta un archivo, out_root no se toca.
+    Retorna un resumen (páginas, bundles, bytes y requests por página antes/después).
+    """
+    src_root = Path(src_root).resolve()
+    out_root = Path(out_root).resolve()
+
+    pages: Dict[str, bytes] = {}
+    bundles: Dict[str, bytes] = {}
+    bytes_in = 0
+    requests_before = 0
+    requests_after = 0
+
+    for page in sorted(src_root.glob("*.html")):
+        html = page.read_text(encoding="utf-8")
+        for ext, rx, minify, sep, tag in _KINDS:
+            runs = _runs(html, rx)
+            # De atrás hacia adelante: los offsets de los grupos anteriores siguen valiendo
+            for k in range(len(runs) - 1, -1, -1):
+                run = runs[k]
+                urls = [m.group(1) for m in run]
+                requests_before += len(urls)
+                requests_after += 1
+                body, size = _bundle(src_root, urls, minify, sep)
+                bytes_in += size
+                digest = hashlib.sha256(body).hexdigest()[:12]
+                suffix = f".{k + 1}" if len(runs) > 1 else ""
+                name = f"{page.stem}{suffix}.{digest}.{ext}"
+                bundles[name] = body
+                html = html[:run[0].start()] + tag.format(BUNDLE_PREFIX + name) + html[run[-1].end():]
+        pages[page.name] = html.encode("utf-8")
+
+    written = 0
+    for name, data in pages.items():
+        written += _write_if_changed(out_root / name, data)
+    bundle_dir = out_root / BUNDLE_DIR
+    for name, data in bundles.items():
+        written += _write_if_changed(bundle_dir / name, data)
+
+    # Bundles de builds anteriores (otro hash) y páginas que ya no existen
+    removed = 0
+    stale = [p for p in bundle_dir.glob("*") if p.is_file() and p.name not in bundles]
+    stale += [p for p in out_root.glob("*.html") if p.name not in pages]
+    for p in stale:
+        p.unlink()
+        removed += 1
+
+    return {
+        "pages": len(pages),
+        "bundles": len(bundles),
+        "written": written,
+        "removed": removed,
+        "bytes_in": bytes_in,
+        "bytes_out": sum(len(b) for b in bundles.values()),
+        "requests_before": requests_before,
+        "requests_after": requests_after,
+    }
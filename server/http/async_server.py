@@ -0,0 +1,316 @@
+# server/http/async_server.py
+from __future__ import annotations
+
+import asyncio
+import io
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Dict, Optional
+
+from server.utils.http_utils import send_json, err
+
+# Límite de la cabecera (request line + headers) por request
+MAX_HEADER_BYTES = 64 * 1024
+# El worker deja de acumular y envía al loop cada N bytes (ej: CSV en streaming)
+WRITE_FLUSH_BYTES = 64 * 1024
+# Máximo que un worker espera a que el loop acepte sus bytes (cliente que no lee)
+WRITE_TIMEOUT_SECONDS = 60.0
+
+
+class _LoopWriter:
+    """
+    wfile del adaptador. Los handlers escriben como siempre (send_json, _send_csv):
+    - En el loop o con poco volumen: se acumula y el loop lo envía al terminar.
+    - Desde un worker, pasado WRITE_FLUSH_BYTES: se entrega al loop y el worker
+      espera el drain (backpressure: un export no se acumula en memoria).
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, writer: asyncio.StreamWriter):
+        self._loop = loop
+        self._writer = writer
+        self._loop_thread = threading.get_ident()
+        self._buf = bytearray()
+        self._file = None  # (archivo, largo) pendiente de loop.sendfile
+        self.sent = 0
+
+    def write(self, data) -> int:
+        n = len(data)
+        self._buf += data
+        if len(self._buf) >= WRITE_FLUSH_BYTES and threading.get_ident() != self._loop_thread:
+            data, self._buf = bytes(self._buf), bytearray()
+            fut = asyncio.run_coroutine_threadsafe(self._send(data), self._loop)
+            try:
+                fut.result(timeout=WRITE_TIMEOUT_SECONDS)
+            except FutureTimeout:
+                fut.cancel()
+                raise ConnectionAbortedError("WRITE_TIMEOUT")
+        return n
+
+    def flush(self) -> None:
+        return
+
+    def sendfile(self, f, length: int) -> None:
+        """
+        Cuerpo desde archivo (serve_static). En el loop: se envía en aflush con
+        loop.sendfile (os.sendfile si el transporte lo permite). Desde un worker:
+        copia en bloques por write (mismo backpressure que el resto).
+        Se hace cargo de cerrar `f`.
+        """
+        if threading.get_ident() == self._loop_thread and self._file is None:
+            self._file = (f, length)
+            return
+        try:
+            left = length
+            while left > 0:
+                chunk = f.read(min(WRITE_FLUSH_BYTES, left))
+                if not chunk:
+                    break
+                self.write(chunk)
+                left -= len(chunk)
+        finally:
+            f.close()
+
+    async def _send(self, data: bytes) -> None:
+        self._writer.write(data)
+        self.sent += len(data)
+        await self._writer.drain()
+
+    async def aflush(self) -> None:
+        pending, self._file = self._file, None
+        try:
+            if self._buf:
+                data, self._buf = bytes(self._buf), bytearray()
+                await self._send(data)
+            if pending is not None:
+                f, length = pending
+                sent = await self._loop.sendfile(self._writer.transport, f, 0, length)
+                self.sent += sent
+                if sent < length:
+                    # El archivo se achicó: el cliente espera Content-Length bytes
+                    raise ConnectionAbortedError("SHORT_FILE")
+        finally:
+            if pending is not None:
+                pending[0].close()
+
+
+def _adapter_class(handler_class):
+    """
+    Subclase del handler que no se ata a un socket: el loop parsea y entrega
+    rfile (body ya leído) y wfile (_LoopWriter). Los mixins corren sin cambios.
+    """
+
+    class AsyncRequestAdapter(handler_class):
+        def __init__(self, server, client_address, rfile, wfile, respuestas: int):
+            # No se llama a BaseRequestHandler.__init__ (haría setup/handle/finish)
+            self.server = server
+            self.client_address = client_address
+            self.rfile = rfile
+            self.wfile = wfile
+            self.close_connection = True
+            self._respuestas = respuestas
+
+        def handle_expect_100(self):
+            # El loop responde "100 Continue" antes de leer el body
+            return True
+
+    AsyncRequestAdapter.__name__ = f"Async{handler_class.__name__}"
+    return AsyncRequestAdapter
+
+
+class AsyncHTTPServer:
+    """
+    Front end asyncio (HTTP_SERVER_MODE=async):
+    - Conexiones, parseo, keep-alive y static en el event loop: una conexión
+      ociosa cuesta una corrutina, no un thread.
+    - /api/* (servicios bloqueantes: SQLite, auth) corre en un ThreadPoolExecutor
+      de `workers` threads, con a lo sumo `queue_max` requests esperando; sobre
+      eso se responde 503 + Retry-After (mismo contrato que el modo "pool").
+    - El handler (AppHandler) se usa tal cual a través de un adaptador.
+    Interfaz compatible con server.main: serve_forever / shutdown / server_close.
+    """
+
+    def __init__(self, server_address, handler_class, workers: int = 16, queue_max: int = 64,
+                 retry_after: int = 1, keepalive_timeout: float = 15.0, max_body: int = 64 * 1024,
+                 reuse_port: bool = False):
+        self.handler_class = handler_class
+        self._adapter = _adapter_class(handler_class)
+        self.workers = max(1, int(workers))
+        self.queue_max = max(0, int(queue_max))
+        self.retry_after = max(1, int(retry_after))
+        self.keepalive_timeout = float(keepalive_timeout)
+        self.max_body = int(max_body)
+
+        self.socket = socket.create_server(server_address, backlog=1024, reuse_port=reuse_port)
+        self.server_address = self.socket.getsockname()[:2]
+
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="http-async")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._ready = threading.Event()
+
+        self._connections = 0
+        self._inflight = 0
+        self._served = 0
+        self._rejected = 0
+
+    # -----------------------
+    # Ciclo de vida
+    # -----------------------
+    def serve_forever(self) -> None:
+        asyncio.run(self._serve())
+
+    async def _serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        srv = await asyncio.start_server(self._handle_connection, sock=self.socket, limit=MAX_HEADER_BYTES)
+        self._ready.set()
+        try:
+            async with srv:
+                await self._stop.wait()
+        finally:
+            self._ready.clear()
+
+    def shutdown(self) -> None:
+        # Desde otro thread (mismo uso que socketserver.shutdown)
+        if self._loop is not None and self._stop is not None and self._ready.is_set():
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    def server_close(self) -> None:
+        try:
+            self.socket.close()
+        except OSError:
+            pass
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": "async",
+            "connections": self._connections,
+            "pid": os.getpid(),
+            "workers": self.workers,
+            "busy": min(self._inflight, self.workers),
+            "queue": max(0, self._inflight - self.workers),
+            "queue_max": self.queue_max,
+            "served": self._served,
+            "rejected": self._rejected,
+        }
+
+    # -----------------------
+    # Conexión
+    # -----------------------
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._connections += 1
+        peer = writer.get_extra_info("peername") or ("unknown", 0)
+        sock = writer.get_extra_info("socket")
+        if sock is not None:
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except OSError:
+                pass
+
+        respuestas = 0
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keepalive_timeout)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except (asyncio.LimitOverrunError, ValueError):
+                    writer.write(b"HTTP/1.1 431 Request Header Fields Too Large\r\n"
+                                 b"Content-Length: 0\r\nConnection: close\r\n\r\n")
+                    break
+
+                wfile = _LoopWriter(self._loop, writer)
+                line, _, rest = head.partition(b"\r\n")
+                h = self._adapter(self, peer[:2], io.BytesIO(rest), wfile, respuestas)
+                h.raw_requestline = line + b"\r\n"
+                if not h.parse_request():
+                    # parse_request ya respondió el error (400/505/431)
+                    await wfile.aflush()
+                    break
+
+                if not await self._read_body(h, reader, writer):
+                    await wfile.aflush()
+                    break
+
+                try:
+                    await self._dispatch(h)
+                finally:
+                    respuestas = h._respuestas
+                    self._served += 1
+                await wfile.aflush()
+                if h.close_connection:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._connections -= 1
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _read_body(self, h, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        """
+        Lee el body completo antes de despachar (el worker nunca espera red).
+        Retorna False si ya respondió y hay que cerrar la conexión.
+        """
+        if (h.headers.get("Transfer-Encoding") or "").strip():
+            send_json(h, 411, err("LENGTH_REQUIRED", "Se requiere Content-Length."), headers={"Connection": "close"})
+            return False
+        try:
+            length = int(h.headers.get("Content-Length") or 0)
+            if length < 0:
+                raise ValueError()
+        except ValueError:
+            send_json(h, 400, err("BAD_REQUEST", "Content-Length inválido."), headers={"Connection": "close"})
+            return False
+
+        if length > self.max_body:
+            send_json(
+                h, 413, err("PAYLOAD_TOO_LARGE", "El cuerpo de la solicitud es demasiado grande."),
+                headers={"Connection": "close"},
+            )
+            return False
+
+        if length > 0:
+            if (h.headers.get("Expect") or "").lower() == "100-continue":
+                writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            try:
+                body = await asyncio.wait_for(reader.readexactly(length), self.keepalive_timeout)
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                return False
+            h.rfile = io.BytesIO(body)
+        return True
+
+    async def _dispatch(self, h) -> None:
+        command = h.command
+        if command == "GET" and not h.path.startswith("/api/"):
+            # Static: en el loop (sin servicios bloqueantes)
+            return h.do_GET()
+
+        if command not in ("GET", "POST"):
+            return h.send_error(501, f"Unsupported method ({command!r})")
+
+        if self._inflight >= self.workers + self.queue_max:
+            self._rejected += 1
+            return send_json(
+                h, 503, err("SERVER_BUSY", "Servidor ocupado. Intenta nuevamente en unos segundos."),
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        self._inflight += 1
+        try:
+            await self._loop.run_in_executor(self._executor, getattr(h, "do_" + command))
+        except Exception:
+            h.close_connection = True
+            if h.wfile.sent == 0:
+                # Nada salió aún: se descarta lo parcial y se responde 500
+                h.wfile._buf.clear()
+                h._headers_buffer = []
+                send_json(h, 500, err("SERVER_ERROR", "Error interno."), headers={"Connection": "close"})
+        finally:
+            self._inflight -= 1
@@ -0,0 +1,246 @@
+# server/http/metrics.py
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Límites (segundos) de los histogramas de latencia (formato Prometheus: le = "<=")
+BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (method, route, status) / (method, route)
+_ReqKey = Tuple[str, str, str]
+_RouteKey = Tuple[str, str]
+
+
+def _new_hist() -> List[float]:
+    # Un contador por bucket + "+Inf", y la suma al final
+    return [0] * (len(BUCKETS) + 1) + [0.0]
+
+
+def _hist_add(hist: List[float], value: float) -> None:
+    hist[bisect_left(BUCKETS, value)] += 1
+    hist[-1] += value
+
+
+def _esc(v: Any) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**kw: Any) -> str:
+    return "{" + ",".join(f'{k}="{_esc(v)}"' for k, v in kw.items()) + "}"
+
+
+class RequestMetrics:
+    """
+    Métricas de requests en memoria (por proceso), expuestas en GET /api/metrics
+    (texto Prometheus 0.0.4):
+    - kp_http_requests_total{method,route,status}
+    - kp_http_request_duration_seconds{method,route}: latencia total (histograma)
+    - kp_http_request_db_seconds{method,route}: parte en SQLite (histograma);
+      tiempo de handler = duration_sum - db_sum
+    - kp_http_requests_in_flight, kp_rate_limit_rejections_total{scope}
+    - Series por proceso (workers, cola, 503, pool de BD, cache de estáticos) vía gauges_fn
+      (nombre terminado en _total => counter).
+    `route` es el patrón del router ("/api/pedidos/<item_id>"), no el path: cardinalidad acotada.
+
+    Prefork: cada proceso guarda un snapshot en metrics_dir cada sync_seconds y
+    el que atiende el scrape suma los de todos (cualquier proceso responde lo mismo).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._requests: Dict[_ReqKey, int] = {}
+        self._duration: Dict[_RouteKey, List[float]] = {}
+        self._db: Dict[_RouteKey, List[float]] = {}
+        self._rate_limited: Dict[str, int] = {}
+        self._in_flight = 0
+        self.gauges_fn: Optional[Callable[[], Dict[str, float]]] = None
+
+        self.process = "0"
+        self._dir: Optional[Path] = None
+        self._sync_seconds = 5.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # -----------------------
+    # Registro (hot path)
+    # -----------------------
+    def begin(self) -> float:
+        self._local.db = 0.0
+        with self._lock:
+            self._in_flight += 1
+        return time.perf_counter()
+
+    def end(self, method: str, route: str, status: Any, started: float, track_db: bool = True) -> None:
+        elapsed = time.perf_counter() - started
+        db = getattr(self._local, "db", 0.0)
+        self._local.db = None
+        key = (method, route)
+        with self._lock:
+            self._in_flight -= 1
+            rk = (method, route, str(status))
+            self._requests[rk] = self._requests.get(rk, 0) + 1
+            h = self._duration.get(key)
+            if h is None:
+                h = self._duration[key] = _new_hist()
+            _hist_add(h, elapsed)
+            if track_db:
+                h = self._db.get(key)
+                if h is None:
+                    h = self._db[key] = _new_hist()
+                _hist_add(h, db)
+
+    def add_db_time(self, sql: str, seconds: float) -> None:
+        # Observador de Database: suma al request en curso del hilo (si hay uno)
+        if getattr(self._local, "db", None) is not None:
+            self._local.db += seconds
+
+    def rate_limited(self, scope: str) -> None:
+        with self._lock:
+            self._rate_limited[scope] = self._rate_limited.get(scope, 0) + 1
+
+    # -----------------------
+    # Snapshot / multi-proceso
+    # -----------------------
+    def snapshot(self) -> Dict[str, Any]:
+        gauges = {}
+        if self.gauges_fn is not None:
+            try:
+                gauges = self.gauges_fn()
+            except Exception:
+                gauges = {}
+        with self._lock:
+            return {
+                "process": self.process,
+                "requests": [[*k, n] for k, n in self._requests.items()],
+                "duration": [[*k, list(h)] for k, h in self._duration.items()],
+                "db": [[*k, list(h)] for k, h in self._db.items()],
+                "rate_limited": [[k, n] for k, n in self._rate_limited.items()],
+                "in_flight": self._in_flight,
+                "gauges": gauges,
+            }
+
+    def configure(self, process: str, metrics_dir: Optional[Path], sync_seconds: float) -> None:
+        """metrics_dir None: un solo proceso (el snapshot propio alcanza)."""
+        self.process = str(process)
+        self._dir = Path(metrics_dir) if metrics_dir else None
+        self._sync_seconds = max(0.5, float(sync_seconds))
+
+    def start(self) -> None:
+        if self._dir is None or self._thread is not None:
+            return
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metrics-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        t = self._thread
+        if t is not None:
+            self._stop.set()
+            t.join(timeout=2.0)
+            self._thread = None
+            self._write()
+
+    def _run(self) -> None:
+        self._write()
+        while not self._stop.wait(self._sync_seconds):
+            self._write()
+
+    def _write(self) -> None:
+        if self._dir is None:
+            return
+        path = self._dir / f"proc-{self.process}.json"
+        tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+        try:
+            tmp.write_text(json.dumps(self.snapshot()), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def _collect(self) -> List[Dict[str, Any]]:
+        own = self.snapshot()
+        if self._dir is None:
+            return [own]
+        snaps = [own]
+        for p in sorted(self._dir.glob("proc-*.json")):
+            if p.name == f"proc-{self.process}.json":
+                continue
+            try:
+                snaps.append(json.loads(p.read_text(encoding="utf-8")))
+            except (OSError, ValueError):
+                continue
+        return snaps
+
+    # -----------------------
+    # Exposición
+    # -----------------------
+    def render(self) -> str:
+        snaps = self._collect()
+
+        requests: Dict[tuple, int] = {}
+        duration: Dict[tuple, List[float]] = {}
+        db: Dict[tuple, List[float]] = {}
+        rate_limited: Dict[str, int] = {}
+        in_flight = 0
+        for s in snaps:
+            for *k, n in s.get("requests", []):
+                requests[tuple(k)] = requests.get(tuple(k), 0) + n
+            for dst, name in ((duration, "duration"), (db, "db")):
+                for *k, h in s.get(name, []):
+                    acc = dst.setdefault(tuple(k), _new_hist())
+                    for i, v in enumerate(h):
+                        acc[i] += v
+            for k, n in s.get("rate_limited", []):
+                rate_limited[k] = rate_limited.get(k, 0) + n
+            in_flight += int(s.get("in_flight", 0))
+
+        out: List[str] = []
+        out.append("# HELP kp_http_requests_total Requests HTTP atendidos.")
+        out.append("# TYPE kp_http_requests_total counter")
+        for (method, route, status), n in sorted(requests.items()):
+            out.append(f"kp_http_requests_total{_labels(method=method, route=route, status=status)} {n}")
+
+        for name, data, help_ in (
+            ("kp_http_request_duration_seconds", duration, "Latencia total del request (segundos)."),
+            ("kp_http_request_db_seconds", db, "Tiempo en SQLite por request (segundos); handler = duration - db."),
+        ):
+            out.append(f"# HELP {name} {help_}")
+            out.append(f"# TYPE {name} histogram")
+            for (method, route), h in sorted(data.items()):
+                acc = 0
+                for le, n in zip(BUCKETS + (float("inf"),), h[:-1]):
+                    acc += n
+                    le_s = "+Inf" if le == float("inf") else repr(le)
+                    out.append(f"{name}_bucket{_labels(method=method, route=route, le=le_s)} {int(acc)}")
+                out.append(f"{name}_sum{_labels(method=method, route=route)} {h[-1]:.6f}")
+                out.append(f"{name}_count{_labels(method=method, route=route)} {int(acc)}")
+
+        out.append("# HELP kp_http_requests_in_flight Requests en curso (todos los procesos).")
+        out.append("# TYPE kp_http_requests_in_flight gauge")
+        out.append(f"kp_http_requests_in_flight {in_flight}")
+
+        out.append("# HELP kp_rate_limit_rejections_total Respuestas 429 por scope de rate limit.")
+        out.append("# TYPE kp_rate_limit_rejections_total counter")
+        for scope, n in sorted(rate_limited.items()):
+            out.append(f"kp_rate_limit_rejections_total{_labels(scope=scope)} {n}")
+
+        # Gauges por proceso (estado del pool HTTP/BD y caches): una serie por proceso
+        gauge_names = sorted({g for s in snaps for g in (s.get("gauges") or {})})
+        for g in gauge_names:
+            out.append(f"# TYPE kp_{g} {'counter' if g.endswith('_total') else 'gauge'}")
+            for s in snaps:
+                v = (s.get("gauges") or {}).get(g)
+                if v is not None:
+                    out.append(f"kp_{g}{_labels(process=s.get('process', '?'))} {v}")
+
+        return "\n".join(out) + "\n"
+
+
+METRICS = RequestMetrics()
@@ -1,10 +1,14 @@
 # server/http/mixins.py
-import mimetypes
+import itertools
+import os
+import socket
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 
 from server.config import CONFIG
+from server.http.static_cache import STATIC_CACHE, not_modified
 from server.services.extras_token import validate_extras_token
+from server.utils.compression import gzip_encoding_for, gzip_stream, is_compressible
 from server.utils.http_utils import send_json, err
 
 # --- AUTH USUARIOS (CAPA 2) ---
@@ -21,35 +25,149 @@ class HandlerHelpersMixin:
         except Exception:
             raise ValueError("ID_INVALID")
 
-    def _send_csv(self, content: bytes, filename: str):
-        self.send_response(200)
-        self.send_header("Content-Type", "text/csv; charset=utf-8")
-        self.send_header("Content-Disposition", f'attachment; filename="{filename}"')
-        self.send_header("Content-Length", str(len(content)))
-        self.end_headers()
-        self.wfile.write(content)
+    def _send_csv(self, chunks: Iterator[bytes], filename: str):
+        """
+        Envía un CSV en streaming (memoria acotada, sin Content-Length).
+        - HTTP/1.1: Transfer-Encoding: chunked (la conexión puede reutilizarse).
+        - HTTP/1.0: cuerpo hasta cerrar la conexión.
+        - Accept-Encoding: gzip => se comprime al vuelo (gzip_stream).
+        El primer chunk se genera antes de los headers: si la consulta falla,
+        la excepción llega al caller y todavía puede responder 500.
+        """
+        try:
+            first = next(chunks, b"")
+        except BaseException:
+            chunks.close()
+            raise
+
+        chunked = self.request_version == "HTTP/1.1" and self.protocol_version == "HTTP/1.1"
+        ctype = "text/csv; charset=utf-8"
+        gz = gzip_encoding_for(self, ctype)
+        body = gzip_stream(chunks, first) if gz else itertools.chain((first,), chunks)
+
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Disposition", f'attachment; filename="{filename}"')
+            if CONFIG.http_compression:
+                self.send_header("Vary", "Accept-Encoding")
+            if gz:
+                self.send_header("Content-Encoding", "gzip")
+            if chunked:
+                self.send_header("Transfer-Encoding", "chunked")
+            else:
+                self.send_header("Connection", "close")
+                self.close_connection = True
+            self.end_headers()
+
+            for data in body:
+                if not data:
+                    continue
+                if chunked:
+                    self.wfile.write(b"%X\r\n%s\r\n" % (len(data), data))
+                else:
+                    self.wfile.write(data)
+            if chunked:
+                self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionAbortedError, ConnectionResetError):
+            # El cliente canceló la descarga
+            self.close_connection = True
+        except Exception:
+            # Headers ya enviados: no hay 500 posible; se corta la respuesta
+            # (sin chunk final el cliente la ve incompleta).
+            self.close_connection = True
+        finally:
+            # Libera la conexión de BD si el stream no se agotó
+            chunks.close()
 
     def serve_static(self, path: str):
         if path in ("", "/"):
             path = "/index.html"
 
-        safe_path = (CONFIG.web_root / path.lstrip("/")).resolve()
-
-        if not str(safe_path).startswith(str(CONFIG.web_root.resolve())):
+        try:
+            asset = STATIC_CACHE.get(path)
+        except PermissionError:
             return send_json(self, 403, err("FORBIDDEN", "Acceso denegado."))
-
-        if not safe_path.exists() or safe_path.is_dir():
+        if asset is None:
             return send_json(self, 404, err("NOT_FOUND", "Archivo no encontrado."))
 
-        ctype, _ = mimetypes.guess_type(str(safe_path))
-        ctype = ctype or "application/octet-stream"
-        body = safe_path.read_bytes()
+        compressible = CONFIG.http_compression and is_compressible(asset.ctype)
+        if not_modified(self, asset):
+            self.send_response(304)
+            self.send_header("ETag", asset.etag)
+            self.send_header("Last-Modified", asset.last_modified)
+            self.send_header("Cache-Control", asset.cache_control)
+            if compressible:
+                self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return
+
+        # Variante gzip precomputada (None si no compensa comprimir este archivo)
+        gz = asset.gz is not None and gzip_encoding_for(self, asset.ctype, asset.size)
+        body = asset.gz if gz else asset.body
+        f = None
+        if body is None:
+            # Sin cuerpo en memoria: sendfile desde disco
+            try:
+                f = open(asset.path, "rb")
+            except OSError:
+                return send_json(self, 404, err("NOT_FOUND", "Archivo no encontrado."))
+            # Tamaño del archivo abierto (pudo cambiar desde el último stat del cache)
+            length = os.fstat(f.fileno()).st_size
+        else:
+            length = len(body)
 
-        self.send_response(200)
-        self.send_header("Content-Type", ctype)
-        self.send_header("Content-Length", str(len(body)))
-        self.end_headers()
-        self.wfile.write(body)
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", asset.ctype)
+            self.send_header("Content-Length", str(length))
+            self.send_header("ETag", asset.etag)
+            self.send_header("Last-Modified", asset.last_modified)
+            self.send_header("Cache-Control", asset.cache_control)
+            if compressible:
+                self.send_header("Vary", "Accept-Encoding")
+            if gz:
+                self.send_header("Content-Encoding", "gzip")
+            self.end_headers()
+        except BaseException:
+            if f is not None:
+                f.close()
+            raise
+        if f is None:
+            self.wfile.write(body)
+        else:
+            self._send_file(f, length)
+
+    def _send_file(self, f, length: int) -> None:
+        """
+        Envía `length` bytes de `f` sin cargarlos en el intérprete y lo cierra.
+        - wfile con sendfile propio (front end async): el loop usa loop.sendfile.
+        - Socket real: socket.sendfile (os.sendfile; con TLS u otros, send() en bloques).
+        - Otro wfile: copia en bloques de 64 KiB.
+        """
+        sendfile = getattr(self.wfile, "sendfile", None)
+        if sendfile is not None:
+            return sendfile(f, length)
+        try:
+            sock = getattr(self, "connection", None)
+            if isinstance(sock, socket.socket):
+                self.wfile.flush()
+                sent = sock.sendfile(f, 0, length)
+            else:
+                sent = 0
+                while sent < length:
+                    chunk = f.read(min(64 * 1024, length - sent))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    sent += len(chunk)
+            if sent < length:
+                # El archivo se achicó: el cliente espera Content-Length bytes
+                self.close_connection = True
+        except (BrokenPipeError, ConnectionResetError, ConnectionAbortedError):
+            self.close_connection = True
+        finally:
+            f.close()
 
 
 class ExtrasAuthMixin:
@@ -0,0 +1,287 @@
+# server/http/pool_server.py
+from __future__ import annotations
+
+import json
+import os
+import queue
+import selectors
+import socket
+import threading
+import time
+from http.server import HTTPServer, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+from server.utils.http_utils import err
+
+
+class ReusePortMixin:
+    """SO_REUSEPORT antes de bind: varios procesos (prefork) escuchan el mismo puerto."""
+
+    reuse_port = False
+
+    def server_bind(self):
+        if self.reuse_port:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+
+class ReusePortThreadingHTTPServer(ReusePortMixin, ThreadingHTTPServer):
+    reuse_port = True
+
+
+class PooledHTTPServer(ReusePortMixin, HTTPServer):
+    """
+    HTTPServer con pool fijo de workers y cola de accept acotada
+    (en vez de un thread nuevo por conexión como ThreadingHTTPServer).
+    - El thread de serve_forever solo hace accept() y encola.
+    - Cola llena: responde 503 + Retry-After directamente y cierra (no bloquea el accept).
+    - Keep-alive: entre requests el worker no espera en readline. La conexión ociosa
+      vuelve al selector del thread de accept (park()) y se re-encola cuando el
+      cliente manda el siguiente request; vence a los RequestHandlerClass.timeout s.
+    """
+
+    def __init__(self, server_address, handler_class, workers: int = 16, queue_max: int = 64, retry_after: int = 1,
+                 reuse_port: bool = False):
+        self.reuse_port = bool(reuse_port)
+        self.workers = max(1, int(workers))
+        self.queue_max = max(1, int(queue_max))
+        self.retry_after = max(1, int(retry_after))
+        self.idle_timeout = getattr(handler_class, "timeout", None)
+
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=self.queue_max)
+        self._lock = threading.Lock()
+        self._busy = 0
+        self._served = 0
+        self._rejected = 0
+        self._threads: List[threading.Thread] = []
+
+        # Conexiones ociosas: los workers las dejan en _parked y despiertan al thread de
+        # accept (_wake_w); solo ese thread toca _idle (socket -> (addr, respuestas, vence))
+        self._parked: List[Tuple[Any, Any, int]] = []
+        self._idle: Dict[Any, Tuple[Any, int, float]] = {}
+        self._idle_count = 0
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._local = threading.local()
+        self._shutdown_request = False
+        self._is_shut_down = threading.Event()
+        self._is_shut_down.set()
+        self._closed = False
+
+        super().__init__(server_address, handler_class)
+
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"http-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    # -----------------------
+    # Accept + conexiones ociosas
+    # -----------------------
+    def serve_forever(self, poll_interval: float = 0.5) -> None:
+        """Como socketserver.serve_forever, con un selector para el socket de escucha y los keep-alive ociosos."""
+        self._is_shut_down.clear()
+        try:
+            with selectors.DefaultSelector() as sel:
+                sel.register(self.socket, selectors.EVENT_READ)
+                sel.register(self._wake_r, selectors.EVENT_READ)
+                while not self._shutdown_request:
+                    self._register_parked(sel)
+                    timeout = poll_interval
+                    if self._idle:
+                        nearest = min(v[2] for v in self._idle.values())
+                        timeout = max(0.0, min(timeout, nearest - time.monotonic()))
+                    for key, _ in sel.select(timeout):
+                        sock = key.fileobj
+                        if sock is self.socket:
+                            self._handle_request_noblock()
+                        elif sock is self._wake_r:
+                            try:
+                                while self._wake_r.recv(4096):
+                                    pass
+                            except OSError:
+                                pass
+                        else:
+                            # El cliente mandó el siguiente request (o cerró): vuelve a la cola
+                            sel.unregister(sock)
+                            client_address, respuestas, _ = self._idle.pop(sock)
+                            self._enqueue(sock, client_address, respuestas)
+                    self._expire_idle(sel)
+                    with self._lock:
+                        self._idle_count = len(self._idle)
+                    self.service_actions()
+        finally:
+            self._shutdown_request = False
+            self._is_shut_down.set()
+
+    def shutdown(self) -> None:
+        self._shutdown_request = True
+        self._wake()
+        self._is_shut_down.wait()
+
+    def _wake(self) -> None:
+        try:
+            self._wake_w.send(b"\0")
+        except OSError:
+            # Buffer lleno: ya hay un despertar pendiente
+            pass
+
+    def _register_parked(self, sel) -> None:
+        with self._lock:
+            parked, self._parked = self._parked, []
+        deadline = time.monotonic() + self.idle_timeout if self.idle_timeout else float("inf")
+        for request, client_address, respuestas in parked:
+            try:
+                sel.register(request, selectors.EVENT_READ)
+            except (OSError, ValueError):
+                self.shutdown_request(request)
+                continue
+            self._idle[request] = (client_address, respuestas, deadline)
+
+    def _expire_idle(self, sel) -> None:
+        now = time.monotonic()
+        for sock in [s for s, v in self._idle.items() if v[2] <= now]:
+            sel.unregister(sock)
+            del self._idle[sock]
+            self.shutdown_request(sock)
+
+    def process_request(self, request, client_address):
+        self._enqueue(request, client_address, 0)
+
+    def _enqueue(self, request, client_address, respuestas: int) -> None:
+        try:
+            self._queue.put_nowait((request, client_address, respuestas))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            self._reject(request)
+
+    def _reject(self, request) -> None:
+        body = json.dumps(
+            err("SERVER_BUSY", "Servidor ocupado. Intenta nuevamente en unos segundos."),
+            ensure_ascii=False,
+        ).encode("utf-8")
+        head = (
+            "HTTP/1.1 503 Service Unavailable\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Retry-After: {self.retry_after}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode("ascii")
+        try:
+            # Nunca bloquear el thread de accept por un cliente lento
+            request.settimeout(1.0)
+            request.sendall(head + body)
+            # Descarta lo que el cliente ya envió: cerrar con datos sin leer
+            # manda RST y el cliente podría perder el 503.
+            request.settimeout(0)
+            try:
+                while request.recv(65536):
+                    pass
+            except OSError:
+                pass
+        except OSError:
+            pass
+        finally:
+            self.shutdown_request(request)
+
+    # -----------------------
+    # Workers
+    # -----------------------
+    def _worker(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            request, client_address, respuestas = item
+            self._local.respuestas = respuestas
+            self._local.park = None
+            with self._lock:
+                self._busy += 1
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                # Con el handler ya terminado (finish()): la conexión ociosa pasa al selector
+                if self._local.park is not None and not self._closed:
+                    with self._lock:
+                        self._parked.append((request, client_address, self._local.park))
+                    self._wake()
+                else:
+                    self.shutdown_request(request)
+                with self._lock:
+                    self._busy -= 1
+                    self._served += 1
+
+    def previous_responses(self) -> int:
+        """Respuestas ya enviadas en esta conexión (keep-alive retomado tras park())."""
+        return getattr(self._local, "respuestas", 0)
+
+    def park(self, handler) -> bool:
+        """
+        Llamado por el handler entre requests de una conexión keep-alive. Si el
+        siguiente request no llegó todavía, el worker termina y la conexión espera
+        en el selector. Si ya hay bytes en rfile (pipelining), se sigue atendiendo
+        acá: un handler nuevo no vería lo que quedó en este buffer.
+        """
+        sock = handler.connection
+        try:
+            sock.settimeout(0)
+            pendiente = bool(handler.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            try:
+                sock.settimeout(handler.timeout)
+            except OSError:
+                pass
+        if pendiente:
+            return False
+        self._local.park = handler._respuestas
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": "pool",
+                "pid": os.getpid(),
+                "workers": self.workers,
+                "busy": self._busy,
+                "queue": self._queue.qsize(),
+                "idle": self._idle_count,
+                "queue_max": self.queue_max,
+                "served": self._served,
+                "rejected": self._rejected,
+            }
+
+    def server_close(self) -> None:
+        self._closed = True
+        super().server_close()
+        # Keep-alive ociosos (serve_forever ya terminó: nadie más toca _idle)
+        with self._lock:
+            parked, self._parked = self._parked, []
+        for sock in list(self._idle) + [p[0] for p in parked]:
+            self.shutdown_request(sock)
+        self._idle.clear()
+        self._wake_r.close()
+        self._wake_w.close()
+        # Conexiones aún en cola: se cierran sin atender
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self.shutdown_request(item[0])
+        # Workers a mitad de un request (ej: export largo): no se espera más de
+        # 2 s en total (son daemon). Con cola chica, cada None espera a que un worker libre tome el anterior.
+        deadline = time.monotonic() + 2.0
+        for _ in self._threads:
+            try:
+                self._queue.put(None, timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Full:
+                break
+        for t in self._threads:
+            t.join(timeout=max(0.0, deadline - time.monotonic()))
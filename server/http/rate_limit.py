@@ -1,9 +1,14 @@
 # server/http/rate_limit.py
 from __future__ import annotations
 
+import math
+import sqlite3
+import sys
+import threading
 import time
 from dataclasses import dataclass
-from typing import Dict, List, Tuple, Optional
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 
 
 @dataclass(frozen=True)
@@ -12,9 +17,191 @@ class RateRule:
     window_seconds: int
 
 
-# Memoria en proceso:
-# key -> lista de timestamps (epoch seconds)
-_BUCKETS: Dict[str, List[float]] = {}
+# Estado por clave: (ventana, hits ventana actual, hits ventana anterior)
+WindowState = Tuple[int, int, int]
+
+
+def sliding_window(state: Optional[WindowState], rule: RateRule, now: float) -> Tuple[bool, int, WindowState]:
+    """
+    Sliding-window counter (O(1) por chequeo, 3 enteros por clave).
+    Aproxima la ventana deslizante ponderando la ventana fija anterior:
+        estimado = prev * (1 - fracción transcurrida de la actual) + cur
+    Retorna (allowed, retry_after_seconds, nuevo_estado).
+    """
+    size = rule.window_seconds
+    limit = rule.limit
+    w = int(now // size)
+
+    if state is None:
+        cur = prev = 0
+    else:
+        sw, cur, prev = state
+        if w != sw:
+            prev = cur if w == sw + 1 else 0
+            cur = 0
+
+    if prev:
+        est = prev * ((w + 1) - now / size) + cur
+    else:
+        est = cur
+    if est + 1 <= limit:
+        return True, 0, (w, cur + 1, prev)
+    return False, _retry_after(w, cur, prev, limit, size, now), (w, cur, prev)
+
+
+def _retry_after(w: int, cur: int, prev: int, limit: int, size: float, now: float) -> int:
+    # Cuándo el estimado deja espacio para 1 hit más
+    if cur + 1 <= limit and prev > 0:
+        # Dentro de esta ventana, al decaer el aporte de la anterior
+        wait = (w + 1.0 - (limit - 1 - cur) / prev) * size - now
+    elif cur > 0:
+        # En la próxima ventana (cur pasa a ser "anterior")
+        wait = (w + 2.0 - (limit - 1) / cur) * size - now
+    else:
+        wait = size
+    return max(1, int(math.ceil(wait)))
+
+
+class MemoryRateLimitBackend:
+    """
+    Memoria en proceso: key -> [(ventana, cur, prev), window_seconds].
+    - Chequeo O(1) (sliding_window), sin listas de timestamps.
+    - Claves ociosas (sin aporte a ninguna ventana) se eliminan cada EVICT_EVERY_SECONDS.
+    Con varios procesos (prefork) cada uno tendría su propio contador: usar SQLite.
+    """
+
+    EVICT_EVERY_SECONDS = 60.0
+
+    def __init__(self) -> None:
+        self._buckets: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+        self._next_evict = 0.0
+        self.evicted = 0
+
+    def check(self, key: str, rule: RateRule, now: float) -> Tuple[bool, int]:
+        with self._lock:
+            if now >= self._next_evict:
+                self._evict(now)
+
+            b = self._buckets.get(key)
+            allowed, retry, state = sliding_window(b[0] if b is not None else None, rule, now)
+            if b is None:
+                self._buckets[key] = [state, rule.window_seconds]
+            else:
+                b[0] = state
+                b[1] = rule.window_seconds
+            return allowed, retry
+
+    def _evict(self, now: float) -> None:
+        # Una clave sin hits en la ventana actual ni en la anterior ya no limita nada
+        self._next_evict = now + self.EVICT_EVERY_SECONDS
+        stale = [k for k, b in self._buckets.items() if now >= (b[0][0] + 2) * b[1]]
+        for k in stale:
+            del self._buckets[k]
+        self.evicted += len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            n = len(self._buckets)
+            approx = sys.getsizeof(self._buckets) + sum(
+                sys.getsizeof(k) + sys.getsizeof(b) + sys.getsizeof(b[0]) for k, b in self._buckets.items()
+            )
+            return {"backend": "memory", "buckets": n, "approx_bytes": approx, "evicted": self.evicted}
+
+
+class SqliteRateLimitBackend:
+    """
+    Contadores compartidos entre procesos en un archivo SQLite propio
+    (no en la BD principal: no compite por su lock de escritura).
+    - Una fila por clave (sliding_window): un BEGIN IMMEDIATE con SELECT + UPSERT por PK.
+    - Filas ociosas se borran cada EVICT_EVERY_SECONDS (por proceso).
+    - Si SQLite falla (lock, disco), se deja pasar: el rate limit no debe tumbar la API.
+    """
+
+    EVICT_EVERY_SECONDS = 60.0
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS rate_limit_bucket (
+      key             TEXT PRIMARY KEY,
+      ventana         INTEGER NOT NULL,
+      cur             INTEGER NOT NULL,
+      prev            INTEGER NOT NULL,
+      window_seconds  REAL NOT NULL
+    ) WITHOUT ROWID;
+    """
+
+    def __init__(self, db_path: Path, pool_size: int = 4):
+        # Import local: server.db no depende de la capa http
+        from server.db import Database
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        # synchronous=OFF: perder los últimos hits ante un corte de energía es aceptable
+        self.db = Database(
+            Path(db_path),
+            pool_size=pool_size,
+            pool_timeout=2.0,
+            pragmas={"journal_mode": "WAL", "synchronous": "OFF", "busy_timeout": 2000},
+        )
+        with self.db.connection() as conn:
+            conn.executescript(self.SCHEMA)
+        self._next_evict = 0.0
+
+    def check(self, key: str, rule: RateRule, now: float) -> Tuple[bool, int]:
+        try:
+            with self.db.transaction() as tx:
+                row = tx.query_one("SELECT ventana, cur, prev FROM rate_limit_bucket WHERE key = ?;", (key,))
+                state = (int(row["ventana"]), int(row["cur"]), int(row["prev"])) if row else None
+                allowed, retry, (w, cur, prev) = sliding_window(state, rule, now)
+                if (w, cur, prev) != state:
+                    tx.execute(
+                        """
+                        INSERT INTO rate_limit_bucket (key, ventana, cur, prev, window_seconds)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT(key) DO UPDATE SET
+                          ventana = excluded.ventana, cur = excluded.cur, prev = excluded.prev,
+                          window_seconds = excluded.window_seconds;
+                        """,
+                        (key, w, cur, prev, float(rule.window_seconds)),
+                    )
+            self._maybe_evict(now)
+        except (sqlite3.Error, RuntimeError):
+            return True, 0
+        return allowed, retry
+
+    def _maybe_evict(self, now: float) -> None:
+        if now < self._next_evict:
+            return
+        self._next_evict = now + self.EVICT_EVERY_SECONDS
+        self.db.execute("DELETE FROM rate_limit_bucket WHERE (ventana + 2) * window_seconds <= ?;", (now,))
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            n = self.db.query_one("SELECT COUNT(*) AS n FROM rate_limit_bucket;") or {}
+            pages = self.db.query_one("PRAGMA page_count;") or {}
+            size = self.db.query_one("PRAGMA page_size;") or {}
+            approx = int(pages.get("page_count") or 0) * int(size.get("page_size") or 0)
+            return {"backend": "sqlite", "buckets": int(n.get("n") or 0), "approx_bytes": approx}
+        except (sqlite3.Error, RuntimeError):
+            return {"backend": "sqlite", "buckets": None, "approx_bytes": None}
+
+    def close(self) -> None:
+        self.db.close()
+
+
+_BACKEND = MemoryRateLimitBackend()
+
+
+def set_backend(backend) -> None:
+    """
+    Reemplaza el backend del proceso (server.main: "memory" o "sqlite" según CONFIG).
+    Debe llamarse en cada proceso hijo (las conexiones SQLite no cruzan fork()).
+    """
+    global _BACKEND
+    _BACKEND = backend
+
+
+def get_backend():
+    return _BACKEND
 
 
 def _client_ip(handler) -> str:
@@ -26,35 +213,12 @@ def _client_ip(handler) -> str:
 
 def rate_limit_check(handler, *, scope: str, rule: RateRule) -> Tuple[bool, int]:
     """
-    Rate limit en memoria (por proceso), clave por IP + scope.
+    Rate limit por IP + scope, en el backend configurado (set_backend).
     - Retorna (allowed, retry_after_seconds).
     - 'scope' sirve para agrupar por endpoint/prefijo/método.
-
-    Limitación conocida: si ejecutas múltiples instancias/procesos, el contador no se comparte.
-    Para Fly con 1 instancia es suficiente; para multi-instancia habría que centralizar.
+    - Backend por defecto: memoria del proceso. Con HTTP_PROCESSES > 1 el server
+      configura SQLite para que el límite sea el mismo en todos los procesos.
     """
     ip = _client_ip(handler)
     key = f"{ip}:{scope}"
-
-    now = time.time()
-    window_start = now - float(rule.window_seconds)
-
-    hits = _BUCKETS.get(key)
-    if hits is None:
-        hits = []
-        _BUCKETS[key] = hits
-
-    # limpiar eventos fuera de ventana
-    while hits and hits[0] < window_start:
-        hits.pop(0)
-
-    if len(hits) >= int(rule.limit):
-        # calcular retry_after: cuando salga el primer hit de la ventana
-        oldest = hits[0] if hits else now
-        retry_after = int((oldest + rule.window_seconds) - now)
-        if retry_after < 1:
-            retry_after = 1
-        return False, retry_after
-
-    hits.append(now)
-    return True, 0
+    return _BACKEND.check(key, rule, time.time())
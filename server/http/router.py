@@ -0,0 +1,159 @@
+# server/http/router.py
+from __future__ import annotations
+
+import dataclasses
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from server.http.rate_limit import RateRule
+
+# (método, prefijo, regla): políticas de rate limit por prefijo/path
+RateRulePrefix = Tuple[str, str, RateRule]
+
+
+@dataclass(frozen=True)
+class Route:
+    """
+    Ruta de la API.
+    - pattern: path literal o con segmentos "<nombre>" (ej: /api/pedidos/<pedido_id>).
+      Los valores capturados llegan como kwargs (str) al handler.
+    - handler: nombre del método del AppHandler; se llama handler(parsed, **kwargs).
+    - guards: se ejecutan en orden antes del handler ("admin", "admin_user", "user", "extras").
+    - rate: (scope, regla). Si no se indica, se resuelve con la tabla de prefijos del Router.
+    - max_body: límite de Content-Length (bytes) para POST; None = default del Router.
+    - kwargs: argumentos fijos (ej: una ruta por tabla que comparte handler).
+    """
+
+    method: str
+    pattern: str
+    handler: str
+    guards: Tuple[str, ...] = ()
+    rate: Optional[Tuple[str, RateRule]] = None
+    max_body: Optional[int] = None
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+
+
+class _Node:
+    __slots__ = ("children", "param", "param_name", "route")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, "_Node"] = {}
+        self.param: Optional["_Node"] = None
+        self.param_name = ""
+        self.route: Optional[Route] = None
+
+
+def _normalize(path: str) -> str:
+    if len(path) > 1 and path.endswith("/"):
+        return path.rstrip("/") or "/"
+    return path
+
+
+class Router:
+    """
+    Despacho por tabla (en vez de cadenas de if):
+    - Paths literales: un dict (método, path) -> Route.
+    - Paths con "<param>": trie por segmento, por método (literal antes que parámetro).
+    El costo de match no depende de la posición/cantidad de rutas.
+    """
+
+    def __init__(self, rate_rules: Sequence[RateRulePrefix] = (), default_max_body: int = 64 * 1024):
+        self._rate_rules = tuple(rate_rules)
+        self.default_max_body = int(default_max_body)
+        self._static: Dict[Tuple[str, str], Route] = {}
+        self._tries: Dict[str, _Node] = {}
+        self._routes: List[Route] = []
+
+    # -----------------------
+    # Registro
+    # -----------------------
+    def add(self, route: Route) -> Route:
+        method = route.method.upper()
+        pattern = _normalize(route.pattern)
+        rate = route.rate if route.rate is not None else self.rate_rule_for(method, pattern)
+        max_body = route.max_body if route.max_body is not None else self.default_max_body
+        r = dataclasses.replace(route, method=method, pattern=pattern, rate=rate, max_body=max_body)
+
+        if "<" not in pattern:
+            if (method, pattern) in self._static:
+                raise ValueError(f"RUTA_DUPLICADA:{method} {pattern}")
+            self._static[(method, pattern)] = r
+        else:
+            node = self._tries.setdefault(method, _Node())
+            for seg in pattern.strip("/").split("/"):
+                if seg.startswith("<") and seg.endswith(">"):
+                    name = seg[1:-1]
+                    if node.param is None:
+                        node.param = _Node()
+                        node.param_name = name
+                    elif node.param_name != name:
+                        raise ValueError(f"PARAM_CONFLICTO:{pattern}")
+                    node = node.param
+                else:
+                    node = node.children.setdefault(seg, _Node())
+            if node.route is not None:
+                raise ValueError(f"RUTA_DUPLICADA:{method} {pattern}")
+            node.route = r
+
+        self._routes.append(r)
+        return r
+
+    def add_all(self, routes: Sequence[Route]) -> "Router":
+        for r in routes:
+            self.add(r)
+        return self
+
+    def routes(self) -> List[Route]:
+        return list(self._routes)
+
+    def check_handlers(self, cls) -> None:
+        # Falla al importar (no en el primer request) si una ruta apunta a un método inexistente
+        missing = [r.handler for r in self._routes if not callable(getattr(cls, r.handler, None))]
+        if missing:
+            raise RuntimeError("HANDLER_NO_EXISTE:" + ",".join(sorted(set(missing))))
+
+    # -----------------------
+    # Match
+    # -----------------------
+    def match(self, method: str, path: str) -> Optional[Tuple[Route, Dict[str, str]]]:
+        p = _normalize(path)
+        r = self._static.get((method, p))
+        if r is not None:
+            return r, {}
+
+        root = self._tries.get(method)
+        if root is None:
+            return None
+        params: Dict[str, str] = {}
+        node = self._walk(root, p.strip("/").split("/"), 0, params)
+        if node is None:
+            return None
+        return node.route, params
+
+    def _walk(self, node: _Node, segs: List[str], i: int, params: Dict[str, str]) -> Optional[_Node]:
+        if i == len(segs):
+            return node if node.route is not None else None
+        seg = segs[i]
+        child = node.children.get(seg)
+        if child is not None:
+            found = self._walk(child, segs, i + 1, params)
+            if found is not None:
+                return found
+        if node.param is not None and seg:
+            params[node.param_name] = seg
+            found = self._walk(node.param, segs, i + 1, params)
+            if found is not None:
+                return found
+            params.pop(node.param_name, None)
+        return None
+
+    def rate_rule_for(self, method: str, path: str) -> Optional[Tuple[str, RateRule]]:
+        """
+        Regla por prefijo (primera que coincide). Se usa al registrar rutas y como
+        fallback para paths sin ruta (sondeos a /api/admin/... siguen limitados).
+        El scope es "MÉTODO:prefijo": rutas bajo el mismo prefijo comparten contador.
+        """
+        for m, prefix, rule in self._rate_rules:
+            if m == method and path.startswith(prefix):
+                return f"{m}:{prefix}", rule
+        return None
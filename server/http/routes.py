@@ -0,0 +1,148 @@
+# server/http/routes.py
+from server.config import CONFIG
+from server.http.rate_limit import RateRule
+from server.http.router import Route, Router
+
+# =========================
+# RATE LIMIT (políticas por prefijo)
+# =========================
+# Cada ruta toma la primera regla cuyo prefijo coincide (se resuelve al registrar).
+# Pensado para uso real (móvil) sin bloquear uso normal.
+RL_RULES = [
+    # -------------------------
+    # AUTH: login/register/reset
+    # -------------------------
+    ("POST", "/api/auth/login", RateRule(20, 10 * 60)),            # 20 / 10 min / IP (suave)
+    ("POST", "/api/auth/register", RateRule(10, 10 * 60)),         # 10 / 10 min / IP
+    ("POST", "/api/auth/logout", RateRule(60, 10 * 60)),           # 60 / 10 min / IP
+    ("POST", "/api/auth/password/forgot", RateRule(20, 10 * 60)),  # 20 / 10 min / IP (además del 2/8h interno)
+    ("POST", "/api/auth/password/reset", RateRule(10, 10 * 60)),   # si existiera
+
+    # -------------------------
+    # EXTRAS: elevate (sensible, pero debe permitir uso frecuente)
+    # -------------------------
+    # Suave para permitir activar/desactivar en iteraciones (móvil / operación).
+    ("POST", "/api/extras/elevate", RateRule(60, 60)),             # 60 / min / IP
+    ("POST", "/api/admin/elevate", RateRule(60, 60)),              # 60 / min / IP (alias legacy)
+
+    # -------------------------
+    # SESIÓN: iniciar turno (evitar spam accidental)
+    # -------------------------
+    ("POST", "/api/registro-turno/iniciar", RateRule(30, 60)),     # 30 / min / IP
+
+    # -------------------------
+    # ADMIN: prefijo completo (RBAC / Bearer)
+    # -------------------------
+    ("GET",  "/api/admin/", RateRule(180, 60)),                    # 180 / min / IP
+    ("POST", "/api/admin/", RateRule(120, 60)),                    # 120 / min / IP
+
+    # -------------------------
+    # EXPORT CSV (GET): puede ser “caro”
+    # -------------------------
+    ("GET", "/api/export/", RateRule(30, 60)),                     # 30 / min / IP
+    ("GET", "/api/exportar/", RateRule(30, 60)),                   # 30 / min / IP
+
+    # -------------------------
+    # CRUD operacional (móvil): listar/detalle y crear/actualizar
+    # -------------------------
+    ("GET",  "/api/pedidos", RateRule(240, 60)),
+    ("POST", "/api/pedidos", RateRule(120, 60)),
+    ("GET",  "/api/anomalias", RateRule(240, 60)),
+    ("POST", "/api/anomalias", RateRule(120, 60)),
+]
+
+# Guards: "admin" = X-Admin-Key (legacy), "admin_user" = Bearer + rol admin,
+# "user" = Bearer, "extras" = token extras (el handler recibe rid_extras).
+ROUTES = [
+    # -------------------------
+    # GET
+    # -------------------------
+    Route("GET", "/api/health", "_get_health"),
+    Route("GET", "/api/metrics", "_get_metrics", guards=("admin",)),
+    Route("GET", "/api/catalogos", "_get_catalogos"),
+
+    Route("GET", "/api/admin/catalogos", "_get_admin_catalogos", guards=("admin",)),
+    Route("GET", "/api/admin/variaciones/asignadas", "_get_admin_variaciones_asignadas", guards=("admin",)),
+    Route("GET", "/api/admin/status", "_get_admin_status", guards=("admin",)),
+    Route("GET", "/api/admin/db/queries", "_get_admin_db_queries", guards=("admin",)),
+    Route("GET", "/api/admin/usuarios", "_get_admin_usuarios", guards=("admin_user",)),
+    Route("GET", "/api/admin/usuarios/password-change/status", "_get_admin_password_change_status", guards=("admin_user",)),
+    Route("GET", "/api/admin/usuarios/password-change/pending", "_get_admin_password_change_pending", guards=("admin_user",)),
+
+    Route("GET", "/api/export/pedidos.csv", "_get_export_pedidos"),
+    Route("GET", "/api/exportar/pedidos.csv", "_get_export_pedidos"),
+    Route("GET", "/api/export/anomalias.csv", "_get_export_anomalias"),
+    Route("GET", "/api/exportar/anomalias.csv", "_get_export_anomalias"),
+
+    Route("GET", "/api/pedidos", "_get_pedidos"),
+    Route("GET", "/api/pedidos/<item_id>", "_get_pedido"),
+    Route("GET", "/api/anomalias", "_get_anomalias"),
+    Route("GET", "/api/anomalias/<item_id>", "_get_anomalia"),
+
+    # -------------------------
+    # POST: auth
+    # -------------------------
+    Route("POST", "/api/auth/password/forgot", "_post_auth_password_forgot"),
+    Route("POST", "/api/auth/register", "_post_auth_register"),
+    Route("POST", "/api/auth/login", "_post_auth_login"),
+    Route("POST", "/api/auth/logout", "_post_auth_logout"),
+
+    # -------------------------
+    # POST: admin (capa 2, Bearer)
+    # -------------------------
+    Route("POST", "/api/admin/usuarios/password-change/approve", "_post_admin_password_change",
+          guards=("admin_user",), kwargs={"accion": "approve"}),
+    Route("POST", "/api/admin/usuarios/password-change/cancel", "_post_admin_password_change",
+          guards=("admin_user",), kwargs={"accion": "cancel"}),
+    Route("POST", "/api/admin/usuarios/create", "_post_admin_usuarios_create", guards=("admin_user",)),
+    Route("POST", "/api/admin/usuarios/update", "_post_admin_usuarios_update", guards=("admin_user",)),
+    Route("POST", "/api/admin/usuarios/toggle", "_post_admin_usuarios_toggle", guards=("admin_user",)),
+
+    # -------------------------
+    # POST: admin legacy (X-Admin-Key)
+    # -------------------------
+    Route("POST", "/api/admin/catalogos/create", "_post_admin_catalogos_create", guards=("admin",)),
+    Route("POST", "/api/admin/catalogos/update", "_post_admin_catalogos_update", guards=("admin",)),
+    Route("POST", "/api/admin/catalogos/delete", "_post_admin_catalogos_delete", guards=("admin",)),
+    Route("POST", "/api/admin/variaciones/asignar", "_post_admin_variaciones",
+          guards=("admin",), kwargs={"asignar": True}),
+    Route("POST", "/api/admin/variaciones/desasignar", "_post_admin_variaciones",
+          guards=("admin",), kwargs={"asignar": False}),
+
+    Route("POST", "/api/admin/purge/pedidos/range", "_post_admin_purge",
+          guards=("admin", "extras"), kwargs={"tabla": "pedido", "modo": "range"}),
+    Route("POST", "/api/admin/purge/pedidos/all", "_post_admin_purge",
+          guards=("admin", "extras"), kwargs={"tabla": "pedido", "modo": "all"}),
+    Route("POST", "/api/admin/purge/anomalias/range", "_post_admin_purge",
+          guards=("admin", "extras"), kwargs={"tabla": "anomalia", "modo": "range"}),
+    Route("POST", "/api/admin/purge/anomalias/all", "_post_admin_purge",
+          guards=("admin", "extras"), kwargs={"tabla": "anomalia", "modo": "all"}),
+    Route("POST", "/api/admin/extras-key/rotate", "_post_admin_extras_key_rotate", guards=("admin", "extras")),
+    Route("POST", "/api/admin/db/queries/reset", "_post_admin_db_queries_reset", guards=("admin",)),
+
+    # -------------------------
+    # POST: extras / sesión
+    # -------------------------
+    Route("POST", "/api/extras/elevate", "_post_extras_elevate"),
+    Route("POST", "/api/admin/elevate", "_post_extras_elevate"),
+    Route("POST", "/api/registro-turno/iniciar", "_post_registro_turno_iniciar"),
+
+    # -------------------------
+    # POST: pedidos / anomalías
+    # -------------------------
+    Route("POST", "/api/pedidos", "_post_pedido_crear"),
+    Route("POST", "/api/pedidos/<item_id>/actualizar", "_post_pedido_actualizar"),
+    Route("POST", "/api/pedidos/<item_id>/archivar", "_post_archivo",
+          guards=("extras",), kwargs={"tabla": "pedido", "flag": 1}),
+    Route("POST", "/api/pedidos/<item_id>/restaurar", "_post_archivo",
+          guards=("extras",), kwargs={"tabla": "pedido", "flag": 0}),
+
+    Route("POST", "/api/anomalias", "_post_anomalia_crear"),
+    Route("POST", "/api/anomalias/<item_id>/actualizar", "_post_anomalia_actualizar"),
+    Route("POST", "/api/anomalias/<item_id>/archivar", "_post_archivo",
+          guards=("extras",), kwargs={"tabla": "anomalia", "flag": 1}),
+    Route("POST", "/api/anomalias/<item_id>/restaurar", "_post_archivo",
+          guards=("extras",), kwargs={"tabla": "anomalia", "flag": 0}),
+]
+
+ROUTER = Router(RL_RULES, default_max_body=CONFIG.http_max_body_bytes).add_all(ROUTES)
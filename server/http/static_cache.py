@@ -0,0 +1,257 @@
+# server/http/static_cache.py
+from __future__ import annotations
+
+import hashlib
+import mimetypes
+import os
+import posixpath
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from server.config import CONFIG
+from server.http.asset_build import BUNDLE_PREFIX
+from server.utils.compression import is_compressible
+from server.utils.http_utils import etag_matches
+
+
+@dataclass
+class StaticAsset:
+    """
+    Archivo estático en memoria.
+    - body None: se envía desde disco con sendfile (>= sendfile_min_bytes, o sin lugar en el cache).
+    - gz: variante gzip precomputada (nivel 9, una vez) si comprime y conviene.
+    """
+
+    path: Path
+    ctype: str
+    size: int
+    mtime_ns: int
+    etag: str
+    last_modified: str
+    cache_control: str
+    body: Optional[bytes]
+    gz: Optional[bytes]
+    checked_at: float
+
+
+def _gzip_max(body: bytes) -> bytes:
+    # Precomputado una vez por versión del archivo: se usa el nivel máximo
+    c = zlib.compressobj(9, zlib.DEFLATED, 31)
+    return c.compress(body) + c.flush()
+
+
+class StaticCache:
+    """
+    Cache en memoria de web/ (por archivo resuelto).
+    - roots: directorios en orden de prioridad (con bundles: build/web y luego web/).
+    - El path de request se normaliza (//, /./, /x/../ -> un solo path) y se recuerda a
+      qué archivo resolvió: los alias no duplican entradas ni gastan presupuesto.
+    - Primer acceso: resolve + chequeo de traversal + lectura + gzip; después, cero I/O.
+    - Cambios en disco: se revisa mtime/size como máximo cada check_seconds por archivo
+      (0 = en cada request); si cambió, se recarga.
+    - ETag débil (mismo valor para identity y gzip) + Last-Modified (mtime).
+    - warm(): precarga todo web/ al iniciar (en prefork, los hijos lo heredan).
+    - Archivos >= sendfile_min_bytes: en memoria solo el gzip; identity va por
+      sendfile (del page cache al socket, sin bytes en el intérprete).
+    - Archivos > max_file_bytes, o que no entran en max_bytes: no se leen ni se
+      comprimen (ETag por mtime/size), siempre sendfile.
+    """
+
+    def __init__(self, roots: Iterable[Path], check_seconds: float = 1.0, max_bytes: int = 32 * 1024 * 1024,
+                 max_file_bytes: int = 1024 * 1024, sendfile_min_bytes: int = 64 * 1024):
+        self.roots: List[Path] = [Path(r).resolve() for r in roots]
+        self.check_seconds = max(0.0, float(check_seconds))
+        self.max_bytes = int(max_bytes)
+        self.max_file_bytes = int(max_file_bytes)
+        self.sendfile_min_bytes = int(sendfile_min_bytes)
+        # path normalizado -> archivo resuelto; archivo resuelto -> asset
+        self._paths: Dict[str, str] = {}
+        self._assets: Dict[str, StaticAsset] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    # -----------------------
+    # Lookup
+    # -----------------------
+    def get(self, req_path: str) -> Optional[StaticAsset]:
+        """
+        Asset del path pedido (ej: "/pedidos.html") o None si no existe.
+        PermissionError("FORBIDDEN") si el path sale de web/.
+        """
+        now = time.monotonic()
+        # URL: los segmentos "." y ".." se quitan sin mirar el disco (RFC 3986 §5.2.4)
+        req_path = posixpath.normpath("/" + req_path.lstrip("/"))
+        key = self._paths.get(req_path)
+        asset = self._assets.get(key) if key is not None else None
+        if asset is not None:
+            if now - asset.checked_at < self.check_seconds:
+                self.hits += 1
+                return asset
+            try:
+                st = os.stat(asset.path)
+            except OSError:
+                st = None
+            if st is not None and st.st_mtime_ns == asset.mtime_ns and st.st_size == asset.size:
+                asset.checked_at = now
+                self.hits += 1
+                return asset
+            # Cambió o se borró: se vuelve a buscar en los roots
+
+        for root in self.roots:
+            safe_path = (root / req_path.lstrip("/")).resolve()
+            if safe_path != root and not str(safe_path).startswith(str(root) + os.sep):
+                raise PermissionError("FORBIDDEN")
+            try:
+                st = safe_path.stat()
+            except OSError:
+                continue
+            if safe_path.is_file():
+                return self._load(req_path, safe_path, st)
+        self._drop(req_path, key)
+        return None
+
+    def set_roots(self, roots: Iterable[Path]) -> None:
+        """Cambia los directorios servidos (ej: tras build_assets) y vacía el cache."""
+        with self._lock:
+            self.roots = [Path(r).resolve() for r in roots]
+            self._paths.clear()
+            self._assets.clear()
+            self._bytes = 0
+
+    def _load(self, req_path: str, safe_path: Path, st: os.stat_result) -> StaticAsset:
+        ctype, _ = mimetypes.guess_type(str(safe_path))
+        ctype = ctype or "application/octet-stream"
+        key = str(safe_path)
+
+        # ¿Entra en el cache? Se decide antes de leer: un archivo que no entra no se
+        # lee, ni se hashea, ni se comprime (en cada request sería peor que leerlo).
+        keep_body = st.st_size < self.sendfile_min_bytes
+        compressible = is_compressible(ctype) and st.st_size >= CONFIG.http_compression_min_bytes
+        estimate = (st.st_size if keep_body else 0) + (st.st_size if compressible else 0)
+        with self._lock:
+            old = self._assets.get(key)
+            used = self._bytes - (self._cost(old) if old is not None else 0)
+            fits = st.st_size <= self.max_file_bytes and used + estimate <= self.max_bytes
+
+        body: Optional[bytes] = None
+        gz: Optional[bytes] = None
+        if fits:
+            data = safe_path.read_bytes()
+            digest = hashlib.sha1(data).hexdigest()[:20]
+            if compressible:
+                packed = _gzip_max(data)
+                # Solo si ahorra algo (archivos ya comprimidos o muy chicos no)
+                if len(packed) < len(data) * 0.9:
+                    gz = packed
+            if keep_body:
+                body = data
+        else:
+            digest = hashlib.sha1(f"{st.st_mtime_ns}:{st.st_size}".encode("ascii")).hexdigest()[:20]
+
+        asset = StaticAsset(
+            path=safe_path,
+            ctype=ctype,
+            size=st.st_size,
+            mtime_ns=st.st_mtime_ns,
+            etag=f'W/"{digest}"',
+            last_modified=formatdate(st.st_mtime, usegmt=True),
+            # Bundles con hash: la URL cambia con el contenido, no hace falta revalidar
+            cache_control=(
+                "public, max-age=31536000, immutable" if req_path.startswith(BUNDLE_PREFIX) else "no-cache"
+            ),
+            body=body,
+            gz=gz,
+            checked_at=time.monotonic(),
+        )
+
+        with self._lock:
+            self.loads += 1
+            old = self._assets.pop(key, None)
+            if old is not None:
+                self._bytes -= self._cost(old)
+            if self._bytes + self._cost(asset) > self.max_bytes:
+                # Otro thread ocupó el lugar mientras se leía: sendfile desde disco
+                asset.body = None
+                asset.gz = None
+            # Sin cuerpo en memoria igual queda registrado (costo 0): no se vuelve a resolver
+            self._assets[key] = asset
+            self._bytes += self._cost(asset)
+            self._paths[req_path] = key
+        return asset
+
+    @staticmethod
+    def _cost(asset: StaticAsset) -> int:
+        return len(asset.body or b"") + len(asset.gz or b"")
+
+    def _drop(self, req_path: str, key: Optional[str]) -> None:
+        with self._lock:
+            self._paths.pop(req_path, None)
+            old = self._assets.pop(key, None) if key is not None else None
+            if old is not None:
+                self._bytes -= self._cost(old)
+            # Otros alias del mismo archivo se vuelven a resolver en su próximo acceso
+            for p in [p for p, k in self._paths.items() if k == key]:
+                del self._paths[p]
+
+    # -----------------------
+    # Startup / stats
+    # -----------------------
+    def warm(self) -> int:
+        """Precarga (y comprime) todos los archivos de los roots. Retorna cuántos se cargaron."""
+        rels = set()
+        for root in self.roots:
+            if root.is_dir():
+                rels.update("/" + p.relative_to(root).as_posix() for p in root.rglob("*") if p.is_file())
+        n = 0
+        for rel in sorted(rels):
+            try:
+                if self.get(rel) is not None:
+                    n += 1
+            except OSError:
+                continue
+        return n
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "assets": len(self._assets),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "loads": self.loads,
+            }
+
+
+def not_modified(handler, asset: StaticAsset) -> bool:
+    """
+    If-None-Match (tiene prioridad) o If-Modified-Since (RFC 9110 §13.2.2).
+    """
+    if (handler.headers.get("If-None-Match") or "").strip():
+        return etag_matches(handler, asset.etag)
+
+    ims = handler.headers.get("If-Modified-Since")
+    if ims:
+        try:
+            since = parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return False
+        # Last-Modified tiene resolución de 1 s
+        return asset.mtime_ns // 1_000_000_000 <= int(since)
+    return False
+
+
+# Solo web/; server.main agrega build/web delante si el build de bundles funcionó
+STATIC_CACHE = StaticCache(
+    [CONFIG.web_root],
+    check_seconds=CONFIG.static_cache_check_seconds,
+    max_bytes=CONFIG.static_cache_max_bytes,
+    max_file_bytes=CONFIG.static_cache_max_file_bytes,
+    sendfile_min_bytes=CONFIG.static_sendfile_min_bytes,
+)
@@ -0,0 +1,200 @@
+# server/migrate.py
+"""
+Migraciones de schema versionadas (PRAGMA user_version).
+
+- Versión 0 = schema.sql (base). Solo se ejecuta en una BD nueva o anterior a las
+  migraciones (user_version = 0); todo cambio posterior va en server/migrations/.
+- server/migrations/NNNN_descripcion.sql: se aplican una vez, en orden de NNNN,
+  cada una en una transacción que también sube user_version.
+- BD al día: el arranque solo lee user_version (no re-ejecuta DDL).
+- Migraciones "online" (primera línea "-- online"): solo CREATE INDEX IF NOT EXISTS /
+  DROP INDEX IF EXISTS. En una BD con datos se aplican en segundo plano con el server
+  ya atendiendo, una sentencia por transacción. Los lectores (WAL) no esperan; cada
+  CREATE INDEX tiene el lock de escritura mientras construye, así que los escritores
+  esperan. Mientras corre, las conexiones del proceso usan busy_timeout_ms
+  (DB_MIGRATIONS_BUSY_TIMEOUT_MS) en vez del perfil PRAGMA: "online" vale para
+  índices que se construyen en menos que eso; si uno tarda más, las escrituras
+  que esperan fallan (SQLITE_BUSY -> 500) y conviene DB_MIGRATIONS_ONLINE=0.
+  Hasta que terminen, las consultas funcionan igual, solo que sin el índice nuevo.
+"""
+from __future__ import annotations
+
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from server.db import Database
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+
+_NAME_RE = re.compile(r"^(\d{4})_(\w+)\.sql$")
+_ONLINE_RE = re.compile(r"^\s*--\s*online\b", re.I)
+_ONLINE_STMT_RE = re.compile(r"^(CREATE\s+(UNIQUE\s+)?INDEX\s+IF\s+NOT\s+EXISTS|DROP\s+INDEX\s+IF\s+EXISTS)\b", re.I)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    online: bool
+    statements: Tuple[str, ...]
+
+
+def split_sql(text: str) -> List[str]:
+    """Separa un script en sentencias (respeta ';' dentro de strings y de triggers BEGIN ... END)."""
+    out: List[str] = []
+    buf = ""
+    for part in text.split(";"):
+        buf += part + ";"
+        if sqlite3.complete_statement(buf):
+            # Sin las líneas de comentario: una sentencia vacía no se ejecuta
+            sql = "\n".join(ln for ln in buf.splitlines() if not ln.strip().startswith("--")).strip()
+            if sql != ";":
+                out.append(sql)
+            buf = ""
+    if buf.strip(" \t\r\n;"):
+        raise ValueError("SQL_INCOMPLETO")
+    return out
+
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    migrations: List[Migration] = []
+    for path in sorted(Path(directory).glob("*.sql")):
+        m = _NAME_RE.match(path.name)
+        if not m:
+            raise ValueError(f"MIGRACION_NOMBRE_INVALIDO: {path.name}")
+        text = path.read_text(encoding="utf-8")
+        online = bool(_ONLINE_RE.match(text))
+        statements = tuple(split_sql(text))
+        if online and not all(_ONLINE_STMT_RE.match(s) for s in statements):
+            raise ValueError(f"MIGRACION_ONLINE_INVALIDA: {path.name}")
+        migrations.append(Migration(int(m.group(1)), m.group(2), online, statements))
+    # 1..N sin huecos ni repetidos: el orden de aplicación es el de user_version
+    for expected, mig in enumerate(migrations, start=1):
+        if mig.version != expected:
+            raise ValueError(f"MIGRACION_FUERA_DE_ORDEN: {mig.version:04d} (se esperaba {expected:04d})")
+    return migrations
+
+
+def schema_version(db: Database) -> int:
+    row = db.query_one("PRAGMA user_version;")
+    return int(row["user_version"]) if row else 0
+
+
+class Migrator:
+    """
+    migrate(): al arrancar (antes de atender). start()/stop(): hilo de las
+    migraciones online pendientes (llamar con el server en marcha / al apagar).
+    Con prefork cada proceso puede llamar start(): la versión se relee con el lock
+    de escritura, así cada migración se aplica una sola vez.
+    """
+
+    def __init__(self, db: Database, schema_path: Path, directory: Path = MIGRATIONS_DIR, online: bool = True,
+                 busy_timeout_ms: Optional[int] = None):
+        self.db = db
+        self.schema_path = Path(schema_path)
+        self.migrations = load_migrations(directory)
+        self.latest = self.migrations[-1].version if self.migrations else 0
+        # online=False: todo se aplica en migrate() (ej: ventana de mantenimiento)
+        self.online = online
+        # Espera de los escritores mientras el hilo online construye índices (None = sin cambio)
+        self.busy_timeout_ms = busy_timeout_ms
+        self.background: List[Migration] = []
+        self.error: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def status(self) -> Dict[str, Any]:
+        current = schema_version(self.db)
+        return {
+            "current": current,
+            "latest": self.latest,
+            "pending": [f"{m.version:04d}_{m.name}{' (online)' if m.online else ''}"
+                        for m in self.migrations if m.version > current],
+        }
+
+    def migrate(self, include_online: bool = False, target: Optional[int] = None) -> List[int]:
+        """
+        Aplica lo pendiente hasta target (default: la última). Las migraciones online
+        del final quedan en self.background (para start()), salvo include_online, BD
+        nueva o self.online=False. Retorna las versiones aplicadas.
+        """
+        target = self.latest if target is None else target
+        self.background = []
+        self.db.db_path.parent.mkdir(parents=True, exist_ok=True)
+        current = schema_version(self.db)
+        if current >= target and current > 0:
+            return []
+
+        fresh = False
+        if current == 0:
+            fresh = self.db.query_one("SELECT 1 AS ok FROM sqlite_master WHERE type = 'table' AND name = 'pedido';") is None
+            self.db.init_schema(self.schema_path.read_text(encoding="utf-8"))
+
+        pending = [m for m in self.migrations if current < m.version <= target]
+        sync = pending
+        if self.online and not include_online and not fresh:
+            # Solo se difieren las online del final: una no-online posterior podría depender de ellas
+            k = max((i for i, m in enumerate(pending) if not m.online), default=-1)
+            sync, self.background = pending[:k + 1], pending[k + 1:]
+
+        applied = []
+        for m in sync:
+            if self._apply(m):
+                applied.append(m.version)
+        return applied
+
+    def _apply(self, m: Migration) -> bool:
+        if m.online:
+            # Una transacción por sentencia (cada una idempotente); user_version al final
+            for sql in m.statements:
+                with self.db.transaction() as tx:
+                    if schema_version(tx) >= m.version:
+                        return False
+                    tx.execute(sql)
+            statements: Tuple[str, ...] = ()
+        else:
+            statements = m.statements
+        with self.db.transaction() as tx:
+            # Releída con el lock de escritura: otro proceso pudo aplicarla recién
+            if schema_version(tx) >= m.version:
+                return False
+            for sql in statements:
+                tx.execute(sql)
+            tx.execute(f"PRAGMA user_version = {int(m.version)};")
+        return True
+
+    # -----------------------
+    # Online (segundo plano)
+    # -----------------------
+    def start(self) -> None:
+        if not self.background or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="migraciones-online", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        # Un CREATE INDEX no se interrumpe: si no termina a tiempo, se reintenta al próximo arranque
+        t = self._thread
+        if t is not None:
+            t.join(timeout=timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        if self.busy_timeout_ms is not None:
+            self.db.set_busy_timeout(self.busy_timeout_ms)
+        try:
+            for m in list(self.background):
+                try:
+                    if self._apply(m):
+                        print(f"Migración online {m.version:04d}_{m.name} aplicada.", flush=True)
+                except sqlite3.Error as e:
+                    self.error = f"{m.version:04d}_{m.name}: {e}"
+                    print(f"Aviso: migración online {self.error}; se reintenta al próximo arranque.", flush=True)
+                    return
+                self.background.remove(m)
+        finally:
+            if self.busy_timeout_ms is not None:
+                self.db.set_busy_timeout(None)
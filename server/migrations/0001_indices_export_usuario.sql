@@ -0,0 +1,19 @@
+-- online
+-- Índices de export por rango de fecha, búsquedas de usuario y referencias a tipo_plancha.
+
+-- Export: WHERE es_archivado = 0 AND fecha_registro BETWEEN ? AND ?
+-- ORDER BY fecha_registro DESC, creado_en DESC, id DESC -> rango sin sort (sigue en streaming)
+CREATE INDEX IF NOT EXISTS ix_pedido_archivado_fecha_creado ON pedido (es_archivado, fecha_registro, creado_en);
+CREATE INDEX IF NOT EXISTS ix_anomalia_archivado_fecha_creado ON anomalia (es_archivado, fecha_registro, creado_en);
+
+-- Prefijos de los índices compuestos: solo costaban escrituras (y el planner
+-- los elegía por sobre el compuesto, ordenando en un temp B-tree)
+DROP INDEX IF EXISTS ix_pedido_archivado;
+DROP INDEX IF EXISTS ix_anomalia_archivado;
+
+-- Login / cambio de clave: username = ? COLLATE NOCASE. ux_usuario_username_nocase
+-- es parcial (username no vacío) y no aplica a la búsqueda por parámetro.
+CREATE INDEX IF NOT EXISTS ix_usuario_username_nocase ON usuario (username COLLATE NOCASE);
+
+-- Borrado de tipo_plancha: COUNT(*) de pedidos que lo referencian (índice cubriente)
+CREATE INDEX IF NOT EXISTS ix_pedido_tipo_plancha ON pedido (tipo_plancha_id);
@@ -0,0 +1,396 @@
+# server/plan_check.py
+"""
+Chequeo de planes de consulta (python -m server.cli check-plans).
+
+Crea una BD temporal con schema.sql (+ migraciones) y datos sintéticos en volumen, ejecuta los
+flujos de los servicios (pedidos, anomalías, export, auth, cambio de clave y
+catálogos admin) capturando cada sentencia con sus parámetros reales, y pasa
+cada una por EXPLAIN QUERY PLAN. Falla si en una tabla grande aparece:
+- SCAN (recorrido completo de la tabla o de un índice), o
+- USE TEMP B-TREE FOR ORDER BY (ordenamiento en memoria de las filas leídas).
+Así un índice borrado o una consulta nueva sin índice se detectan antes de producción.
+"""
+from __future__ import annotations
+
+import hashlib
+import random
+import re
+import tempfile
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from server.db import Database
+from server.query_stats import normalize_sql
+
+# Filas sintéticas por tabla (las de catálogo salen de seed_catalogos)
+SEED_ROWS: Dict[str, int] = {
+    "usuario": 2000,
+    "auth_sesion": 10000,
+    "password_change_request": 5000,
+    "registro_turno": 2000,
+    "pedido": 20000,
+    "anomalia": 5000,
+    "pedido_planchas_log": 20000,
+    "log_admin": 2000,
+}
+# Tabla "grande" = al menos estas filas en la BD sintética
+LARGE_ROWS = 1000
+
+# Excepciones revisadas: fragmento del SQL normalizado -> motivo. Se informan pero no fallan.
+ACCEPTED: Dict[str, str] = {
+    "bm25(": "orden por relevancia: se ordena solo el resultado del MATCH",
+    "pedido_codigo_fts": "código parcial (trigram): se ordenan solo los ids que coinciden",
+    " LIKE ?": "búsqueda sin FTS5 (LIKE '%q%'): recorre la tabla por diseño",
+}
+
+_SQL_KINDS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+_ALIAS_RE = re.compile(
+    r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(?!(?:ON|WHERE|JOIN|LEFT|INNER|CROSS|ORDER|GROUP|LIMIT|SET|USING|VALUES)\b)(\w+))?",
+    re.I,
+)
+_SCAN_RE = re.compile(r"^SCAN (\w+)")
+_SEARCH_RE = re.compile(r"^SEARCH (\w+)")
+PASSWORD = "clave-segura-123"
+
+
+@dataclass
+class Statement:
+    flow: str
+    sql: str
+    params: Tuple[Any, ...]
+    plan: List[str] = field(default_factory=list)
+    problems: List[str] = field(default_factory=list)
+    accepted: str = ""
+
+
+class _CaptureDatabase(Database):
+    """Database que además guarda (flujo, sql, params) de la primera ejecución de cada sentencia."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.flow: Optional[str] = None
+        self.captured: Dict[str, Statement] = {}
+
+    def _observe(self, sql: str, t0: float, rows: int = -1, conn: Any = None, params: Sequence[Any] = ()) -> None:
+        super()._observe(sql, t0, rows, conn, params)
+        if self.flow is None or not sql.lstrip().upper().startswith(_SQL_KINDS):
+            return
+        key = normalize_sql(sql)
+        if key not in self.captured:
+            self.captured[key] = Statement(self.flow, sql, tuple(params))
+
+
+# =========================
+# Datos sintéticos
+# =========================
+def _ts(base: datetime, i: int, n: int) -> str:
+    # Repartidos en ~2 años, crecientes con i (como en producción: id y creado_en avanzan juntos)
+    return (base + timedelta(minutes=int(i * 1051200 / n))).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def seed_synthetic(db: Database, rows: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    from server.http.security import hash_pbkdf2_password
+
+    n = dict(SEED_ROWS, **(rows or {}))
+    rnd = random.Random(7)
+    base = datetime(2024, 1, 1)
+    turnos = [r["id"] for r in db.query_all("SELECT id FROM turno;")]
+    maquinas = [r["id"] for r in db.query_all("SELECT id FROM maquina;")]
+    tipos = [r["id"] for r in db.query_all("SELECT id FROM tipo_plancha;")]
+    pwd = hash_pbkdf2_password(PASSWORD)
+
+    db.execute_many(
+        "INSERT INTO usuario (nombre, apellido, email, username, password_hash, rol, activo) VALUES (?, ?, ?, ?, ?, ?, ?);",
+        [(f"Nombre{i}", f"Apellido{i}", f"user{i}@ejemplo.cl", f"user{i}" if i % 3 else None, pwd,
+          "admin" if i % 50 == 0 else "operador", 0 if i % 20 == 0 else 1) for i in range(1, n["usuario"] + 1)],
+    )
+    usuarios = n["usuario"]
+    db.execute_many(
+        "INSERT INTO auth_sesion (usuario_id, token_hash, expira_en, revocado, creado_en) VALUES (?, ?, ?, ?, ?);",
+        [(rnd.randint(1, usuarios), hashlib.sha256(f"t{i}".encode()).hexdigest(), _ts(base, i + 1, n["auth_sesion"]),
+          int(i % 4 == 0), _ts(base, i, n["auth_sesion"])) for i in range(n["auth_sesion"])],
+    )
+    estados_pcr = ("APPROVED", "CANCELLED", "EXPIRED")
+    db.execute_many(
+        "INSERT INTO password_change_request (usuario_id, estado, pending_password_hash, creado_en, expira_en) "
+        "VALUES (?, ?, 'x', ?, ?);",
+        [(rnd.randint(1, usuarios), estados_pcr[i % 3], _ts(base, i, n["password_change_request"]),
+          _ts(base, i + 1, n["password_change_request"])) for i in range(n["password_change_request"])],
+    )
+    db.execute_many(
+        "INSERT INTO registro_turno (usuario_id, operador_nombre, operador_apellido, fecha, creado_en) VALUES (?, ?, ?, ?, ?);",
+        [(rnd.randint(1, usuarios), f"Nombre{i}", f"Apellido{i}", _ts(base, i, n["registro_turno"])[:10],
+          _ts(base, i, n["registro_turno"])) for i in range(n["registro_turno"])],
+    )
+    registros = n["registro_turno"]
+    estados_ped = ("en_proceso", "completado", "cancelado")
+    db.execute_many(
+        """
+        INSERT INTO pedido (registro_turno_id, turno_id, fecha_registro, creado_en, codigo_producto,
+          descripcion_producto, maquina_asignada, tipo_plancha_id, espesor_mm, medida_plancha,
+          variacion_material, planchas_asignadas, ultima_plancha_trabajada, estado, es_archivado)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, 18, '2440x1220', 'blanco', 10, ?, ?, ?);
+        """,
+        [(rnd.randint(1, registros), rnd.choice(turnos), _ts(base, i, n["pedido"])[:10], _ts(base, i, n["pedido"]),
+          f"P{i:06d}", f"Mueble cocina modelo {i % 97} lote {i}", ("BOF", "Rover", "Ambas")[i % 3], rnd.choice(tipos),
+          10 if i % 3 == 1 else 0, estados_ped[i % 3], int(i % 10 == 0)) for i in range(n["pedido"])],
+    )
+    db.execute_many(
+        """
+        INSERT INTO anomalia (registro_turno_id, turno_id, fecha_registro, creado_en, maquina_id, titulo,
+          descripcion, estado, solucion, es_archivado)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+        """,
+        [(rnd.randint(1, registros), rnd.choice(turnos), _ts(base, i, n["anomalia"])[:10], _ts(base, i, n["anomalia"]),
+          rnd.choice(maquinas), f"Falla husillo {i}", f"Vibración anormal en eje {i % 7} durante corte",
+          "solucionado" if i % 2 else "en_revision", "Se cambió rodamiento del eje" if i % 2 else None,
+          int(i % 10 == 0)) for i in range(n["anomalia"])],
+    )
+    db.execute_many(
+        """
+        INSERT INTO pedido_planchas_log (pedido_id, registro_turno_id, turno_id, fecha_registro,
+          delta_planchas, ultima_antes, ultima_nueva, creado_en)
+        VALUES (?, ?, ?, ?, 1, 0, 1, ?);
+        """,
+        [(rnd.randint(1, n["pedido"]), rnd.randint(1, registros), rnd.choice(turnos),
+          _ts(base, i, n["pedido_planchas_log"])[:10], _ts(base, i, n["pedido_planchas_log"]))
+         for i in range(n["pedido_planchas_log"])],
+    )
+    db.execute_many(
+        "INSERT INTO log_admin (registro_turno_id, creado_en, accion, entidad, entidad_id) VALUES (?, ?, 'UPDATE', 'pedido', ?);",
+        [(rnd.randint(1, registros), _ts(base, i, n["log_admin"]), rnd.randint(1, n["pedido"]))
+         for i in range(n["log_admin"])],
+    )
+    return n
+
+
+# =========================
+# Flujos de los servicios
+# =========================
+def _flows(db: Database) -> List[Tuple[str, Callable[[], Any]]]:
+    from server.services.anomalias_service import AnomaliasService
+    from server.services.auth_service import TOKEN_CACHE, AuthService
+    from server.services.catalogos_admin_service import CatalogosAdminService
+    from server.services.clave_cambio_service import ClaveCambioService
+    from server.services.export_service import ExportService
+    from server.services.pedidos_service import PedidosService
+
+    pedidos = PedidosService(db)
+    anomalias = AnomaliasService(db)
+    export = ExportService(db)
+    auth = AuthService(db)
+    clave = ClaveCambioService(db)
+    catalogos = CatalogosAdminService(db)
+
+    def pagina(listar: Callable[..., List[Dict[str, Any]]], estado: str) -> None:
+        rows = listar(estado, None, False, limit=50)
+        if rows:
+            listar(estado, None, False, limit=50, cursor=(rows[-1]["creado_en"], rows[-1]["id"]))
+
+    def pedido_crud() -> None:
+        p = pedidos.crear_pedido({
+            "registro_turno_id": 1, "turno_id": 1, "codigo_producto": "NUEVO-1",
+            "descripcion_producto": "Pedido de prueba para plan", "maquina_asignada": "BOF",
+            "tipo_plancha_id": 1, "espesor_mm": 18, "medida_plancha": "2440x1220",
+            "variacion_material": "blanco", "planchas_asignadas": 5,
+        })
+        pedidos.obtener_pedido_detalle(p["id"])
+        pedidos.actualizar_pedido_operador(p["id"], {"ultima_plancha_trabajada": 2, "cortes_totales": 4, "estado": "en_proceso"})
+        pedidos.actualizar_pedido_admin(p["id"], {"ultima_plancha_trabajada": 3, "codigo_producto": "NUEVO-2",
+                                                  "descripcion_producto": "Pedido de prueba editado"})
+
+    def anomalia_crud() -> None:
+        a = anomalias.crear_anomalia({"registro_turno_id": 1, "turno_id": 1, "maquina_id": 1,
+                                      "titulo": "Falla nueva", "descripcion": "Descripción de la falla nueva"})
+        anomalias.actualizar_anomalia_operador(a["id"], {"estado": "en_revision"})
+        anomalias.actualizar_anomalia_admin(a["id"], {"estado": "solucionado", "solucion": "Se ajustó el cabezal"})
+        anomalias.crear_anomalia({"registro_turno_id": 1, "turno_id": 1, "maquina_id": 1, "fecha_registro": "2025-01-02",
+                                  "titulo": "Falla fechada", "descripcion": "Descripción de la falla fechada"})
+
+    def exportar() -> None:
+        for fn in (export.export_pedidos_csv, export.export_anomalias_csv):
+            for desde, hasta in ((None, None), ("2024-06-01", "2024-06-30")):
+                chunks, _ = fn(desde, hasta)
+                for _ in chunks:
+                    pass
+
+    def auth_flow() -> None:
+        auth.register("Nueva", "Persona", "nueva@ejemplo.cl", PASSWORD, username="nueva")
+        token = auth.login("user1", PASSWORD)["token"]
+        TOKEN_CACHE.clear()
+        auth.get_usuario_by_token(token)
+        auth.ultimo_uso.flush()
+        auth.logout(token)
+
+    def clave_flow() -> None:
+        clave.request_change("user2", PASSWORD + "-nueva")
+        clave.get_status(2)
+        clave.approve(2, 50)
+        clave.request_change("user4@ejemplo.cl", PASSWORD + "-nueva")
+        clave.cancel(4, 50)
+
+    def catalogos_flow() -> None:
+        catalogos.listar()
+        nuevo = catalogos.crear("turnos", "Turno plan")
+        catalogos.actualizar("turnos", nuevo["id"], "Turno plan 2")
+        catalogos.eliminar("turnos", nuevo["id"])
+        for cat in ("turnos", "maquinas", "tipos_plancha", "variaciones"):
+            try:
+                catalogos.eliminar(cat, 1)  # referenciado: recorre todos los ref_checks
+            except ValueError:
+                pass
+        v = catalogos.crear("variaciones", "Variación plan")
+        catalogos.listar_variaciones_asignadas(1)
+        catalogos.asignar_variacion(1, v["id"])
+        catalogos.desasignar_variacion(1, v["id"])
+
+    return [
+        ("pedidos.listar", lambda: [pagina(pedidos.listar_pedidos, e) for e in ("general", "en_proceso")]),
+        ("pedidos.listar_archivados", lambda: pedidos.listar_pedidos("archivado", None, True, limit=50)),
+        ("pedidos.buscar", lambda: [(pedidos.listar_pedidos("general", q, False, limit=50),
+                                     pedidos.listar_pedidos("general", q, False, limit=50, orden="relevancia"))
+                                    for q in ("modelo 42", "42")]),
+        ("pedidos.crud", pedido_crud),
+        ("anomalias.listar", lambda: [pagina(anomalias.listar_anomalias, e) for e in ("todos", "en_revision")]),
+        ("anomalias.listar_archivadas", lambda: anomalias.listar_anomalias("archivado", None, True, limit=50)),
+        ("anomalias.buscar", lambda: anomalias.listar_anomalias("todos", "husillo", False, limit=50)),
+        ("anomalias.crud", anomalia_crud),
+        ("export", exportar),
+        ("auth", auth_flow),
+        ("clave_cambio", clave_flow),
+        ("catalogos_admin", catalogos_flow),
+    ]
+
+
+# =========================
+# Análisis de planes
+# =========================
+def _aliases(sql: str) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for m in _ALIAS_RE.finditer(sql):
+        table = m.group(1).lower()
+        out[table] = table
+        if m.group(2):
+            out[m.group(2).lower()] = table
+    return out
+
+
+def plan_problems(sql: str, plan: Sequence[str], large: Sequence[str]) -> List[str]:
+    """Problemas del plan para las tablas de `large` (SCAN o sort en memoria)."""
+    aliases = _aliases(sql)
+    problems: List[str] = []
+    touches_large = False
+    for detail in plan:
+        m = _SCAN_RE.match(detail) or _SEARCH_RE.match(detail)
+        table = aliases.get(m.group(1).lower(), m.group(1).lower()) if m else ""
+        if table in large:
+            touches_large = True
+            if detail.startswith("SCAN"):
+                problems.append(f"{table}: {detail}")
+        if "USE TEMP B-TREE FOR ORDER BY" in detail and touches_large:
+            problems.append(detail)
+    return problems
+
+
+def _synthetic_db(path: Path, seed_rows: Optional[Dict[str, int]], upgrades: bool) -> Tuple[_CaptureDatabase, Dict[str, int]]:
+    """BD de schema.sql (+ migraciones si upgrades) con datos sintéticos; retorna (db, filas por tabla grande)."""
+    from server.config import CONFIG
+    from server.http.seed import seed_catalogos
+    from server.migrate import Migrator
+    from server.services.busqueda_service import BusquedaService
+
+    db = _CaptureDatabase(path, pragmas=CONFIG.db_pragmas())
+    Migrator(db, CONFIG.schema_path).migrate(include_online=True, target=None if upgrades else 0)
+    seed_catalogos(db)
+    BusquedaService(db).ensure_schema()
+    seed_synthetic(db, seed_rows)
+
+    # Tablas reales (sin las virtuales FTS ni sus tablas internas)
+    tables = db.query_all("SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%';")
+    virtual = [t["name"] for t in tables if (t["sql"] or "").upper().startswith("CREATE VIRTUAL")]
+    counts = {}
+    for t in tables:
+        if not any(t["name"] == v or t["name"].startswith(v + "_") for v in virtual):
+            counts[t["name"]] = int(db.query_one(f'SELECT COUNT(*) AS n FROM "{t["name"]}";')["n"])
+    return db, {t: c for t, c in sorted(counts.items()) if c >= LARGE_ROWS}
+
+
+def _run_flows(db: _CaptureDatabase) -> List[Tuple[str, str]]:
+    errors: List[Tuple[str, str]] = []
+    for flow, fn in _flows(db):
+        db.flow = flow
+        try:
+            fn()
+        except (ValueError, PermissionError) as e:
+            errors.append((flow, repr(e)))
+        finally:
+            db.flow = None
+    return errors
+
+
+def _explain(db: Database, st: Statement) -> List[str]:
+    return [r["detail"] for r in db.query_all("EXPLAIN QUERY PLAN " + st.sql, st.params)]
+
+
+def check_plans(seed_rows: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """
+    Retorna {"tables": filas por tabla grande, "statements": [Statement], "errors": [(flujo, error)]}.
+    Un Statement con problems y sin accepted es una regresión.
+    """
+    with tempfile.TemporaryDirectory(prefix="kp-plans-") as tmp:
+        db, large = _synthetic_db(Path(tmp) / "plans.sqlite3", seed_rows, upgrades=True)
+        try:
+            errors = _run_flows(db)
+            statements = list(db.captured.values())
+            for st in statements:
+                st.plan = _explain(db, st)
+                st.problems = plan_problems(st.sql, st.plan, list(large))
+                if st.problems:
+                    norm = normalize_sql(st.sql)
+                    st.accepted = next((why for frag, why in ACCEPTED.items() if frag in norm), "")
+            return {"tables": large, "statements": statements, "errors": errors}
+        finally:
+            db.close()
+
+
+def bench_upgrades(repeat: int = 5, seed_rows: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+    """
+    Antes/después de las migraciones: misma BD sintética, mismas sentencias (las SELECT
+    de los flujos), ms por ejecución (mejor de `repeat`) y plan sin y con los cambios.
+    """
+    import time
+
+    def best(db: Database, st: Statement) -> float:
+        out = float("inf")
+        for _ in range(max(1, repeat)):
+            t0 = time.perf_counter()
+            db.query_all(st.sql, st.params)
+            out = min(out, time.perf_counter() - t0)
+        return out * 1000.0
+
+    with tempfile.TemporaryDirectory(prefix="kp-bench-") as tmp:
+        db, _ = _synthetic_db(Path(tmp) / "bench.sqlite3", seed_rows, upgrades=False)
+        try:
+            _run_flows(db)
+            selects = [st for st in db.captured.values() if st.sql.lstrip().upper().startswith(("SELECT", "WITH"))]
+            before = [(best(db, st), _explain(db, st)) for st in selects]
+
+            from server.config import CONFIG
+            from server.migrate import Migrator
+            Migrator(db, CONFIG.schema_path).migrate(include_online=True)
+            out = []
+            for st, (ms_before, plan_before) in zip(selects, before):
+                plan_after = _explain(db, st)
+                out.append({
+                    "flow": st.flow,
+                    "sql": st.sql,
+                    "before_ms": ms_before,
+                    "after_ms": best(db, st),
+                    "plan_before": plan_before,
+                    "plan_after": plan_after,
+                })
+            return out
+        finally:
+            db.close()
@@ -0,0 +1,149 @@
+# server/query_stats.py
+from __future__ import annotations
+
+import re
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Sequence
+
+# Literales -> "?" (las queries del server usan parámetros, pero las armadas con
+# f-string o escritas a mano no deben abrir una entrada por valor)
+_STR_RE = re.compile(r"'(?:[^']|'')*'")
+_NUM_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WS_RE = re.compile(r"\s+")
+
+SAMPLES_PER_STATEMENT = 1024
+OTHER = "<otras>"
+
+
+def normalize_sql(sql: str) -> str:
+    s = _STR_RE.sub("?", sql)
+    s = _NUM_RE.sub("?", s)
+    s = _WS_RE.sub(" ", s).strip()
+    s = _IN_RE.sub("(?...)", s)
+    return s.rstrip(";").strip()
+
+
+def _quantile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    i = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[i]
+
+
+class _Entry:
+    __slots__ = ("calls", "total", "max", "rows", "samples")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        # Últimas N duraciones: p50/p99 reflejan la carga reciente
+        self.samples: Deque[float] = deque(maxlen=SAMPLES_PER_STATEMENT)
+
+
+class QueryStats:
+    """
+    Estadísticas por sentencia normalizada (literales -> ?), opt-in (DB_QUERY_STATS=1):
+    llamadas, tiempo total/máximo, p50/p99 (últimas 1024 ejecuciones) y filas
+    (devueltas por SELECT, afectadas por INSERT/UPDATE/DELETE).
+    - Hasta max_statements sentencias distintas; el resto se acumula en "<otras>".
+    - slow_ms > 0: las sentencias más lentas se registran (stderr y últimas
+      slow_keep en memoria) con su EXPLAIN QUERY PLAN.
+    Por proceso: con prefork cada proceso tiene su muestra.
+    """
+
+    def __init__(self, slow_ms: float = 0.0, max_statements: int = 500, slow_keep: int = 50):
+        self.slow_ms = float(slow_ms)
+        self.max_statements = max(1, int(max_statements))
+        self._entries: Dict[str, _Entry] = {}
+        self._norm_cache: Dict[str, str] = {}
+        self._slow: Deque[Dict[str, Any]] = deque(maxlen=max(1, int(slow_keep)))
+        self._lock = threading.Lock()
+        self.since = time.time()
+
+    def _normalized(self, sql: str) -> str:
+        n = self._norm_cache.get(sql)
+        if n is None:
+            n = normalize_sql(sql)
+            if len(self._norm_cache) < 4 * self.max_statements:
+                self._norm_cache[sql] = n
+        return n
+
+    def record(self, sql: str, seconds: float, rows: int) -> None:
+        key = self._normalized(sql)
+        with self._lock:
+            e = self._entries.get(key)
+            if e is None:
+                if len(self._entries) >= self.max_statements:
+                    key = OTHER
+                    e = self._entries.get(key)
+                if e is None:
+                    e = self._entries[key] = _Entry()
+            e.calls += 1
+            e.total += seconds
+            if seconds > e.max:
+                e.max = seconds
+            if rows > 0:
+                e.rows += rows
+            e.samples.append(seconds)
+
+    def is_slow(self, seconds: float) -> bool:
+        return self.slow_ms > 0 and seconds * 1000.0 >= self.slow_ms
+
+    def record_slow(self, sql: str, seconds: float, rows: int, plan: Sequence[str]) -> None:
+        item = {
+            "ts": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "ms": round(seconds * 1000.0, 2),
+            "rows": rows,
+            "sql": self._normalized(sql),
+            "plan": list(plan),
+        }
+        with self._lock:
+            self._slow.append(item)
+        print(
+            f"[slow-query] {item['ms']} ms rows={rows} sql={item['sql']}"
+            + "".join(f"\n    plan: {p}" for p in plan),
+            file=sys.stderr,
+            flush=True,
+        )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._slow.clear()
+            self.since = time.time()
+
+    def snapshot(self, order: str = "total", limit: int = 50) -> Dict[str, Any]:
+        """Top `limit` sentencias por order = total | p99 | calls | max | rows."""
+        with self._lock:
+            items = [(k, e.calls, e.total, e.max, e.rows, sorted(e.samples)) for k, e in self._entries.items()]
+            slow = list(self._slow)
+        out = []
+        for sql, calls, total, mx, rows, samples in items:
+            out.append({
+                "sql": sql,
+                "calls": calls,
+                "total_ms": round(total * 1000.0, 3),
+                "avg_ms": round(total * 1000.0 / calls, 3) if calls else 0.0,
+                "p50_ms": round(_quantile(samples, 0.50) * 1000.0, 3),
+                "p99_ms": round(_quantile(samples, 0.99) * 1000.0, 3),
+                "max_ms": round(mx * 1000.0, 3),
+                "rows": rows,
+            })
+        keys = {"total": "total_ms", "p99": "p99_ms", "calls": "calls", "max": "max_ms", "rows": "rows"}
+        key = keys.get(order)
+        if key is None:
+            raise ValueError("ORDEN_INVALIDO")
+        out.sort(key=lambda r: r[key], reverse=True)
+        return {
+            "since": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.since)),
+            "statements": len(items),
+            "slow_ms": self.slow_ms,
+            "queries": out[: max(1, int(limit))],
+            "slow": slow,
+        }
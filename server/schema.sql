@@ -1,3 +1,5 @@
+-- Schema base (versión 0). Solo se aplica a una BD nueva o anterior a las
+-- migraciones: los cambios nuevos van en server/migrations/NNNN_*.sql.
 PRAGMA foreign_keys = ON;
 
 -- =========================
@@ -178,10 +180,16 @@ CREATE TABLE IF NOT EXISTS pedido (
 
 CREATE INDEX IF NOT EXISTS ix_pedido_fecha      ON pedido (fecha_registro);
 CREATE INDEX IF NOT EXISTS ix_pedido_estado     ON pedido (estado);
-CREATE INDEX IF NOT EXISTS ix_pedido_archivado  ON pedido (es_archivado);
 CREATE INDEX IF NOT EXISTS ix_pedido_codigo     ON pedido (codigo_producto);
 CREATE INDEX IF NOT EXISTS ix_pedido_turno      ON pedido (turno_id);
 
+-- Listado paginado (keyset): WHERE es_archivado [AND estado] ORDER BY creado_en DESC, id DESC
+-- (id es el rowid: va implícito al final de cada índice)
+CREATE INDEX IF NOT EXISTS ix_pedido_archivado_creado        ON pedido (es_archivado, creado_en);
+CREATE INDEX IF NOT EXISTS ix_pedido_archivado_estado_creado ON pedido (es_archivado, estado, creado_en);
+
+-- Índices agregados después (export por fecha, usuario, etc.): server/migrations/
+
 -- =========================
 -- 5) Anomalía
 -- =========================
@@ -219,10 +227,13 @@ CREATE TABLE IF NOT EXISTS anomalia (
 
 CREATE INDEX IF NOT EXISTS ix_anomalia_fecha      ON anomalia (fecha_registro);
 CREATE INDEX IF NOT EXISTS ix_anomalia_estado     ON anomalia (estado);
-CREATE INDEX IF NOT EXISTS ix_anomalia_archivado  ON anomalia (es_archivado);
 CREATE INDEX IF NOT EXISTS ix_anomalia_maquina    ON anomalia (maquina_id);
 CREATE INDEX IF NOT EXISTS ix_anomalia_turno      ON anomalia (turno_id);
 
+-- Listado paginado (keyset), mismo criterio que pedido
+CREATE INDEX IF NOT EXISTS ix_anomalia_archivado_creado        ON anomalia (es_archivado, creado_en);
+CREATE INDEX IF NOT EXISTS ix_anomalia_archivado_estado_creado ON anomalia (es_archivado, estado, creado_en);
+
 -- =========================
 -- 6) Log administrativo
 -- =========================
@@ -299,3 +310,124 @@ ON tipo_plancha_variacion (tipo_plancha_id);
 
 CREATE INDEX IF NOT EXISTS ix_tpv_variacion
 ON tipo_plancha_variacion (variacion_material_id);
+
+-- =========================
+-- 9) Contadores de cambios (ETag de listados/detalle)
+-- Un contador por grupo: "pedido", "anomalia", "catalogos" (turno, maquina,
+-- tipo_plancha, variacion_material, tipo_plancha_variacion). Lo suben triggers en
+-- cada INSERT/UPDATE/DELETE; el server arma el ETag sin consultar los datos.
+-- "auth" sube al revocar/borrar sesiones o cambiar datos cacheados del usuario:
+-- con varios procesos, cada uno descarta su cache de tokens al verlo cambiar.
+-- Arrancan en un valor aleatorio: una BD recreada no repite ETags de la anterior.
+-- =========================
+
+CREATE TABLE IF NOT EXISTS tabla_version (
+  tabla    TEXT PRIMARY KEY,
+  version  INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO tabla_version (tabla, version) VALUES ('pedido', abs(random() % 1000000000));
+INSERT OR IGNORE INTO tabla_version (tabla, version) VALUES ('anomalia', abs(random() % 1000000000));
+INSERT OR IGNORE INTO tabla_version (tabla, version) VALUES ('catalogos', abs(random() % 1000000000));
+INSERT OR IGNORE INTO tabla_version (tabla, version) VALUES ('auth', abs(random() % 1000000000));
+
+CREATE TRIGGER IF NOT EXISTS trg_pedido_ver_ai AFTER INSERT ON pedido BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'pedido';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_pedido_ver_au AFTER UPDATE ON pedido BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'pedido';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_pedido_ver_ad AFTER DELETE ON pedido BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'pedido';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_anomalia_ver_ai AFTER INSERT ON anomalia BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'anomalia';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_anomalia_ver_au AFTER UPDATE ON anomalia BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'anomalia';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_anomalia_ver_ad AFTER DELETE ON anomalia BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'anomalia';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_turno_ver_ai AFTER INSERT ON turno BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'catalogos';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_turno_ver_au AFTER UPDATE ON turno BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'catalogos';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_turno_ver_ad AFTER DELETE ON turno BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'catalogos';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_maquina_ver_ai AFTER INSERT ON maquina BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'catalogos';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_maquina_ver_au AFTER UPDATE ON maquina BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'catalogos';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_maquina_ver_ad AFTER DELETE ON maquina BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'catalogos';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_tipo_plancha_ver_ai AFTER INSERT ON tipo_plancha BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'catalogos';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_tipo_plancha_ver_au AFTER UPDATE ON tipo_plancha BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'catalogos';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_tipo_plancha_ver_ad AFTER DELETE ON tipo_plancha BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'catalogos';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_variacion_material_ver_ai AFTER INSERT ON variacion_material BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'catalogos';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_variacion_material_ver_au AFTER UPDATE ON variacion_material BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'catalogos';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_variacion_material_ver_ad AFTER DELETE ON variacion_material BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'catalogos';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_tipo_plancha_variacion_ver_ai AFTER INSERT ON tipo_plancha_variacion BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'catalogos';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_tipo_plancha_variacion_ver_au AFTER UPDATE ON tipo_plancha_variacion BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'catalogos';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_tipo_plancha_variacion_ver_ad AFTER DELETE ON tipo_plancha_variacion BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'catalogos';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_auth_sesion_ver_au AFTER UPDATE OF revocado, expira_en ON auth_sesion BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'auth';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_auth_sesion_ver_ad AFTER DELETE ON auth_sesion BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'auth';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_usuario_ver_au
+AFTER UPDATE OF nombre, apellido, email, username, rol, activo ON usuario BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'auth';
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_usuario_ver_ad AFTER DELETE ON usuario BEGIN
+  UPDATE tabla_version SET version = version + 1 WHERE tabla = 'auth';
+END;
@@ -1,29 +1,250 @@
 # server/server.py
+import os
+import signal
+import sys
+import time
 from http.server import ThreadingHTTPServer
-from pathlib import Path
 
 from server.config import CONFIG
 from server.http.app_handler import AppHandler
+from server.http.asset_build import build_assets
+from server.http.async_server import AsyncHTTPServer
+from server.http.metrics import METRICS
+from server.http.pool_server import PooledHTTPServer, ReusePortThreadingHTTPServer
+from server.http.rate_limit import MemoryRateLimitBackend, SqliteRateLimitBackend, set_backend
+from server.http.routes import ROUTER
 from server.http.seed import seed_catalogos
+from server.http.static_cache import STATIC_CACHE
+from server.migrate import Migrator
+from server.services.busqueda_service import BusquedaService
 
 
-def load_text(path: Path) -> str:
-    return path.read_text(encoding="utf-8")
+MIGRATOR = Migrator(
+    AppHandler.db,
+    CONFIG.schema_path,
+    online=CONFIG.db_migrations_online,
+    busy_timeout_ms=CONFIG.db_migrations_busy_timeout_ms,
+)
 
 
-def main():
-    schema = load_text(CONFIG.schema_path)
-    AppHandler.db.init_schema(schema)
+def prepare_database() -> None:
+    # BD al día: solo se lee PRAGMA user_version (schema.sql ya no se re-ejecuta en cada arranque)
+    applied = MIGRATOR.migrate()
+    if applied:
+        print(f"Schema: migraciones {applied[0]:04d}..{applied[-1]:04d} aplicadas (versión {applied[-1]}).")
+    if MIGRATOR.background:
+        print(f"Schema: {len(MIGRATOR.background)} migraciones online se aplican en segundo plano.")
     seed_catalogos(AppHandler.db)
+    if not BusquedaService(AppHandler.db).ensure_schema():
+        print("Aviso: SQLite sin FTS5; la búsqueda usa LIKE.")
+
+
+def prepare_assets() -> None:
+    if not CONFIG.web_bundles:
+        return
+    try:
+        info = build_assets(CONFIG.web_root, CONFIG.web_build_root)
+    except (OSError, ValueError) as e:
+        # Sin build (ej: disco de solo lectura): se sirven los archivos originales
+        print(f"Aviso: bundles no generados ({e}); se sirve web/ sin agrupar.")
+        return
+    STATIC_CACHE.set_roots([CONFIG.web_build_root, CONFIG.web_root])
+    print(
+        f"Bundles: {info['pages']} páginas, {info['requests_before']} -> {info['requests_after']} "
+        f"requests CSS/JS ({info['bytes_in'] // 1024} -> {info['bytes_out'] // 1024} KiB)"
+    )
+
+
+def make_server(reuse_port: bool = False):
+    if CONFIG.http_server_mode == "threading":
+        cls = ReusePortThreadingHTTPServer if reuse_port else ThreadingHTTPServer
+        return cls((CONFIG.host, CONFIG.port), AppHandler)
+    if CONFIG.http_server_mode == "async":
+        return AsyncHTTPServer(
+            (CONFIG.host, CONFIG.port),
+            AppHandler,
+            workers=CONFIG.http_workers,
+            queue_max=CONFIG.http_queue_max,
+            retry_after=CONFIG.http_retry_after_seconds,
+            keepalive_timeout=CONFIG.http_keepalive_timeout,
+            # El front end lee el body antes de despachar: tope = la ruta más permisiva
+            max_body=max(r.max_body for r in ROUTER.routes()),
+            reuse_port=reuse_port,
+        )
+    if CONFIG.http_server_mode != "pool":
+        raise ValueError(f"HTTP_SERVER_MODE inválido: {CONFIG.http_server_mode}")
+    return PooledHTTPServer(
+        (CONFIG.host, CONFIG.port),
+        AppHandler,
+        workers=CONFIG.http_workers,
+        queue_max=CONFIG.http_queue_max,
+        retry_after=CONFIG.http_retry_after_seconds,
+        reuse_port=reuse_port,
+    )
+
+
+def configure_rate_limit() -> None:
+    # Se llama en cada proceso que atiende requests (las conexiones no cruzan fork)
+    backend = CONFIG.rate_limit_backend
+    if backend == "auto":
+        backend = "sqlite" if CONFIG.http_processes > 1 else "memory"
+    if backend == "sqlite":
+        set_backend(SqliteRateLimitBackend(CONFIG.rate_limit_sqlite_path()))
+    elif backend == "memory":
+        set_backend(MemoryRateLimitBackend())
+    else:
+        raise ValueError(f"RATE_LIMIT_BACKEND inválido: {CONFIG.rate_limit_backend}")
+
+
+def process_gauges(server) -> dict:
+    """Series por proceso para /api/metrics (estado actual de pools y caches)."""
+    g = {}
+    stats = server.stats() if hasattr(server, "stats") else {}
+    if stats:
+        g["http_workers_busy"] = stats.get("busy", 0)
+        g["http_queue"] = stats.get("queue", 0)
+        g["http_rejected_total"] = stats.get("rejected", 0)
+        if "connections" in stats:
+            g["http_connections"] = stats["connections"]
+        if "idle" in stats:
+            g["http_keepalive_idle"] = stats["idle"]
+    pool = AppHandler.db.pool_stats()
+    g["db_pool_in_use"] = pool["in_use"]
+    g["db_pool_open"] = pool["open"]
+    static = STATIC_CACHE.stats()
+    g["static_cache_bytes"] = static["bytes"]
+    g["static_cache_hits_total"] = static["hits"]
+    return g
+
+
+def _on_sigterm(signum, frame):
+    # Apagado ordenado también con SIGTERM (Fly/systemd): mismo camino que Ctrl+C
+    raise KeyboardInterrupt()
 
-    server = ThreadingHTTPServer((CONFIG.host, CONFIG.port), AppHandler)
+
+def serve(reuse_port: bool = False) -> None:
+    """
+    Atiende requests en este proceso hasta Ctrl+C / SIGTERM.
+    """
+    configure_rate_limit()
+    AppHandler.auth.ultimo_uso.start()
+    server = make_server(reuse_port=reuse_port)
+    METRICS.gauges_fn = lambda: process_gauges(server)
+    METRICS.start()
+    MIGRATOR.start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        MIGRATOR.stop()
+        METRICS.stop()
+        AppHandler.auth.ultimo_uso.stop()
+        AppHandler.db.close()
+
+
+def _child(index: int) -> int:
+    # Proceso hijo: señales por defecto del server y pool de BD propio
+    signal.signal(signal.SIGTERM, _on_sigterm)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    AppHandler.db.reopen()
+    METRICS.configure(index, CONFIG.metrics_path(), CONFIG.metrics_sync_seconds)
+    try:
+        serve(reuse_port=True)
+        return 0
+    except Exception as e:
+        print(f"Worker {index} (pid {os.getpid()}) terminó con error: {e}")
+        return 1
+
+
+def run_prefork(processes: int) -> None:
+    """
+    Prefork: N procesos hijos, cada uno con su propio socket en el mismo puerto
+    (SO_REUSEPORT: el kernel reparte las conexiones). PBKDF2 y exports corren en
+    paralelo real (un GIL por proceso).
+    - El padre no atiende requests: vigila y reinicia hijos que mueren.
+    - SIGTERM/Ctrl+C al padre se reenvía a los hijos (cada uno hace flush y cierra).
+    """
+    # Sin conexiones abiertas al forkear (prepare_database usó el pool del padre)
+    AppHandler.db.close()
+    # Snapshots de métricas de una ejecución anterior (otra cantidad de procesos)
+    for p in CONFIG.metrics_path().glob("proc-*.json"):
+        p.unlink(missing_ok=True)
+
+    children = {}
+    stopping = False
+
+    def spawn(index: int) -> None:
+        # Sin esto, lo pendiente en los buffers del padre se imprimiría también en el hijo
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = _child(index)
+            finally:
+                os._exit(code)
+        children[pid] = (index, time.monotonic())
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for i in range(processes):
+        spawn(i)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index, started = children.pop(pid, (None, 0.0))
+        if stopping or index is None:
+            continue
+        print(f"Worker {index} (pid {pid}) terminó (status {status}); reiniciando.")
+        # Evita un bucle de reinicios si el hijo falla al arrancar (ej: puerto ocupado)
+        if time.monotonic() - started < 1.0:
+            time.sleep(1.0)
+        if not stopping:
+            spawn(index)
+
+
+def main():
+    prepare_database()
+    prepare_assets()
+    # Antes de forkear: los hijos heredan el cache (y el gzip) ya calculado
+    n = STATIC_CACHE.warm()
+    print(f"Estáticos en cache: {n} archivos ({STATIC_CACHE.stats()['bytes'] // 1024} KiB)")
+    signal.signal(signal.SIGTERM, _on_sigterm)
 
     print(f"Servidor iniciado en http://{CONFIG.host}:{CONFIG.port}")
+    if CONFIG.http_server_mode in ("pool", "async"):
+        print(
+            f"Modo {CONFIG.http_server_mode}: {CONFIG.http_workers} workers, "
+            f"cola {CONFIG.http_queue_max} (GET /api/health -> http)"
+        )
+    if CONFIG.http_processes > 1:
+        print(f"Prefork: {CONFIG.http_processes} procesos (SO_REUSEPORT)")
     print("Login: POST /api/registro-turno/iniciar (operador/admin)")
     print("Extras: POST /api/extras/elevate (alias compat: POST /api/admin/elevate)")
     print("Admin: GET /api/admin/status")
     print("Admin: POST /api/admin/purge/*  (requiere X-Admin-Key + X-Extras-Token)")
-    print("Admin: POST /api/admin/extras-key/rotate (requiere X-Admin-Key)")
+    if CONFIG.http_processes > 1:
+        print("Admin: POST /api/admin/extras-key/rotate no disponible con prefork (usar EXTRA_KEY)")
+    else:
+        print("Admin: POST /api/admin/extras-key/rotate (requiere X-Admin-Key)")
     print(
         "Pedidos: GET /api/pedidos | GET /api/pedidos/<id> | POST /api/pedidos/<id>/actualizar | "
         "POST /api/pedidos/<id>/archivar | POST /api/pedidos/<id>/restaurar"
@@ -35,7 +256,10 @@ def main():
     print("Export: GET /api/export/pedidos.csv?desde=YYYY-MM-DD&hasta=YYYY-MM-DD")
     print("Export: GET /api/export/anomalias.csv?desde=YYYY-MM-DD&hasta=YYYY-MM-DD")
 
-    server.serve_forever()
+    if CONFIG.http_processes > 1:
+        run_prefork(CONFIG.http_processes)
+    else:
+        serve()
 
 
 if __name__ == "__main__":
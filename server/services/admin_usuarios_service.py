@@ -3,6 +3,7 @@ from typing import Any, Dict, List, Optional
 
 from server.config import CONFIG
 from server.http.security import hash_pbkdf2_password
+from server.services.auth_service import invalidate_sesiones_usuario
 
 
 class AdminUsuariosService:
@@ -150,6 +151,8 @@ class AdminUsuariosService:
             """,
             (nombre, apellido, email, username, rol, uid),
         )
+        # rol / datos expuestos en la sesión
+        invalidate_sesiones_usuario(uid)
 
     def toggle_activo(self, uid: int, activo: int) -> None:
         uid = int(uid or 0)
@@ -173,3 +176,4 @@ class AdminUsuariosService:
             "UPDATE usuario SET activo = ?, actualizado_en = datetime('now') WHERE id = ?;",
             (activo_i, uid),
         )
+        invalidate_sesiones_usuario(uid)
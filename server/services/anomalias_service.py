@@ -1,16 +1,31 @@
 # server/services/anomalias_service.py
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from server.db import Database
+from server.services.busqueda_service import fts_disponible, fts_match_expr
 
 
 class AnomaliasService:
     def __init__(self, db: Database):
         self.db = db
 
-    def listar_anomalias(self, estado: Optional[str], q: Optional[str], incluir_archivados: bool) -> List[Dict[str, Any]]:
+    def listar_anomalias(
+        self,
+        estado: Optional[str],
+        q: Optional[str],
+        incluir_archivados: bool,
+        limit: Optional[int] = None,
+        cursor: Optional[Tuple[str, int]] = None,
+        orden: str = "reciente",
+    ) -> List[Dict[str, Any]]:
+        """
+        Paginación keyset y búsqueda FTS opcionales (ver PedidosService.listar_pedidos).
+        """
         where = []
         params: List[Any] = []
 
+        match = fts_match_expr(q) if (q and fts_disponible()) else None
+        ranked = bool(match) and orden == "relevancia"
+
         # Archivado
         if estado == "archivado":
             if incluir_archivados:
@@ -25,28 +40,55 @@ class AnomaliasService:
             where.append("a.estado = ?")
             params.append(estado)
 
-        # Búsqueda simple (título, descripción, fecha, máquina)
-        if q:
+        # Búsqueda (título, descripción, fecha, máquina): FTS5 o LIKE como fallback
+        if match:
+            where.append("anomalia_fts MATCH ?")
+            params.append(match)
+        elif q:
             like = f"%{q.strip()}%"
             where.append("(m.nombre LIKE ? OR a.descripcion LIKE ? OR a.fecha_registro LIKE ? OR a.titulo LIKE ?)")
             params.extend([like, like, like, like])
 
-        sql = sql = f"""
+        if cursor and match and not ranked:
+            where.append("f.rowid < ?")
+            params.append(cursor[1])
+        elif cursor and not ranked:
+            where.append("(a.creado_en, a.id) < (?, ?)")
+            params.extend([cursor[0], cursor[1]])
+
+        limit_sql = ""
+        if limit is not None:
+            limit_sql = "LIMIT ?"
+            params.append(int(limit))
+
+        if ranked:
+            from_sql = "anomalia_fts f JOIN anomalia a ON a.id = f.rowid"
+            order_sql = "bm25(anomalia_fts, 3.0, 1.0, 0.5, 1.0), a.id DESC"
+        elif match:
+            from_sql = "anomalia_fts f JOIN anomalia a ON a.id = f.rowid"
+            order_sql = "f.rowid DESC"
+        else:
+            from_sql = "anomalia a"
+            order_sql = "a.creado_en DESC, a.id DESC"
+
+        sql = f"""
             SELECT
             a.id,
             a.titulo,
             a.descripcion,
             a.fecha_registro,
+            a.creado_en,
             a.estado,
             t.nombre AS turno_nombre,
             m.nombre AS maquina_nombre,
             a.modificado_en,
             a.es_archivado
-            FROM anomalia a
+            FROM {from_sql}
             JOIN turno t ON t.id = a.turno_id
             JOIN maquina m ON m.id = a.maquina_id
             {"WHERE " + " AND ".join(where) if where else ""}
-            ORDER BY a.creado_en DESC, a.id DESC;
+            ORDER BY {order_sql}
+            {limit_sql};
             """
 
         return self.db.query_all(sql, tuple(params))
@@ -73,8 +115,26 @@ class AnomaliasService:
         solucion = None
         es_archivado = 0
 
+        with self.db.transaction():
+            new_id = self._insertar_anomalia(
+                registro_turno_id, turno_id, maquina_id, titulo, descripcion, fecha_registro, estado, solucion, es_archivado
+            )
+            return self.obtener_anomalia_detalle(new_id)
+
+    def _insertar_anomalia(
+        self,
+        registro_turno_id: int,
+        turno_id: int,
+        maquina_id: int,
+        titulo: str,
+        descripcion: str,
+        fecha_registro: str,
+        estado: str,
+        solucion: Optional[str],
+        es_archivado: int,
+    ) -> int:
         if fecha_registro:
-            self.db.execute(
+            return self.db.execute(
                 """
                 INSERT INTO anomalia (
                   registro_turno_id,
@@ -104,7 +164,7 @@ class AnomaliasService:
             )
         else:
             # Si no viene, dejamos que actúe DEFAULT (date('now'))
-            self.db.execute(
+            return self.db.execute(
                 """
                 INSERT INTO anomalia (
                   registro_turno_id,
@@ -131,10 +191,6 @@ class AnomaliasService:
                 ),
             )
 
-        row = self.db.query_one("SELECT last_insert_rowid() AS id;")
-        new_id = int(row["id"])
-        return self.obtener_anomalia_detalle(new_id)
-
     def obtener_anomalia_detalle(self, anomalia_id: int) -> Optional[Dict[str, Any]]:
         return self.db.query_one(
             """
@@ -168,6 +224,10 @@ class AnomaliasService:
         )
 
     def actualizar_anomalia_operador(self, anomalia_id: int, dto: Dict[str, Any]) -> Dict[str, Any]:
+        with self.db.transaction():
+            return self._actualizar_anomalia_operador(anomalia_id, dto)
+
+    def _actualizar_anomalia_operador(self, anomalia_id: int, dto: Dict[str, Any]) -> Dict[str, Any]:
         row = self.db.query_one(
             """
             SELECT id, estado, es_archivado
@@ -221,6 +281,10 @@ class AnomaliasService:
         - Editar solucion (si estado queda solucionado debe cumplir >=10)
         Restricción: si está archivada => ARCHIVED
         """
+        with self.db.transaction():
+            return self._actualizar_anomalia_admin(anomalia_id, dto)
+
+    def _actualizar_anomalia_admin(self, anomalia_id: int, dto: Dict[str, Any]) -> Dict[str, Any]:
         row = self.db.query_one(
             """
             SELECT id, estado, es_archivado
@@ -1,11 +1,174 @@
 # server/services/auth_service.py
 import hashlib
 import secrets
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 from server.config import CONFIG
 from server.http.security import hash_pbkdf2_password, verify_pbkdf2_password
+from server.services.versiones_service import VersionWatch
+
+
+class TokenCache:
+    """
+    Cache acotado token_hash -> (usuario, expira_sesion), compartido por el proceso.
+    - LRU con max_size entradas y TTL por entrada.
+    - Invalidación explícita por token (logout) o por usuario (revocación, activo, rol).
+    - _generation: un miss que leyó la BD antes de una invalidación no publica
+      su resultado (evita re-cachear datos viejos).
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max(0, int(max_size))
+        self.ttl = float(ttl_seconds)
+        self._data: "OrderedDict[str, Tuple[float, datetime, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def get(self, th: str) -> Optional[Tuple[datetime, Dict[str, Any]]]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(th)
+            if item is None or item[0] < now:
+                if item is not None:
+                    del self._data[th]
+                self.misses += 1
+                return None
+            self._data.move_to_end(th)
+            self.hits += 1
+            return item[1], item[2]
+
+    def put(self, th: str, expira: datetime, usuario: Dict[str, Any], generation: int) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._data[th] = (time.monotonic() + self.ttl, expira, usuario)
+            self._data.move_to_end(th)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate_token(self, th: str) -> None:
+        with self._lock:
+            self._generation += 1
+            self._data.pop(th, None)
+
+    def invalidate_usuario(self, usuario_id: int) -> None:
+        uid = int(usuario_id)
+        with self._lock:
+            self._generation += 1
+            for th in [k for k, v in self._data.items() if int(v[2]["id"]) == uid]:
+                del self._data[th]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class UltimoUsoBuffer:
+    """
+    Write-behind de auth_sesion.ultimo_uso_en.
+    - touch(): registra en memoria el último uso de cada token (se coalesce por token).
+    - Un hilo daemon hace flush() cada interval segundos: un solo UPDATE por lotes
+      en una transacción, en vez de una escritura por request autenticado.
+    - stop(): detiene el hilo y hace el flush final (llamar al apagar el server).
+    - Sin hilo corriendo (CLI, interval <= 0) se escribe directo, como antes.
+    """
+
+    def __init__(self, db, interval_seconds: float):
+        self.db = db
+        self.interval = float(interval_seconds)
+        self._pending: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.flushed = 0
+
+    def start(self) -> None:
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ultimo-uso-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        t = self._thread
+        if t is not None:
+            self._stop.set()
+            t.join(timeout=max(1.0, self.interval))
+            self._thread = None
+        self.flush()
+
+    def touch(self, th: str, ts: str) -> None:
+        if self._thread is None:
+            self._write([(ts, th)])
+            return
+        with self._lock:
+            self._pending[th] = ts
+
+    def flush(self) -> int:
+        with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+        try:
+            self._write([(ts, th) for th, ts in batch.items()])
+        except Exception:
+            # Reintento en el próximo ciclo (sin pisar usos más recientes)
+            with self._lock:
+                for th, ts in batch.items():
+                    self._pending.setdefault(th, ts)
+            return 0
+        self.flushed += len(batch)
+        return len(batch)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _write(self, rows) -> None:
+        self.db.execute_many(
+            "UPDATE auth_sesion SET ultimo_uso_en = ? WHERE token_hash = ?;",
+            rows,
+        )
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+
+TOKEN_CACHE = TokenCache(CONFIG.auth_cache_max, CONFIG.auth_cache_ttl_seconds)
+# Logout/revocación hechos en otro proceso (prefork): contador "auth" de tabla_version
+_AUTH_WATCH = VersionWatch("auth", CONFIG.cache_sync_seconds)
+
+
+def invalidate_sesiones_usuario(usuario_id: int) -> None:
+    """
+    Llamar después de confirmar (commit) cambios que afectan la autorización
+    del usuario: revocar sesiones, activo/inactivo, rol o datos expuestos.
+    """
+    TOKEN_CACHE.invalidate_usuario(usuario_id)
 
 
 class AuthService:
@@ -13,6 +176,7 @@ class AuthService:
 
     def __init__(self, db):
         self.db = db
+        self.ultimo_uso = UltimoUsoBuffer(db, CONFIG.auth_ultimo_uso_flush_seconds)
 
     def _now(self) -> datetime:
         # UTC naive; en SQLite datetime('now') también es UTC.
@@ -111,6 +275,7 @@ class AuthService:
                     "UPDATE usuario SET activo = 1, actualizado_en = datetime('now') WHERE id = ?;",
                     (row0["id"],),
                 )
+                invalidate_sesiones_usuario(row0["id"])
 
         # Asegurar que mantenga rol admin (por si alguien lo cambió)
         if (row0.get("rol") or "") != "admin":
@@ -118,6 +283,7 @@ class AuthService:
                 "UPDATE usuario SET rol = 'admin', actualizado_en = datetime('now') WHERE id = ?;",
                 (row0["id"],),
             )
+            invalidate_sesiones_usuario(row0["id"])
 
     # ==========================================================
     # API pública Auth
@@ -221,13 +387,39 @@ class AuthService:
             return
         th = self._token_hash(t)
         self.db.execute("UPDATE auth_sesion SET revocado = 1 WHERE token_hash = ?;", (th,))
+        TOKEN_CACHE.invalidate_token(th)
+
+    def _touch(self, th: str, now: datetime) -> None:
+        try:
+            self.ultimo_uso.touch(th, now.strftime("%Y-%m-%d %H:%M:%S"))
+        except Exception:
+            pass
 
     def get_usuario_by_token(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Usuario de una sesión válida (o None).
+        Hit de TOKEN_CACHE: sin consulta a BD (solo se revisa la expiración).
+        ultimo_uso_en se registra en cada request vía write-behind (UltimoUsoBuffer).
+        """
         t = (token or "").strip()
         if not t:
             return None
         th = self._token_hash(t)
 
+        if _AUTH_WATCH.changed(self.db):
+            TOKEN_CACHE.clear()
+
+        cached = TOKEN_CACHE.get(th)
+        if cached is not None:
+            exp, usuario = cached
+            now = self._now()
+            if exp < now:
+                TOKEN_CACHE.invalidate_token(th)
+                return None
+            self._touch(th, now)
+            return dict(usuario)
+
+        gen = TOKEN_CACHE.generation()
         row = self.db.query_one(
             """
             SELECT u.id, u.nombre, u.apellido, u.email, u.username, u.rol, u.activo,
@@ -251,15 +443,9 @@ class AuthService:
         except Exception:
             return None
 
-        try:
-            self.db.execute(
-                "UPDATE auth_sesion SET ultimo_uso_en = datetime('now') WHERE token_hash = ?;",
-                (th,),
-            )
-        except Exception:
-            pass
+        self._touch(th, self._now())
 
-        return {
+        usuario = {
             "id": row["id"],
             "nombre": row["nombre"],
             "apellido": row["apellido"],
@@ -267,3 +453,5 @@ class AuthService:
             "username": row["username"],
             "rol": row["rol"],
         }
+        TOKEN_CACHE.put(th, exp, usuario, gen)
+        return dict(usuario)
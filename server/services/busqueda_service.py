@@ -0,0 +1,239 @@
+# server/services/busqueda_service.py
+from __future__ import annotations
+
+import re
+import sqlite3
+from typing import Dict, Optional
+
+from server.db import Database
+
+# ==========================================================
+# Índice full-text (FTS5) para el filtro "q" de pedidos/anomalías.
+# - Tablas FTS propias (no external-content): anomalia_fts necesita el nombre
+#   de la máquina, que vive en otra tabla.
+# - Triggers mantienen el índice sincronizado; solo se disparan si cambian
+#   columnas indexadas (actualizar planchas/estado no toca el índice).
+# - unicode61 + remove_diacritics: "anomalia" encuentra "anomalía".
+# - Si SQLite no trae FTS5, se sigue usando LIKE (ver fts_disponible()).
+# - unicode61 solo encuentra prefijos de palabra: "18" no encuentra "MDF18".
+#   Para buscar por parte del código de producto, pedido_codigo_fts indexa
+#   codigo_producto con el tokenizer trigram (SQLite >= 3.34; si no, LIKE).
+# ==========================================================
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS pedido_fts USING fts5(
+  codigo_producto,
+  descripcion_producto,
+  fecha_registro,
+  tokenize = 'unicode61 remove_diacritics 2',
+  prefix = '2 3 4'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_pedido_fts_ai AFTER INSERT ON pedido BEGIN
+  INSERT INTO pedido_fts (rowid, codigo_producto, descripcion_producto, fecha_registro)
+  VALUES (new.id, new.codigo_producto, new.descripcion_producto, new.fecha_registro);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_pedido_fts_ad AFTER DELETE ON pedido BEGIN
+  DELETE FROM pedido_fts WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_pedido_fts_au
+AFTER UPDATE OF codigo_producto, descripcion_producto, fecha_registro ON pedido BEGIN
+  DELETE FROM pedido_fts WHERE rowid = old.id;
+  INSERT INTO pedido_fts (rowid, codigo_producto, descripcion_producto, fecha_registro)
+  VALUES (new.id, new.codigo_producto, new.descripcion_producto, new.fecha_registro);
+END;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS anomalia_fts USING fts5(
+  titulo,
+  descripcion,
+  fecha_registro,
+  maquina_nombre,
+  tokenize = 'unicode61 remove_diacritics 2',
+  prefix = '2 3 4'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_anomalia_fts_ai AFTER INSERT ON anomalia BEGIN
+  INSERT INTO anomalia_fts (rowid, titulo, descripcion, fecha_registro, maquina_nombre)
+  VALUES (
+    new.id, new.titulo, new.descripcion, new.fecha_registro,
+    (SELECT nombre FROM maquina WHERE id = new.maquina_id)
+  );
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_anomalia_fts_ad AFTER DELETE ON anomalia BEGIN
+  DELETE FROM anomalia_fts WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_anomalia_fts_au
+AFTER UPDATE OF titulo, descripcion, fecha_registro, maquina_id ON anomalia BEGIN
+  DELETE FROM anomalia_fts WHERE rowid = old.id;
+  INSERT INTO anomalia_fts (rowid, titulo, descripcion, fecha_registro, maquina_nombre)
+  VALUES (
+    new.id, new.titulo, new.descripcion, new.fecha_registro,
+    (SELECT nombre FROM maquina WHERE id = new.maquina_id)
+  );
+END;
+
+-- Renombrar una máquina (admin catálogos) actualiza las anomalías indexadas
+CREATE TRIGGER IF NOT EXISTS trg_maquina_fts_au AFTER UPDATE OF nombre ON maquina BEGIN
+  UPDATE anomalia_fts
+     SET maquina_nombre = new.nombre
+   WHERE rowid IN (SELECT id FROM anomalia WHERE maquina_id = new.id);
+END;
+"""
+
+CODIGO_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS pedido_codigo_fts USING fts5(
+  codigo_producto,
+  tokenize = 'trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_pedido_codigo_fts_ai AFTER INSERT ON pedido BEGIN
+  INSERT INTO pedido_codigo_fts (rowid, codigo_producto) VALUES (new.id, new.codigo_producto);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_pedido_codigo_fts_ad AFTER DELETE ON pedido BEGIN
+  DELETE FROM pedido_codigo_fts WHERE rowid = old.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_pedido_codigo_fts_au AFTER UPDATE OF codigo_producto ON pedido BEGIN
+  DELETE FROM pedido_codigo_fts WHERE rowid = old.id;
+  INSERT INTO pedido_codigo_fts (rowid, codigo_producto) VALUES (new.id, new.codigo_producto);
+END;
+"""
+
+# Estado en proceso: se fija al iniciar (ensure_schema)
+_FTS_DISPONIBLE = False
+_TRIGRAM_DISPONIBLE = False
+
+_TOKEN_RE = re.compile(r"\w", re.UNICODE)
+
+
+def fts_disponible() -> bool:
+    return _FTS_DISPONIBLE
+
+
+def trigram_disponible() -> bool:
+    return _TRIGRAM_DISPONIBLE
+
+
+def _fts5_compilado(tokenize: str = "unicode61") -> bool:
+    try:
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute(f"CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x, tokenize = '{tokenize}');")
+        finally:
+            conn.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def fts_match_expr(q: Optional[str]) -> Optional[str]:
+    """
+    Convierte el texto libre de "q" en una expresión MATCH segura:
+    cada palabra como frase entre comillas con prefijo ("roble"*), unidas por AND implícito.
+    - Comillas del usuario se escapan (no se interpreta sintaxis FTS: OR/NOT/NEAR, col:...).
+    - Palabras sin caracteres indexables (ej: "-") se descartan.
+    Retorna None si no queda nada buscable (el caller usa LIKE).
+    """
+    terms = []
+    for raw in (q or "").split():
+        if not _TOKEN_RE.search(raw):
+            continue
+        terms.append('"' + raw.replace('"', '""') + '"*')
+    if not terms:
+        return None
+    return " ".join(terms)
+
+
+def codigo_like_expr(q: Optional[str]) -> Optional[str]:
+    """
+    Patrón LIKE '%q%' para buscar q dentro de codigo_producto (ej: "18" -> "MDF18"),
+    solo si q es un único término (los códigos no llevan espacios). Si no, None.
+    """
+    term = (q or "").strip()
+    if not term or len(term.split()) != 1 or not _TOKEN_RE.search(term):
+        return None
+    return f"%{term}%"
+
+
+class BusquedaService:
+    def __init__(self, db: Database):
+        self.db = db
+
+    def _existe_tabla(self, nombre: str) -> bool:
+        row = self.db.query_one(
+            "SELECT 1 AS ok FROM sqlite_master WHERE type = 'table' AND name = ?;",
+            (nombre,),
+        )
+        return bool(row)
+
+    def ensure_schema(self) -> bool:
+        """
+        Crea tablas FTS + triggers si faltan (idempotente).
+        Si el índice es nuevo en una BD con datos, lo puebla (rebuild).
+        Retorna si la búsqueda FTS quedó disponible.
+        """
+        global _FTS_DISPONIBLE, _TRIGRAM_DISPONIBLE
+
+        if not _fts5_compilado():
+            # SQLite compilado sin FTS5: se mantiene LIKE
+            _FTS_DISPONIBLE = False
+            _TRIGRAM_DISPONIBLE = False
+            return False
+
+        trigram = _fts5_compilado("trigram")
+        tablas = ["pedido_fts", "anomalia_fts"] + (["pedido_codigo_fts"] if trigram else [])
+        nuevo = not all(self._existe_tabla(t) for t in tablas)
+        with self.db.connection() as conn:
+            conn.executescript(FTS_SCHEMA + (CODIGO_FTS_SCHEMA if trigram else ""))
+        _TRIGRAM_DISPONIBLE = trigram
+
+        if nuevo:
+            self.rebuild()
+
+        _FTS_DISPONIBLE = True
+        return True
+
+    def rebuild(self) -> Dict[str, int]:
+        """
+        Reconstruye ambos índices desde las tablas base (para BDs existentes o
+        si el índice quedó desalineado). Una sola transacción.
+        """
+        with self.db.transaction() as tx:
+            tx.execute("DELETE FROM pedido_fts;")
+            tx.execute(
+                """
+                INSERT INTO pedido_fts (rowid, codigo_producto, descripcion_producto, fecha_registro)
+                SELECT id, codigo_producto, descripcion_producto, fecha_registro
+                FROM pedido;
+                """
+            )
+            if _TRIGRAM_DISPONIBLE:
+                tx.execute("DELETE FROM pedido_codigo_fts;")
+                tx.execute(
+                    """
+                    INSERT INTO pedido_codigo_fts (rowid, codigo_producto)
+                    SELECT id, codigo_producto
+                    FROM pedido;
+                    """
+                )
+            tx.execute("DELETE FROM anomalia_fts;")
+            tx.execute(
+                """
+                INSERT INTO anomalia_fts (rowid, titulo, descripcion, fecha_registro, maquina_nombre)
+                SELECT a.id, a.titulo, a.descripcion, a.fecha_registro, m.nombre
+                FROM anomalia a
+                LEFT JOIN maquina m ON m.id = a.maquina_id;
+                """
+            )
+            tx.execute("INSERT INTO pedido_fts (pedido_fts) VALUES ('optimize');")
+            tx.execute("INSERT INTO anomalia_fts (anomalia_fts) VALUES ('optimize');")
+
+            n_ped = tx.query_one("SELECT COUNT(*) AS n FROM pedido_fts;") or {}
+            n_anom = tx.query_one("SELECT COUNT(*) AS n FROM anomalia_fts;") or {}
+
+        return {"pedidos": int(n_ped.get("n") or 0), "anomalias": int(n_anom.get("n") or 0)}
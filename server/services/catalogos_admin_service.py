@@ -6,6 +6,7 @@ from dataclasses import dataclass
 from typing import Any, Dict, List, Tuple
 
 from server.db import Database
+from server.services.catalogos_service import invalidate_catalogos
 
 
 @dataclass(frozen=True)
@@ -24,6 +25,7 @@ class CatalogosAdminService:
     - Eliminación: solo si NO hay referencias (según FK reales + tabla puente).
     - Gestión adicional: asignación de variaciones por material mediante tabla puente
       tipo_plancha_variacion (capa 2 de relación).
+    - Todo write invalida el snapshot de /api/catalogos (invalidate_catalogos).
     """
 
     def __init__(self, db: Database):
@@ -121,6 +123,7 @@ class CatalogosAdminService:
             raise ValueError("NOMBRE_DUPLICADO")
         except Exception:
             raise
+        invalidate_catalogos()
 
         row = self.db.query_one(f"SELECT id, nombre FROM {spec.table} WHERE nombre = ?;", (n,))
         return {"id": row["id"], "nombre": row["nombre"], "activo": 1}
@@ -140,6 +143,7 @@ class CatalogosAdminService:
             raise ValueError("NOMBRE_DUPLICADO")
         except Exception:
             raise
+        invalidate_catalogos()
 
         row = self.db.query_one(f"SELECT id, nombre FROM {spec.table} WHERE id = ?;", (item_id_n,))
         return {"id": row["id"], "nombre": row["nombre"], "activo": 1}
@@ -160,6 +164,7 @@ class CatalogosAdminService:
                 raise ValueError("REFERENCIADO")
 
         self.db.execute(f"DELETE FROM {spec.table} WHERE id = ?;", (item_id_n,))
+        invalidate_catalogos()
         return {"deleted": 1, "id": item_id_n}
 
     # -----------------------
@@ -216,6 +221,7 @@ class CatalogosAdminService:
             """,
             (tp_id, v_id),
         )
+        invalidate_catalogos()
         return {"assigned": True, "tipo_plancha_id": tp_id, "variacion_id": v_id}
 
     def desasignar_variacion(self, tipo_plancha_id: Any, variacion_id: Any) -> Dict[str, Any]:
@@ -248,4 +254,5 @@ class CatalogosAdminService:
             """,
             (tp_id, v_id),
         )
+        invalidate_catalogos()
         return {"unassigned": True, "tipo_plancha_id": tp_id, "variacion_id": v_id}
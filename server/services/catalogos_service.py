@@ -1,6 +1,38 @@
 # server/services/catalogos_service.py
-from typing import Any, Dict, List
+import hashlib
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+from ..config import CONFIG
 from ..db import Database
+from .versiones_service import VersionWatch
+
+# ==========================================================
+# Snapshot en memoria de /api/catalogos (compartido por el proceso).
+# - Se arma una vez (5 consultas) y se reutiliza hasta que un write de catálogos
+#   llame invalidate_catalogos().
+# - "version" = hash del contenido: estable entre reinicios y procesos, así el
+#   cliente puede reenviarla y omitir la descarga si no cambió.
+# - _generation evita publicar un snapshot armado antes de una invalidación concurrente.
+# - _watch: cambios hechos por otro proceso (prefork) se ven vía tabla_version.
+# ==========================================================
+_lock = threading.Lock()
+_snapshot: Optional[Dict[str, Any]] = None
+_generation = 0
+_watch = VersionWatch("catalogos", CONFIG.cache_sync_seconds)
+
+
+def invalidate_catalogos() -> None:
+    global _snapshot, _generation
+    with _lock:
+        _snapshot = None
+        _generation += 1
+
+
+def _version_of(data: Dict[str, Any]) -> str:
+    raw = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
 
 
 class CatalogoService:
@@ -8,6 +40,28 @@ class CatalogoService:
         self.db = db
 
     def get_catalogos(self) -> Dict[str, Any]:
+        """
+        Snapshot actual (incluye "version"). El dict es compartido: no mutarlo.
+        """
+        global _snapshot
+
+        if _watch.changed(self.db):
+            invalidate_catalogos()
+
+        with _lock:
+            if _snapshot is not None:
+                return _snapshot
+            gen = _generation
+
+        data = self._cargar()
+        data["version"] = _version_of(data)
+
+        with _lock:
+            if gen == _generation:
+                _snapshot = data
+        return data
+
+    def _cargar(self) -> Dict[str, Any]:
         turnos = self.db.query_all("SELECT id, nombre FROM turno ORDER BY id;")
         maquinas = self.db.query_all("SELECT id, nombre FROM maquina ORDER BY id;")
         tipos = self.db.query_all("SELECT id, nombre FROM tipo_plancha ORDER BY id;")
@@ -29,9 +83,10 @@ class CatalogoService:
             """
         )
 
-        tipo_plancha_variaciones: Dict[int, List[Dict[str, Any]]] = {}
+        # Claves str: igual que como quedan en el JSON (y estables para el hash)
+        tipo_plancha_variaciones: Dict[str, List[Dict[str, Any]]] = {}
         for r in rows or []:
-            tp_id = int(r["tipo_plancha_id"])
+            tp_id = str(int(r["tipo_plancha_id"]))
             tipo_plancha_variaciones.setdefault(tp_id, []).append(
                 {"id": int(r["variacion_id"]), "nombre": r["variacion_nombre"]}
             )
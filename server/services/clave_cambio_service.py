@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
 from server.http.security import hash_pbkdf2_password
+from server.services.auth_service import invalidate_sesiones_usuario
 
 
 class ClaveCambioService:
@@ -183,6 +184,13 @@ class ClaveCambioService:
         if uid <= 0 or aid <= 0:
             raise ValueError("INVALID")
 
+        # Password + revocación de sesiones + cierre de solicitud: todo o nada
+        with self.db.transaction():
+            self._approve(uid, aid)
+        # Después del COMMIT: sesiones revocadas dejan de valer también en cache
+        invalidate_sesiones_usuario(uid)
+
+    def _approve(self, uid: int, aid: int) -> None:
         # usuario debe estar activo (si está inactivo, no aplicar cambios)
         u = self.db.query_one("SELECT id, activo FROM usuario WHERE id = ? LIMIT 1;", (uid,))
         if not u:
@@ -4,10 +4,13 @@ from __future__ import annotations
 import csv
 import io
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from server.db import Database
 
+# Tamaño objetivo de cada chunk escrito al socket (bytes aprox.)
+CSV_CHUNK_SIZE = 64 * 1024
+
 
 def _safe_iso_date(s: str) -> Optional[str]:
     """
@@ -49,9 +52,10 @@ class ExportService:
     # -----------------------
     # Pedidos -> CSV
     # -----------------------
-    def export_pedidos_csv(self, desde: Optional[str], hasta: Optional[str]) -> Tuple[bytes, str]:
+    def export_pedidos_csv(self, desde: Optional[str], hasta: Optional[str]) -> Tuple[Iterator[bytes], str]:
         """
-        Exporta pedidos a CSV (bytes utf-8) y retorna (content_bytes, filename_sugerido)
+        Exporta pedidos a CSV en streaming y retorna (chunks_bytes, filename_sugerido).
+        Ver _csv_chunks: memoria acotada sin importar el rango de fechas.
 
         ✅ Ajuste aplicado SOLO a pedidos (según lo acordado):
         - Se DESCARTA la métrica "planchas_turno_rango" (no se exporta / no se calcula).
@@ -66,7 +70,9 @@ class ExportService:
 
         where_fragment, params = _date_range_where(d, h, "p.fecha_registro")
 
-        rows = self.db.query_all(
+        # Orden (fecha_registro, creado_en, id) DESC = índice (es_archivado, fecha_registro, creado_en):
+        # el rango se lee directo del índice, ya ordenado (sin sort antes de la primera fila)
+        rows = self.db.iter_rows(
             f"""
             SELECT
               p.id,
@@ -89,7 +95,7 @@ class ExportService:
             JOIN tipo_plancha tp ON tp.id = p.tipo_plancha_id
             WHERE p.es_archivado = 0
             {where_fragment}
-            ORDER BY p.creado_en DESC, p.id DESC;
+            ORDER BY p.fecha_registro DESC, p.creado_en DESC, p.id DESC;
             """,
             tuple(params),
         )
@@ -112,17 +118,17 @@ class ExportService:
             "modificado_en",
         ]
 
-        content = self._to_csv_bytes(rows, headers)
+        chunks = self._csv_chunks(rows, headers)
         fname = self._filename("pedidos", d, h)
-        return content, fname
+        return chunks, fname
 
     # -----------------------
     # Anomalías -> CSV
     # (SIN CAMBIOS)
     # -----------------------
-    def export_anomalias_csv(self, desde: Optional[str], hasta: Optional[str]) -> Tuple[bytes, str]:
+    def export_anomalias_csv(self, desde: Optional[str], hasta: Optional[str]) -> Tuple[Iterator[bytes], str]:
         """
-        Exporta anomalías a CSV (bytes utf-8) y retorna (content_bytes, filename_sugerido)
+        Exporta anomalías a CSV en streaming y retorna (chunks_bytes, filename_sugerido)
         """
         d = _safe_iso_date(desde or "")
         h = _safe_iso_date(hasta or "")
@@ -132,7 +138,9 @@ class ExportService:
 
         where_fragment, params = _date_range_where(d, h, "a.fecha_registro")
 
-        rows = self.db.query_all(
+        # Orden (fecha_registro, creado_en, id) DESC = índice (es_archivado, fecha_registro, creado_en):
+        # el rango se lee directo del índice, ya ordenado (sin sort antes de la primera fila)
+        rows = self.db.iter_rows(
             f"""
             SELECT
               a.id,
@@ -149,7 +157,7 @@ class ExportService:
             JOIN maquina m ON m.id = a.maquina_id
             WHERE a.es_archivado = 0
             {where_fragment}
-            ORDER BY a.creado_en DESC, a.id DESC;
+            ORDER BY a.fecha_registro DESC, a.creado_en DESC, a.id DESC;
             """,
             tuple(params),
         )
@@ -166,20 +174,27 @@ class ExportService:
             "modificado_en",
         ]
 
-        content = self._to_csv_bytes(rows, headers)
+        chunks = self._csv_chunks(rows, headers)
         fname = self._filename("anomalias", d, h)
-        return content, fname
+        return chunks, fname
 
     # -----------------------
     # Helpers
     # -----------------------
-    def _to_csv_bytes(self, rows: List[Dict[str, Any]], headers: List[str]) -> bytes:
+    def _csv_chunks(self, rows: Iterable[Dict[str, Any]], headers: List[str]) -> Iterator[bytes]:
         """
         CSV amigable para Excel (ES/CL):
         - delimitador ';'
-        - UTF-8 con BOM (utf-8-sig)
+        - UTF-8 con BOM (el BOM va al inicio del primer chunk)
         - CRLF para líneas
+
+        Streaming: las filas se consumen desde el cursor y se emiten chunks de
+        ~CSV_CHUNK_SIZE bytes. La consulta se ejecuta antes del primer chunk, así
+        un error de BD ocurre antes de enviar headers (el caller puede responder 500).
         """
+        it = iter(rows)
+        first = next(it, None)
+
         buf = io.StringIO(newline="")
         w = csv.writer(
             buf,
@@ -189,10 +204,23 @@ class ExportService:
         )
 
         w.writerow(headers)
-        for r in rows:
+        yield "\ufeff".encode("utf-8") + buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+
+        if first is None:
+            return
+
+        w.writerow([self._cell(first.get(h)) for h in headers])
+        for r in it:
             w.writerow([self._cell(r.get(h)) for h in headers])
+            if buf.tell() >= CSV_CHUNK_SIZE:
+                yield buf.getvalue().encode("utf-8")
+                buf.seek(0)
+                buf.truncate()
 
-        return buf.getvalue().encode("utf-8-sig")
+        if buf.tell():
+            yield buf.getvalue().encode("utf-8")
 
     def _cell(self, v: Any) -> str:
         if v is None:
@@ -1,6 +1,7 @@
 # server/services/pedidos_service.py
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from ..db import Database
+from .busqueda_service import codigo_like_expr, fts_disponible, fts_match_expr, trigram_disponible
 
 
 class PedidosService:
@@ -59,10 +60,35 @@ class PedidosService:
     # -----------------------
     # Listar
     # -----------------------
-    def listar_pedidos(self, estado: Optional[str], q: Optional[str], incluir_archivados: bool) -> List[Dict[str, Any]]:
+    def listar_pedidos(
+        self,
+        estado: Optional[str],
+        q: Optional[str],
+        incluir_archivados: bool,
+        limit: Optional[int] = None,
+        cursor: Optional[Tuple[str, int]] = None,
+        orden: str = "reciente",
+    ) -> List[Dict[str, Any]]:
+        """
+        Paginación keyset opcional (orden creado_en DESC, id DESC):
+        - limit: cantidad de filas a traer (None => todas)
+        - cursor: (creado_en, id) de la última fila de la página anterior
+        Búsqueda "q": índice FTS5 (pedido_fts) si está disponible; si no, LIKE.
+        - Con FTS la consulta se recorre desde el índice en orden de id DESC (equivale a
+          creado_en DESC: ambos se asignan al insertar) y corta en LIMIT sin ordenar.
+        - orden="relevancia" (solo con q + FTS): ordena por bm25, sin cursor.
+        - q de un solo término también busca dentro de codigo_producto ("18" -> "MDF18"):
+          ids de pedido_fts UNION ids de pedido_codigo_fts (trigram); la consulta parte de esos ids.
+          En relevancia, los que solo coinciden por código van después de los de bm25.
+        """
         where = []
         params: List[Any] = []
 
+        match = fts_match_expr(q) if (q and fts_disponible()) else None
+        ranked = bool(match) and orden == "relevancia"
+        codigo_like = codigo_like_expr(q) if match else None
+        from_params: List[Any] = []
+
         # Archivado
         if estado == "archivado":
             if incluir_archivados:
@@ -77,27 +103,79 @@ class PedidosService:
             where.append("p.estado = ?")
             params.append(estado)
 
-        # Búsqueda
-        if q:
+        # Búsqueda (q de un solo término: el filtro va en el FROM, ver más abajo)
+        if match and not codigo_like:
+            where.append("pedido_fts MATCH ?")
+            params.append(match)
+        elif q and not match:
             like = f"%{q.strip()}%"
             where.append("(p.codigo_producto LIKE ? OR p.descripcion_producto LIKE ? OR p.fecha_registro LIKE ?)")
             params.extend([like, like, like])
 
+        # Keyset: filas estrictamente "anteriores" al cursor
+        if cursor and codigo_like and not ranked:
+            where.append("m.id < ?")
+            params.append(cursor[1])
+        elif cursor and match and not ranked:
+            where.append("f.rowid < ?")
+            params.append(cursor[1])
+        elif cursor and not ranked:
+            where.append("(p.creado_en, p.id) < (?, ?)")
+            params.extend([cursor[0], cursor[1]])
+
+        limit_sql = ""
+        if limit is not None:
+            limit_sql = "LIMIT ?"
+            params.append(int(limit))
+
+        if codigo_like:
+            codigo_sql = (
+                "SELECT rowid FROM pedido_codigo_fts WHERE codigo_producto LIKE ?"
+                if trigram_disponible()
+                else "SELECT id FROM pedido WHERE codigo_producto LIKE ?"
+            )
+            from_sql = (
+                f"(SELECT rowid AS id FROM pedido_fts WHERE pedido_fts MATCH ? UNION {codigo_sql}) m "
+                "JOIN pedido p ON p.id = m.id"
+            )
+            from_params.extend([match, codigo_like])
+            order_sql = "m.id DESC"
+            if ranked:
+                from_sql += (
+                    " LEFT JOIN (SELECT rowid AS id, bm25(pedido_fts, 5.0, 1.0, 0.5) AS rank "
+                    "FROM pedido_fts WHERE pedido_fts MATCH ?) f ON f.id = m.id"
+                )
+                from_params.append(match)
+                order_sql = "f.rank IS NULL, f.rank, m.id DESC"
+        elif ranked:
+            # bm25 con más peso al código de producto que a la descripción
+            from_sql = "pedido_fts f JOIN pedido p ON p.id = f.rowid"
+            order_sql = "bm25(pedido_fts, 5.0, 1.0, 0.5), p.id DESC"
+        elif match:
+            from_sql = "pedido_fts f JOIN pedido p ON p.id = f.rowid"
+            order_sql = "f.rowid DESC"
+        else:
+            # ORDER BY servido por ix_pedido_archivado_creado / ix_pedido_archivado_estado_creado (sin sort)
+            from_sql = "pedido p"
+            order_sql = "p.creado_en DESC, p.id DESC"
+
         sql = f"""
         SELECT
           p.id,
           p.codigo_producto,
           p.descripcion_producto,
           p.fecha_registro,
+          p.creado_en,
           p.estado,
           p.maquina_asignada,
           t.nombre AS turno_nombre
-        FROM pedido p
+        FROM {from_sql}
         JOIN turno t ON t.id = p.turno_id
         {"WHERE " + " AND ".join(where) if where else ""}
-        ORDER BY p.creado_en DESC;
+        ORDER BY {order_sql}
+        {limit_sql};
         """
-        return self.db.query_all(sql, tuple(params))
+        return self.db.query_all(sql, tuple(from_params + params))
 
     # -----------------------
     # Detalle
@@ -143,6 +221,11 @@ class PedidosService:
     # Actualizar (operador)
     # -----------------------
     def actualizar_pedido_operador(self, pedido_id: int, dto: Dict[str, Any]) -> Dict[str, Any]:
+        # Lectura + UPDATE + log + detalle en una sola transacción (un COMMIT)
+        with self.db.transaction():
+            return self._actualizar_pedido_operador(pedido_id, dto)
+
+    def _actualizar_pedido_operador(self, pedido_id: int, dto: Dict[str, Any]) -> Dict[str, Any]:
         row = self.db.query_one(
             """
             SELECT
@@ -213,32 +296,8 @@ class PedidosService:
         )
 
         if delta_planchas > 0:
-            try:
-                self.db.execute(
-                    """
-                    INSERT INTO pedido_planchas_log (
-                      pedido_id,
-                      registro_turno_id,
-                      turno_id,
-                      fecha_registro,
-                      delta_planchas,
-                      ultima_antes,
-                      ultima_nueva
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?);
-                    """,
-                    (
-                        pedido_id,
-                        int(row.get("registro_turno_id") or 0),
-                        int(row.get("turno_id") or 0),
-                        (row.get("fecha_registro") or ""),
-                        int(delta_planchas),
-                        int(ultima_actual),
-                        int(ultima_nueva),
-                    ),
-                )
-            except Exception:
-                pass
+            # Sin try/except: si el log falla, se revierte también el UPDATE (no se pierden deltas)
+            self._log_planchas(pedido_id, row, delta_planchas, ultima_actual, ultima_nueva)
 
         return self.obtener_pedido_detalle(pedido_id) or {"id": pedido_id}
 
@@ -258,6 +317,10 @@ class PedidosService:
     # - log delta: solo incrementos (si baja ultima, no loguea)
     # -----------------------
     def actualizar_pedido_admin(self, pedido_id: int, dto: Dict[str, Any]) -> Dict[str, Any]:
+        with self.db.transaction():
+            return self._actualizar_pedido_admin(pedido_id, dto)
+
+    def _actualizar_pedido_admin(self, pedido_id: int, dto: Dict[str, Any]) -> Dict[str, Any]:
         row = self.db.query_one(
             """
             SELECT
@@ -395,31 +458,39 @@ class PedidosService:
 
         # Log (solo si delta > 0)
         if delta_planchas > 0:
-            try:
-                self.db.execute(
-                    """
-                    INSERT INTO pedido_planchas_log (
-                      pedido_id,
-                      registro_turno_id,
-                      turno_id,
-                      fecha_registro,
-                      delta_planchas,
-                      ultima_antes,
-                      ultima_nueva
-                    )
-                    VALUES (?, ?, ?, ?, ?, ?, ?);
-                    """,
-                    (
-                        pedido_id,
-                        int(row.get("registro_turno_id") or 0),
-                        int(row.get("turno_id") or 0),
-                        (row.get("fecha_registro") or ""),
-                        int(delta_planchas),
-                        int(ultima_actual),
-                        int(ultima_nueva),
-                    ),
-                )
-            except Exception:
-                pass
+            # Sin try/except: si el log falla, se revierte también el UPDATE (no se pierden deltas)
+            self._log_planchas(pedido_id, row, delta_planchas, ultima_actual, ultima_nueva)
 
         return self.obtener_pedido_detalle(pedido_id) or {"id": pedido_id}
+
+    def _log_planchas(
+        self,
+        pedido_id: int,
+        row: Dict[str, Any],
+        delta_planchas: int,
+        ultima_actual: int,
+        ultima_nueva: int,
+    ) -> None:
+        self.db.execute(
+            """
+            INSERT INTO pedido_planchas_log (
+              pedido_id,
+              registro_turno_id,
+              turno_id,
+              fecha_registro,
+              delta_planchas,
+              ultima_antes,
+              ultima_nueva
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?);
+            """,
+            (
+                pedido_id,
+                int(row.get("registro_turno_id") or 0),
+                int(row.get("turno_id") or 0),
+                (row.get("fecha_registro") or ""),
+                int(delta_planchas),
+                int(ultima_actual),
+                int(ultima_nueva),
+            ),
+        )
@@ -0,0 +1,70 @@
+# server/services/versiones_service.py
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from typing import Dict, Optional
+
+from server.db import Database
+
+
+class VersionesService:
+    """
+    Lee los contadores de cambios (tabla_version, mantenida por triggers) y arma ETags.
+    - Una sola consulta por PK: barata comparada con el listado + JSON.
+    - El ETag incluye path + query (cada filtro/página es una representación distinta).
+    - ETag débil (W/): el cuerpo es equivalente, no idéntico byte a byte (ej: compresión).
+    """
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def get(self) -> Dict[str, int]:
+        rows = self.db.query_all("SELECT tabla, version FROM tabla_version;")
+        return {r["tabla"]: int(r["version"]) for r in (rows or [])}
+
+    def etag(self, recurso: str, *tablas: str) -> str:
+        versiones = self.get()
+        partes = [recurso] + [f"{t}={versiones.get(t, 0)}" for t in tablas]
+        digest = hashlib.sha1("|".join(partes).encode("utf-8")).hexdigest()[:20]
+        return f'W/"{digest}"'
+
+
+class VersionWatch:
+    """
+    Detecta cambios de un grupo de tabla_version hechos por cualquier proceso
+    (prefork): caches en memoria la usan para descartarse.
+    - Consulta la BD como máximo cada poll_seconds (el resto de llamadas no cuesta nada);
+      ese es el desfase máximo entre procesos.
+    - La primera lectura cuenta como cambio (el cache aún no tiene base).
+    - Si la consulta falla, no se reporta cambio (el TTL propio del cache sigue acotando).
+    """
+
+    def __init__(self, tabla: str, poll_seconds: float):
+        self.tabla = tabla
+        self.poll_seconds = max(0.0, float(poll_seconds))
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._next_check = 0.0
+
+    def changed(self, db: Database) -> bool:
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        # Un solo hilo consulta; los demás siguen con el cache mientras tanto
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._next_check = now + self.poll_seconds
+            try:
+                row = db.query_one("SELECT version FROM tabla_version WHERE tabla = ?;", (self.tabla,))
+            except Exception:
+                return False
+            version = int(row["version"]) if row else 0
+            if version == self._version:
+                return False
+            self._version = version
+            return True
+        finally:
+            self._lock.release()
@@ -0,0 +1,75 @@
+# server/utils/compression.py
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from server.config import CONFIG
+
+# gzip (zlib, stdlib). Brotli no está en la stdlib: el server no agrega dependencias.
+# Solo tipos de texto: imágenes/fuentes ya vienen comprimidas.
+_COMPRESSIBLE_PREFIXES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+
+
+def is_compressible(content_type: str) -> bool:
+    ct = (content_type or "").lower()
+    return ct.startswith(_COMPRESSIBLE_PREFIXES)
+
+
+def accepts_gzip(handler) -> bool:
+    """
+    Negociación por Accept-Encoding (respeta q=0: "gzip;q=0" o "*;q=0" sin gzip explícito).
+    """
+    headers = getattr(handler, "headers", None)
+    raw = (headers.get("Accept-Encoding") if headers is not None else "") or ""
+    gzip_q: Optional[float] = None
+    star_q: Optional[float] = None
+    for part in raw.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        params = params.strip().lower()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name in ("gzip", "x-gzip"):
+            gzip_q = q
+        elif name == "*":
+            star_q = q
+    if gzip_q is not None:
+        return gzip_q > 0
+    return bool(star_q and star_q > 0)
+
+
+def gzip_encoding_for(handler, content_type: str, size: Optional[int] = None) -> bool:
+    """
+    True si la respuesta debe ir con Content-Encoding: gzip.
+    size=None (streaming): se comprime sin umbral (el tamaño no se conoce de antemano).
+    """
+    if not CONFIG.http_compression or not is_compressible(content_type):
+        return False
+    if size is not None and size < CONFIG.http_compression_min_bytes:
+        return False
+    return accepts_gzip(handler)
+
+
+def gzip_bytes(body: bytes) -> bytes:
+    c = zlib.compressobj(CONFIG.http_compression_level, zlib.DEFLATED, 31)  # 31 = formato gzip
+    return c.compress(body) + c.flush()
+
+
+def gzip_stream(chunks: Iterable[bytes], first: bytes = b"") -> Iterator[bytes]:
+    """
+    Comprime un stream chunk a chunk (memoria acotada). Solo emite cuando zlib
+    entrega salida; el resto sale en el flush final.
+    No cierra `chunks`: lo hace quien lo creó (ej: _send_csv libera la conexión de BD).
+    """
+    c = zlib.compressobj(CONFIG.http_compression_level, zlib.DEFLATED, 31)
+    out = c.compress(first) if first else b""
+    if out:
+        yield out
+    for data in chunks:
+        out = c.compress(data)
+        if out:
+            yield out
+    yield c.flush()
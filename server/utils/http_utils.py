@@ -1,21 +1,35 @@
 import json
 from typing import Any, Dict, Optional, Tuple
 
+from server.config import CONFIG
+from server.utils.compression import gzip_bytes, gzip_encoding_for
+
 def read_json(handler) -> Dict[str, Any]:
     length = int(handler.headers.get("Content-Length") or 0)
     if length <= 0:
         return {}
     raw = handler.rfile.read(length).decode("utf-8", errors="replace")
+    # keep-alive: el handler sabe que el body ya no queda en el socket
+    handler.body_leido = True
     try:
         return json.loads(raw) if raw.strip() else {}
     except json.JSONDecodeError:
         raise ValueError("JSON inválido")
 
-def send_json(handler, status: int, payload: Dict[str, Any]) -> None:
+def send_json(handler, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
     body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    gz = gzip_encoding_for(handler, "application/json", len(body))
+    if gz:
+        body = gzip_bytes(body)
     handler.send_response(status)
     handler.send_header("Content-Type", "application/json; charset=utf-8")
     handler.send_header("Content-Length", str(len(body)))
+    if CONFIG.http_compression:
+        handler.send_header("Vary", "Accept-Encoding")
+    if gz:
+        handler.send_header("Content-Encoding", "gzip")
+    for k, v in (headers or {}).items():
+        handler.send_header(k, v)
     handler.end_headers()
     try:
         handler.wfile.write(body)
@@ -23,6 +37,37 @@ def send_json(handler, status: int, payload: Dict[str, Any]) -> None:
         # El cliente (navegador) cerró la conexión antes de leer la respuesta.
         return
 
+def etag_headers(etag: str) -> Dict[str, str]:
+    # no-cache: el navegador guarda la respuesta pero revalida siempre (If-None-Match)
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+def etag_matches(handler, etag: str) -> bool:
+    """
+    If-None-Match (comparación débil, RFC 9110): acepta lista separada por comas y "*".
+    """
+    raw = handler.headers.get("If-None-Match") or ""
+    if not raw.strip():
+        return False
+    want = etag[2:] if etag.startswith("W/") else etag
+    for tag in raw.split(","):
+        t = tag.strip()
+        if t == "*":
+            return True
+        if t.startswith("W/"):
+            t = t[2:]
+        if t == want:
+            return True
+    return False
+
+def send_not_modified(handler, etag: str) -> None:
+    handler.send_response(304)
+    for k, v in etag_headers(etag).items():
+        handler.send_header(k, v)
+    # Mismo Vary que el 200 (send_json): un cache no mezcla las variantes gzip/identity
+    if CONFIG.http_compression:
+        handler.send_header("Vary", "Accept-Encoding")
+    handler.end_headers()
+
 def ok(data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     return {"ok": True, "data": data or {}}
 
@@ -0,0 +1,53 @@
+import base64
+from typing import Any, Dict, List, Optional, Tuple
+
+# Paginación keyset sobre (creado_en, id), orden DESC.
+# El cursor es opaco para el cliente: base64url("<creado_en>|<id>").
+
+LIMIT_MAX = 200
+
+
+def encode_cursor(creado_en: str, item_id: int) -> str:
+    raw = f"{creado_en}|{int(item_id)}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    c = (cursor or "").strip()
+    try:
+        raw = base64.urlsafe_b64decode(c + "=" * (-len(c) % 4)).decode("utf-8")
+        creado_en, id_s = raw.rsplit("|", 1)
+        item_id = int(id_s)
+        if not creado_en or item_id <= 0:
+            raise ValueError()
+        return creado_en, item_id
+    except Exception:
+        raise ValueError("CURSOR_INVALIDO")
+
+
+def parse_limit(value: str) -> Optional[int]:
+    """
+    "" => None (sin paginar, compat con clientes actuales).
+    Acota a LIMIT_MAX.
+    """
+    v = (value or "").strip()
+    if not v:
+        return None
+    try:
+        n = int(v)
+        if n <= 0:
+            raise ValueError()
+    except Exception:
+        raise ValueError("LIMIT_INVALIDO")
+    return min(n, LIMIT_MAX)
+
+
+def split_page(rows: List[Dict[str, Any]], limit: Optional[int]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    rows debe venir consultado con LIMIT limit + 1: si sobra una fila, hay página siguiente.
+    """
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    items = rows[:limit]
+    last = items[-1]
+    return items, encode_cursor(last["creado_en"], last["id"])
@@ -39,9 +39,9 @@
     const maqSel = document.getElementById("maquinaSel");
     if (!turnoSel || !maqSel) return;
 
-    const res = await window.KP.API.fetchJSON("/api/catalogos");
-    const turnos = res?.data?.turnos || [];
-    const maquinas = res?.data?.maquinas || [];
+    const data = await window.KP.Catalogos.get();
+    const turnos = data?.turnos || [];
+    const maquinas = data?.maquinas || [];
 
     // Turnos
     turnoSel.innerHTML = `<option value="" selected disabled>Seleccione un turno</option>`;
@@ -189,6 +189,42 @@
     },
   };
 
+  // =========================
+  // Catálogos (cache versionada en sessionStorage)
+  // =========================
+  window.KP.Catalogos = window.KP.Catalogos || {
+    _key: "catalogos_cache",
+
+    _read() {
+      try {
+        const raw = sessionStorage.getItem(this._key);
+        return raw ? JSON.parse(raw) : null;
+      } catch {
+        return null;
+      }
+    },
+
+    // Reenvía la versión en cache: si no cambió, el server responde sin el catálogo.
+    async get() {
+      const cached = this._read();
+      const qs = cached?.version ? `?version=${encodeURIComponent(cached.version)}` : "";
+      const data = await window.KP.API.fetchData(`/api/catalogos${qs}`);
+
+      if (data?.sin_cambios && cached) return cached;
+
+      try {
+        sessionStorage.setItem(this._key, JSON.stringify(data));
+      } catch {
+        // sin espacio: se usa la respuesta sin cachear
+      }
+      return data;
+    },
+
+    clear() {
+      sessionStorage.removeItem(this._key);
+    },
+  };
+
   // =========================
   // Utils
   // =========================
@@ -4,8 +4,7 @@
   window.KP.pedidos = window.KP.pedidos || {};
 
   async function loadCatalogos() {
-    const { data } = await window.KP.API.fetchJSON("/api/catalogos");
-    return data;
+    return window.KP.Catalogos.get();
   }
 
   // =========================